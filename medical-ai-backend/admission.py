@@ -0,0 +1,97 @@
+"""
+Admission Control
+Request size limits, a bounded in-flight counter and a short wait queue,
+so overload is answered with fast 429/503 responses instead of timeouts
+"""
+
+import os
+import threading
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+# Body size limits per endpoint, in bytes; anything not listed uses "default"
+CONTENT_LIMITS = {
+    "default": _env_int("MAX_CONTENT_BYTES", 256 * 1024),
+    "/api/batch-analyze": _env_int("MAX_BATCH_CONTENT_BYTES", 8 * 1024 * 1024)
+}
+MAX_BATCH_RECORDS = _env_int("MAX_BATCH_RECORDS", 100)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code, message, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=None, max_queue=None, queue_timeout=None, retry_after=None):
+        """
+        Initialize the controller
+
+        At most max_in_flight requests run at once and at most max_queue wait
+        for a slot. A request arriving to a full queue gets 429 immediately;
+        one that waits longer than queue_timeout seconds gets 503.
+        """
+        self.max_in_flight = max_in_flight or _env_int("MAX_IN_FLIGHT", 8)
+        self.max_queue = max_queue if max_queue is not None else _env_int("MAX_QUEUE", 16)
+        self.queue_timeout = queue_timeout if queue_timeout is not None else _env_float("QUEUE_TIMEOUT_SECONDS", 2.0)
+        self.retry_after = retry_after or _env_int("RETRY_AFTER_SECONDS", 1)
+
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def acquire(self):
+        """Take an in-flight slot or raise AdmissionRejected"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.queued >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    raise AdmissionRejected(429, "Server is busy, too many queued requests", self.retry_after)
+                self.queued += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.queued -= 1
+            if not acquired:
+                with self._lock:
+                    self.rejected_timeout += 1
+                raise AdmissionRejected(503, "Server is overloaded, request timed out in queue", self.retry_after)
+
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout
+            }
+
+
+def content_limit(path):
+    return CONTENT_LIMITS.get(path, CONTENT_LIMITS["default"])
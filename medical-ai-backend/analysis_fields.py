@@ -0,0 +1,78 @@
+"""
+Analysis Field Selection
+Parses the stages a client asked for, runs them against an analysis
+service and trims stage outputs for compact responses, so list screens
+don't pay for the full analysis
+"""
+
+from section_cache import split_sections
+
+
+STAGES = ("summary", "key_information", "risk_assessment")
+
+# What a record list needs: a one-line summary and the risk level
+COMPACT_DEFAULT_STAGES = ("summary", "risk_assessment")
+
+# Scoring details kept out of compact extraction output
+DIAGNOSTIC_KEYS = {"detected_categories", "confidence_scores", "note"}
+
+# How each stage calls an analysis service; options (e.g. knowledge_base)
+# are only passed to services that take them
+STAGE_RUNNERS = {
+    "summary": lambda service, content, record_type, **options: service.create_patient_friendly_summary(
+        content, record_type, **options),
+    "key_information": lambda service, content, record_type, **options: service.extract_key_information(
+        content, **options),
+    "risk_assessment": lambda service, content, record_type, **options: service.assess_risk_level(content)
+}
+
+
+def parse_stages(value, compact=False):
+    """
+    Requested stages in canonical order
+
+    value is a list of stage names or a comma-separated string; when it is
+    missing every stage runs, or only COMPACT_DEFAULT_STAGES in compact
+    mode. Raises ValueError for unknown names, or when no names remain
+    (e.g. ",").
+    """
+    if value is None or value == "" or value == []:
+        return COMPACT_DEFAULT_STAGES if compact else STAGES
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError("stages must be a list of stage names or a comma-separated string")
+
+    names = {name.strip() for name in value if name.strip()}
+    unknown = sorted(names - set(STAGES))
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    if not names:
+        raise ValueError(f"No stages given (choose from {', '.join(STAGES)})")
+    return tuple(stage for stage in STAGES if stage in names)
+
+
+def parse_compact(value):
+    """The "compact" flag: a JSON boolean, false when missing; raises
+    ValueError otherwise, so a string like "false" isn't taken as true"""
+    if value is None:
+        return False
+    if not isinstance(value, bool):
+        raise ValueError("compact must be true or false")
+    return value
+
+
+def compact_stage(stage, output):
+    """Keep only the fields a summary view displays"""
+    if stage == "summary":
+        sentences = split_sections(output.get("summary", ""))
+        return {"summary": sentences[0] if sentences else ""}
+    if stage == "key_information":
+        info = output.get("extracted_info", {})
+        if not isinstance(info, dict):  # generative tools return free text
+            return {"extracted_info": info}
+        return {"extracted_info": {
+            key: value for key, value in info.items()
+            if value and key not in DIAGNOSTIC_KEYS
+        }}
+    return {"risk_level": output.get("risk_level", "UNKNOWN")}
@@ -1,44 +1,401 @@
 """
 Flask API for Medical AI Service
 Provides REST endpoints for medical record summarization and analysis
+
+LITE_MODE=1 serves only the rule-based and regex engines and never imports
+llmware; the embedding service, vector store and index are imported only
+when real AI mode is used.
 """
 
-from flask import Flask, request, jsonify
+from startup_report import StartupTimer
+startup = StartupTimer()
+
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 from medical_ai_service_demo import MedicalAIService as DemoService
-from llmware_medical_ai import LLMwareMedicalAIService
+from lab_reference import get_lab_reference_table
+from trend_store import TrendStore, extract_vitals, parse_timestamp
+from dedup import group_exact_duplicates, find_near_duplicates
+from admission import AdmissionController, AdmissionRejected, CONTENT_LIMITS, MAX_BATCH_RECORDS, content_limit
+from analysis_fields import STAGES, STAGE_RUNNERS, parse_compact, parse_stages, compact_stage
+from summary_stream import stream_sentences, sse_event
+from cascade import CascadeRouter, CascadeTier, RuleConfidence, reported_confidence, RULES_THRESHOLD, EMBEDDING_THRESHOLD
+from deadline import Deadline, DeadlineRunner, DEADLINE_HEADER
+from http_codec import FastJSONProvider, GzipRequestMiddleware, compress_response
+from entity_extraction import ExtractionPool
+from request_profiler import RequestProfiler, PROFILE_HEADER, PROFILE_MODE_HEADER
+from memory_diagnostics import (MemoryDiagnostics, MEMORY_DIAGNOSTICS, GROUP_BY, DEBUG_TOKEN_HEADER,
+                                debug_authorized)
 import json
+import os
+import time
+
+LITE_MODE = os.environ.get('LITE_MODE') == '1'
+startup.mark('imports')
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React Native requests
 
+# orjson-backed JSON, gzip request bodies from the app, compressed responses
+app.json = FastJSONProvider(app)
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app, content_limit)
+
+# Hard cap for streamed bodies; per-endpoint limits are checked below
+app.config['MAX_CONTENT_LENGTH'] = max(CONTENT_LIMITS.values())
+admission = AdmissionController()
+
+# Allocation tracing for /debug/memory (MEMORY_DIAGNOSTICS=1), started
+# before the models load so their allocations are attributed too
+memory_diagnostics = MemoryDiagnostics() if MEMORY_DIAGNOSTICS else None
+
+# Opt-in request profiling (PROFILE_TOKEN / PROFILE_SAMPLE_RATE). The hooks
+# are only registered when it's configured, and before the admission hook
+# so queueing shows up in the profile
+profiler = RequestProfiler.from_env()
+if profiler is not None:
+    @app.before_request
+    def start_profile():
+        mode = profiler.choose(request.headers.get(PROFILE_HEADER), request.headers.get(PROFILE_MODE_HEADER))
+        if mode is not None:
+            g.profile = profiler.start(mode)
+    
+    @app.after_request
+    def finish_profile(response):
+        session = g.pop('profile', None)
+        if session is not None:
+            response.headers['X-Profile-File'] = profiler.finish(session, f"{request.method} {request.path}")
+        return response
+    
+    @app.teardown_request
+    def abandon_profile(error=None):
+        session = g.pop('profile', None)  # still set only if the view raised
+        if session is not None:
+            profiler.finish(session, f"{request.method} {request.path} error")
+
 # Try to use real LLMware AI, fallback to demo if needed
-try:
-    print("🚀 Attempting to load Real LLMware AI Service...")
-    medical_ai = LLMwareMedicalAIService()
-    if medical_ai.model_loaded:
-        print("✅ Real LLMware AI Service loaded successfully!")
-        USE_REAL_AI = True
-        AI_MODE = "Real LLMware AI"
-    else:
-        raise Exception("Real AI failed to load")
-except Exception as e:
-    print(f"⚠️  Real LLMware AI failed: {str(e)}")
-    print("🔄 Falling back to Demo AI Service...")
+if LITE_MODE:
+    print("🪶 Lite mode: rule-based engine only")
     medical_ai = DemoService()
     USE_REAL_AI = False
     AI_MODE = "Demo Mode"
+else:
+    try:
+        print("🚀 Attempting to load Real LLMware AI Service...")
+        from llmware_medical_ai import LLMwareMedicalAIService
+        medical_ai = LLMwareMedicalAIService()
+        if medical_ai.model_loaded:
+            print("✅ Real LLMware AI Service loaded successfully!")
+            USE_REAL_AI = True
+            AI_MODE = "Real LLMware AI"
+        else:
+            raise Exception("Real AI failed to load")
+    except Exception as e:
+        print(f"⚠️  Real LLMware AI failed: {str(e)}")
+        print("🔄 Falling back to Demo AI Service...")
+        medical_ai = DemoService()
+        USE_REAL_AI = False
+        AI_MODE = "Demo Mode"
+startup.mark('ai_service')
+
+# Rule-based engine answering for real-AI stages that miss their deadline
+fallback_ai = DemoService() if USE_REAL_AI else None
+FALLBACK_MODE = "Demo Mode (deadline fallback)"
+deadline_runner = DeadlineRunner(max_workers=int(os.environ.get('ANALYSIS_WORKERS', 2 * admission.max_in_flight)))
+
+# Worker processes for batch entity extraction (EXTRACTION_PROCESSES),
+# started from a forkserver before the server starts handling requests
+extraction_pool = ExtractionPool()
+if USE_REAL_AI and extraction_pool.start():
+    print(f"🧵 Extraction pool: {extraction_pool.processes} worker processes")
+startup.mark('extraction_pool')
+
+# Per-patient lab and vital time series, fed by analyzed records
+lab_reference = get_lab_reference_table()
+trend_store = TrendStore()
+
+
+# Generative slim tools (real AI mode only): the cascade's last tier with
+# CASCADE_GENERATIVE=1, and the token-by-token source for
+# /api/summarize/stream with that or GENERATIVE_STREAMING=1
+generative_ai = None
+if USE_REAL_AI and '1' in (os.environ.get('CASCADE_GENERATIVE'), os.environ.get('GENERATIVE_STREAMING')):
+    from medical_ai_service import MedicalAIService as GenerativeService
+    generative_ai = GenerativeService()
+
+
+def create_cascade():
+    """
+    Rules -> embeddings (-> generative slim tools) cascade, enabled with
+    CASCADE_ROUTING=1 in real AI mode; CASCADE_GENERATIVE=1 adds the
+    generative tier for summaries and extraction
+    """
+    tiers = [
+        CascadeTier('rules', 'Demo Mode',
+                    lambda stage, content, record_type, **options: STAGE_RUNNERS[stage](
+                        fallback_ai, content, record_type),
+                    RuleConfidence(lab_reference, medical_ai.medication_lexicon), RULES_THRESHOLD),
+        CascadeTier('embeddings', AI_MODE,
+                    lambda stage, content, record_type, **options: STAGE_RUNNERS[stage](
+                        medical_ai, content, record_type, **options),
+                    reported_confidence, EMBEDDING_THRESHOLD)
+    ]
+    if os.environ.get('CASCADE_GENERATIVE') == '1':
+        def run_generative(stage, content, record_type, **options):
+            output = STAGE_RUNNERS[stage](generative_ai, content, record_type)
+            return output if output.get('success') else None
+        
+        tiers.append(CascadeTier('generative', 'LLMware Slim Tools', run_generative,
+                                 stages=('summary', 'key_information')))
+    print(f"🪜 Cascade routing: {' -> '.join(tier.name for tier in tiers)}")
+    return CascadeRouter(tiers)
+
+
+cascade = create_cascade() if USE_REAL_AI and os.environ.get('CASCADE_ROUTING') == '1' else None
+
+
+def select_knowledge_base(data):
+    """
+    Knowledge base snapshot for a request, or None outside real AI mode
+
+    An explicit "knowledge_base" name must exist (ValueError / LookupError
+    otherwise). Without one, the most specific of "<clinic_id>.<locale>",
+    "<clinic_id>", "<locale>" and its language ("es" for "es-MX") that has
+    a KB file is used, falling back to the default KB.
+    """
+    if not USE_REAL_AI:
+        return None
+    knowledge_bases = medical_ai.knowledge_bases
+    if data.get('knowledge_base'):
+        return knowledge_bases.get(str(data['knowledge_base']).lower())
+    
+    clinic_id = str(data.get('clinic_id') or '').lower()
+    locale = str(data.get('locale') or '').lower().replace('_', '-')
+    return knowledge_bases.resolve([
+        f"{clinic_id}.{locale}" if clinic_id and locale else None,
+        clinic_id,
+        locale,
+        locale.split('-')[0]
+    ])
+
+
+def service_options(knowledge_base):
+    return {'knowledge_base': knowledge_base} if knowledge_base is not None else {}
+
+
+def run_stage(stage, content, record_type, knowledge_base=None):
+    """(output, engine label) from the cascade, or the configured engine"""
+    options = service_options(knowledge_base)
+    if cascade is not None:
+        return cascade.run(stage, content, record_type, **options)
+    return STAGE_RUNNERS[stage](medical_ai, content, record_type, **options), AI_MODE
+
+
+def analyze_content(content, record_type, stages=STAGES, compact=False, deadline=None, knowledge_base=None):
+    """
+    Analysis of one record: summary, key information and risk
+
+    Only the requested stages run; compact keeps just the fields a record
+    list displays. With a deadline, real-AI stages that haven't finished
+    in time are answered by the rule-based engine, and "engine" records
+    which engine produced each stage. knowledge_base is the snapshot from
+    select_knowledge_base.
+    """
+    if fallback_ai is None or deadline is None:
+        answers = {stage: run_stage(stage, content, record_type, knowledge_base) for stage in stages}
+    else:
+        answers, _ = deadline_runner.run_stages(
+            {stage: (lambda stage=stage: run_stage(stage, content, record_type, knowledge_base)) for stage in stages},
+            lambda stage: (STAGE_RUNNERS[stage](fallback_ai, content, record_type), FALLBACK_MODE),
+            deadline
+        )
+    engines = {stage: answers[stage][1] for stage in stages}
+    
+    result = {stage: compact_stage(stage, answers[stage][0]) if compact else answers[stage][0] for stage in stages}
+    result['record_type'] = record_type
+    result['engine'] = engines
+    result['degraded'] = FALLBACK_MODE in engines.values()
+    return result
+
+
+def trend_timestamp_error(record):
+    """
+    Why a record's timestamp can't be stored with its trends, or None
+
+    Checked before analysis, so a bad timestamp is a 400 rather than a
+    500 after the work is done.
+    """
+    if not record.get('patient_id'):
+        return None
+    try:
+        parse_timestamp(record.get('timestamp'))
+    except (ValueError, TypeError, OverflowError):
+        return f"Invalid timestamp {record.get('timestamp')!r}: use an ISO 8601 date or epoch seconds"
+    return None
+
+
+def record_trends(record, content, record_id=None):
+    """Save a record's lab values and vitals when it carries a patient ID;
+    with a record_id, re-submitting the record replaces its points"""
+    patient_id = record.get('patient_id')
+    if not patient_id:
+        return None
+    return trend_store.record(
+        patient_id,
+        record.get('timestamp'),
+        lab_reference.classify(content),
+        extract_vitals(content),
+        record_id=record_id
+    )
+
+# Record embeddings for semantic search (real AI mode only). The store
+# on disk is the durable copy shared by every worker: one worker holds its
+# writer lock and appends, the others read it and pass their appends on
+record_search = None
+
+if USE_REAL_AI:
+    from record_search import RecordSearch
+    from vector_store import DEFAULT_STORE_PATH
+    record_search = RecordSearch(DEFAULT_STORE_PATH).start()
+    print(f"🔎 Record index loaded: {len(record_search)} vectors "
+          f"({'writer' if record_search.writer else 'reader'})")
+startup.mark('record_index')
+
+
+def index_record(record, content, record_id):
+    """Keep an analyzed record's embedding so it can be found by /api/search"""
+    if not USE_REAL_AI or not record_id or record_id == 'unknown':
+        return
+    embedding = medical_ai.embed_record(content)
+    if embedding is None:
+        return
+    metadata = {
+        key: record[key]
+        for key in ('patient_id', 'clinic_id', 'record_type')
+        if record.get(key)
+    }
+    record_search.add(record_id, embedding, metadata)
+
+@app.before_request
+def admit_request():
+    """Reject oversized bodies and shed load before any work is done"""
+    if request.path == '/health' or request.method == 'OPTIONS':
+        return None
+    
+    # The clock starts before any queueing so the budget covers the whole request
+    try:
+        g.deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': f'{DEADLINE_HEADER} must be a positive number of milliseconds'
+        }), 400
+    
+    limit = content_limit(request.path)
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify({
+            'success': False,
+            'error': f'Request body too large ({request.content_length} bytes, limit {limit})'
+        }), 413
+    
+    try:
+        admission.acquire()
+    except AdmissionRejected as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, e.status_code
+    g.admitted = True
+    return None
+
+@app.after_request
+def encode_response(response):
+    return compress_response(response, request.accept_encodings)
+
+@app.teardown_request
+def release_request(error=None):
+    if g.pop('admitted', False):
+        admission.release()
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    health = {
         'status': 'healthy',
         'service': 'Medical AI API',
         'version': '1.0.0',
         'mode': AI_MODE,
-        'real_ai': USE_REAL_AI
-    })
+        'real_ai': USE_REAL_AI,
+        'lite': LITE_MODE,
+        'startup': startup.report(),
+        'admission': admission.stats(),
+        'deadlines': deadline_runner.stats()
+    }
+    if cascade is not None:
+        health['cascade'] = cascade.stats()
+    if profiler is not None:
+        health['profiling'] = profiler.stats()
+    if USE_REAL_AI:
+        health['section_cache'] = medical_ai.section_cache.stats()
+        if extraction_pool.enabled:
+            health['extraction_pool'] = extraction_pool.stats()
+        health['knowledge_bases'] = medical_ai.knowledge_bases.stats()
+        if medical_ai.shared_matrices is not None:
+            health['shared_matrices'] = medical_ai.shared_matrices.stats()
+        if medical_ai.medication_lexicon is not None:
+            health['medication_lexicon'] = medical_ai.medication_lexicon.stats()
+        health['vector_store'] = record_search.stats()
+    return jsonify(health)
+
+if memory_diagnostics is not None:
+    def debug_options():
+        """(limit, group_by) query parameters, or raise ValueError"""
+        limit = int(request.args.get('limit', 20))
+        group_by = request.args.get('group_by', 'lineno')
+        if limit < 1 or group_by not in GROUP_BY:
+            raise ValueError(f"limit must be positive and group_by one of {', '.join(GROUP_BY)}")
+        return limit, group_by
+    
+    @app.route('/debug/memory', methods=['GET'])
+    def memory_report():
+        """
+        RSS, Python heap counters and the top allocation sites
+        
+        Query parameters: limit (default 20), group_by (lineno, filename
+        or traceback), object_types=1 to also count live objects by type
+        """
+        if not debug_authorized(request.headers.get(DEBUG_TOKEN_HEADER)):
+            return jsonify({'success': False, 'error': 'Forbidden'}), 403
+        try:
+            limit, group_by = debug_options()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        report = memory_diagnostics.report(limit, group_by, request.args.get('object_types') == '1')
+        report['snapshots'] = memory_diagnostics.snapshots()
+        return jsonify({'success': True, 'data': report})
+    
+    @app.route('/debug/memory/snapshot', methods=['POST'])
+    def take_memory_snapshot():
+        """Keep a tracemalloc snapshot to diff against later"""
+        if not debug_authorized(request.headers.get(DEBUG_TOKEN_HEADER)):
+            return jsonify({'success': False, 'error': 'Forbidden'}), 403
+        return jsonify({'success': True, 'snapshot_id': memory_diagnostics.snapshot()})
+    
+    @app.route('/debug/memory/diff', methods=['GET'])
+    def diff_memory_snapshots():
+        """
+        Allocation growth between snapshots: ?from=<id>&to=<id>, or from a
+        snapshot to now when "to" is left out
+        """
+        if not debug_authorized(request.headers.get(DEBUG_TOKEN_HEADER)):
+            return jsonify({'success': False, 'error': 'Forbidden'}), 403
+        try:
+            limit, group_by = debug_options()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        try:
+            diff = memory_diagnostics.diff(request.args.get('from', ''), request.args.get('to'), limit, group_by)
+        except KeyError as e:
+            return jsonify({'success': False, 'error': f'Unknown snapshot {e}'}), 404
+        return jsonify({'success': True, 'data': diff})
 
 @app.route('/api/summarize', methods=['POST'])
 def summarize_medical_record():
@@ -48,7 +405,8 @@ def summarize_medical_record():
     Expected JSON payload:
     {
         "content": "medical record text",
-        "record_type": "Blood Test" (optional)
+        "record_type": "Blood Test" (optional),
+        "knowledge_base": "clinic_a" (optional, or pick one by "clinic_id" / "locale")
     }
     """
     try:
@@ -62,13 +420,19 @@ def summarize_medical_record():
             return jsonify({'error': 'No content provided'}), 400
         
         record_type = data.get('record_type', 'Medical Record')
+        try:
+            knowledge_base = select_knowledge_base(data)
+        except (ValueError, LookupError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         # Generate summary using our AI service
-        result = medical_ai.create_patient_friendly_summary(content, record_type)
+        result = analyze_content(content, record_type, ('summary',), deadline=g.deadline,
+                                 knowledge_base=knowledge_base)
         
         return jsonify({
             'success': True,
-            'data': result
+            'data': result['summary'],
+            'engine': result['engine']['summary']
         })
         
     except Exception as e:
@@ -77,6 +441,61 @@ def summarize_medical_record():
             'error': str(e)
         }), 500
 
+@app.route('/api/summarize/stream', methods=['POST'])
+def stream_medical_summary():
+    """
+    Stream a patient-friendly summary as server-sent events
+    
+    Same payload as /api/summarize. Emits a "sentence" event for each
+    sentence as it is ready, then "done" with the full summary (or
+    "error"). With the generative service (GENERATIVE_STREAMING=1 or
+    CASCADE_GENERATIVE=1) sentences go out as the model writes them and
+    generation stops at the sentence limit; otherwise the summary is
+    computed first and sent in sentences.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No JSON data provided'}), 400
+    
+    content = data.get('content')
+    if not content:
+        return jsonify({'error': 'No content provided'}), 400
+    
+    record_type = data.get('record_type', 'Medical Record')
+    try:
+        knowledge_base = select_knowledge_base(data)
+    except (ValueError, LookupError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    # Only the generative service produces tokens; the others compute the
+    # whole summary first
+    stream = getattr(generative_ai, 'stream_patient_friendly_summary', None)
+    
+    def generate():
+        sentences = []
+        try:
+            if stream is not None:
+                source = stream(content, record_type)
+            else:
+                summary = medical_ai.create_patient_friendly_summary(
+                    content, record_type, **service_options(knowledge_base))['summary']
+                source = stream_sentences(iter([summary]))
+            for sentence in source:
+                yield sse_event('sentence', {'index': len(sentences), 'text': sentence})
+                sentences.append(sentence)
+            yield sse_event('done', {'summary': ' '.join(sentences), 'record_type': record_type})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # don't let a proxy hold events back
+    })
+    # Generation happens while streaming, so keep the admission slot until
+    # the server closes the response rather than when this view returns
+    if g.pop('admitted', False):
+        response.call_on_close(admission.release)
+    return response
+
 @app.route('/api/extract', methods=['POST'])
 def extract_key_information():
     """
@@ -84,7 +503,8 @@ def extract_key_information():
     
     Expected JSON payload:
     {
-        "content": "medical record text"
+        "content": "medical record text",
+        "knowledge_base": "clinic_a" (optional, or pick one by "clinic_id" / "locale")
     }
     """
     try:
@@ -96,13 +516,19 @@ def extract_key_information():
         content = data.get('content')
         if not content:
             return jsonify({'error': 'No content provided'}), 400
+        try:
+            knowledge_base = select_knowledge_base(data)
+        except (ValueError, LookupError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         # Extract key information using our AI service
-        result = medical_ai.extract_key_information(content)
+        result = analyze_content(content, 'Medical Record', ('key_information',), deadline=g.deadline,
+                                 knowledge_base=knowledge_base)
         
         return jsonify({
             'success': True,
-            'data': result
+            'data': result['key_information'],
+            'engine': result['engine']['key_information']
         })
         
     except Exception as e:
@@ -132,11 +558,12 @@ def assess_risk_level():
             return jsonify({'error': 'No content provided'}), 400
         
         # Assess risk using our AI service
-        result = medical_ai.assess_risk_level(content)
+        result = analyze_content(content, 'Medical Record', ('risk_assessment',), deadline=g.deadline)
         
         return jsonify({
             'success': True,
-            'data': result
+            'data': result['risk_assessment'],
+            'engine': result['engine']['risk_assessment']
         })
         
     except Exception as e:
@@ -153,7 +580,14 @@ def analyze_medical_record():
     Expected JSON payload:
     {
         "content": "medical record text",
-        "record_type": "Blood Test" (optional)
+        "record_type": "Blood Test" (optional),
+        "patient_id": "patient_123" (optional, stores lab/vital trends),
+        "timestamp": "2024-01-15" (optional, when the record was taken),
+        "record_id": "record_1" (optional, indexes the record for search and
+                                 lets a re-submission replace its trend points),
+        "stages": ["summary", "risk_assessment"] (optional, default all),
+        "compact": true (optional, trimmed output; defaults to summary + risk),
+        "knowledge_base": "clinic_a" (optional, or pick one by "clinic_id" / "locale")
     }
     """
     try:
@@ -167,21 +601,32 @@ def analyze_medical_record():
             return jsonify({'error': 'No content provided'}), 400
         
         record_type = data.get('record_type', 'Medical Record')
+        try:
+            compact = parse_compact(data.get('compact'))
+            stages = parse_stages(data.get('stages', data.get('fields')), compact)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        try:
+            knowledge_base = select_knowledge_base(data)
+        except (ValueError, LookupError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        timestamp_error = trend_timestamp_error(data)
+        if timestamp_error:
+            return jsonify({'success': False, 'error': timestamp_error}), 400
+        
+        # Run the requested analysis stages
+        result = analyze_content(content, record_type, stages, compact, g.deadline, knowledge_base)
+        result['analysis_timestamp'] = str(data.get('timestamp', 'unknown'))
+        trend_values = record_trends(data, content, data.get('record_id'))
+        if not result['degraded']:  # embedding a timed-out record would blow the deadline
+            index_record(data, content, data.get('record_id'))
         
-        # Perform complete analysis
-        summary_result = medical_ai.create_patient_friendly_summary(content, record_type)
-        extraction_result = medical_ai.extract_key_information(content)
-        risk_result = medical_ai.assess_risk_level(content)
+        if trend_values is not None:
+            result['trend_values_stored'] = trend_values
         
         return jsonify({
             'success': True,
-            'data': {
-                'summary': summary_result,
-                'key_information': extraction_result,
-                'risk_assessment': risk_result,
-                'analysis_timestamp': str(data.get('timestamp', 'unknown')),
-                'record_type': record_type
-            }
+            'data': result
         })
         
     except Exception as e:
@@ -201,11 +646,21 @@ def batch_analyze_records():
             {
                 "id": "record_1",
                 "content": "medical record text",
-                "record_type": "Blood Test"
+                "record_type": "Blood Test",
+                "patient_id": "patient_123" (optional),
+                "timestamp": "2024-01-15" (optional)
             },
             ...
-        ]
+        ],
+        "detect_near_duplicates": false (optional),
+        "stages": ["summary", "risk_assessment"] (optional, default all),
+        "compact": true (optional, trimmed output; defaults to summary + risk),
+        "knowledge_base": "clinic_a" (optional, or pick one by "clinic_id" / "locale")
     }
+    
+    Records with the same normalized content and record type are analyzed
+    once; their results carry "duplicate_of" the first copy's ID. Records
+    reached after the request deadline has passed fail with "timed_out".
     """
     try:
         data = request.get_json()
@@ -216,50 +671,115 @@ def batch_analyze_records():
         records = data.get('records', [])
         if not records:
             return jsonify({'error': 'No records provided'}), 400
+        if len(records) > MAX_BATCH_RECORDS:
+            return jsonify({
+                'success': False,
+                'error': f'Too many records ({len(records)}, limit {MAX_BATCH_RECORDS})'
+            }), 413
         
-        results = []
+        try:
+            compact = parse_compact(data.get('compact'))
+            stages = parse_stages(data.get('stages', data.get('fields')), compact)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        try:
+            knowledge_base = select_knowledge_base(data)
+        except (ValueError, LookupError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        for record in records:
-            record_id = record.get('id', 'unknown')
-            content = record.get('content', '')
-            record_type = record.get('record_type', 'Medical Record')
-            
-            if not content:
-                results.append({
-                    'id': record_id,
+        results = [None] * len(records)
+        
+        # Analyze each distinct record once and fan the result out to its
+        # duplicates (faxes, rescans and family copies of the same report)
+        valid = []
+        for position, record in enumerate(records):
+            error = 'No content provided for this record' if not record.get('content') else trend_timestamp_error(record)
+            if error:
+                results[position] = {
+                    'id': record.get('id', 'unknown'),
                     'success': False,
-                    'error': 'No content provided for this record'
-                })
-                continue
+                    'error': error
+                }
+            else:
+                valid.append(position)
+        
+        groups = group_exact_duplicates([
+            (records[i]['content'], records[i].get('record_type', 'Medical Record')) for i in valid
+        ])
+        
+        # Large batches extract entities for their new sections in worker
+        # processes up front, leaving only the embeddings to the analysis
+        if USE_REAL_AI:
+            medical_ai.prefetch_section_entities(
+                [records[valid[members[0]]]['content'] for members in groups.values()],
+                extraction_pool, g.deadline.remaining()
+            )
+        
+        received = int(time.time())  # timestamp for records that don't carry one
+        
+        # Each record gets an even share of the time left, so one slow
+        # record can't push every later one onto the fallback engine
+        timed_out = 0
+        unanalyzed = len(groups)
+        for members in groups.values():
+            positions = [valid[i] for i in members]
+            first = records[positions[0]]
+            content = first['content']
+            record_type = first.get('record_type', 'Medical Record')
             
-            try:
-                # Analyze each record
-                summary_result = medical_ai.create_patient_friendly_summary(content, record_type)
-                extraction_result = medical_ai.extract_key_information(content)
-                risk_result = medical_ai.assess_risk_level(content)
-                
-                results.append({
-                    'id': record_id,
-                    'success': True,
-                    'data': {
-                        'summary': summary_result,
-                        'key_information': extraction_result,
-                        'risk_assessment': risk_result,
-                        'record_type': record_type
-                    }
-                })
-                
-            except Exception as e:
-                results.append({
-                    'id': record_id,
-                    'success': False,
-                    'error': str(e)
-                })
+            if g.deadline.expired():
+                timed_out += len(positions)
+                analysis = {'success': False, 'timed_out': True,
+                            'error': 'Request deadline passed before this record was analyzed'}
+            else:
+                try:
+                    result = analyze_content(content, record_type, stages, compact,
+                                             g.deadline.share(unanalyzed), knowledge_base)
+                    analysis = {'success': True, 'data': result}
+                except Exception as e:
+                    analysis = {'success': False, 'error': str(e)}
+            unanalyzed -= 1
+            
+            # Copies of one reading (same patient and time) add one trend point
+            trended = set()
+            for position in positions:
+                record = records[position]
+                record_id = record.get('id', 'unknown')
+                results[position] = dict(analysis, id=record_id)
+                if position != positions[0]:
+                    results[position]['duplicate_of'] = first.get('id', 'unknown')
+                if analysis['success']:
+                    trend_key = (record.get('patient_id'), parse_timestamp(record.get('timestamp'), now=received))
+                    if trend_key not in trended:
+                        trended.add(trend_key)
+                        record_trends(dict(record, timestamp=trend_key[1]), record['content'], record_id)
+                    if not analysis['data']['degraded']:
+                        index_record(record, record['content'], record_id)
+        
+        # Optional pass flagging rescans that differ by a few words
+        near_duplicates = 0
+        if data.get('detect_near_duplicates'):
+            representatives = [valid[members[0]] for members in groups.values()]
+            flagged = find_near_duplicates([records[i]['content'] for i in representatives])
+            for rep_index, (match_index, similarity) in flagged.items():
+                position = representatives[rep_index]
+                results[position]['near_duplicate_of'] = records[representatives[match_index]].get('id', 'unknown')
+                results[position]['near_duplicate_similarity'] = round(similarity, 3)
+            near_duplicates = len(flagged)
+        
+        analyses_saved = len(valid) - len(groups)
         
         return jsonify({
             'success': True,
             'results': results,
-            'total_processed': len(results)
+            'total_processed': len(results),
+            'timed_out': timed_out,
+            'deduplication': {
+                'unique_records': len(groups),
+                'exact_duplicates': analyses_saved,
+                'analyses_saved': analyses_saved,
+                'near_duplicates_flagged': near_duplicates
+            }
         })
         
     except Exception as e:
@@ -268,10 +788,147 @@ def batch_analyze_records():
             'error': str(e)
         }), 500
 
+@app.route('/api/search', methods=['POST'])
+def search_records():
+    """
+    Find records similar to a text query or to an indexed record
+    
+    Expected JSON payload:
+    {
+        "query": "free text" or "record_id": "record_1",
+        "k": 10 (optional),
+        "patient_id": "patient_123" (optional filter),
+        "clinic_id": "clinic_1" (optional filter)
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+        
+        try:
+            k = int(data.get('k', 10))
+        except (TypeError, ValueError):
+            k = 0
+        if k < 1:
+            return jsonify({'success': False, 'error': 'k must be a positive integer'}), 400
+        k = min(k, 100)
+        
+        if not USE_REAL_AI:
+            return jsonify({'success': False, 'error': 'Semantic search requires the real AI service'}), 503
+        
+        if len(record_search) == 0:
+            return jsonify({'success': True, 'data': {'results': [], 'indexed_records': 0}})
+        
+        filters = {key: data[key] for key in ('patient_id', 'clinic_id') if data.get(key)}
+        
+        record_id = data.get('record_id')
+        if record_id:
+            query_vector = record_search.get_vector(record_id)
+            if query_vector is None:
+                return jsonify({'success': False, 'error': f'Record {record_id} is not indexed'}), 404
+        elif data.get('query'):
+            query_vector = medical_ai.embed_record(data['query'])
+        else:
+            return jsonify({'error': 'Provide a query or a record_id'}), 400
+        
+        start = time.perf_counter()
+        # Ask for one extra so the query record itself can be dropped
+        results = record_search.search(query_vector, k + 1 if record_id else k, filters=filters)
+        if record_id:
+            results = [r for r in results if r['id'] != record_id][:k]
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'results': results,
+                'indexed_records': len(record_search),
+                'search_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/search/records/<record_id>', methods=['DELETE'])
+def delete_search_record(record_id):
+    """
+    Remove a record from semantic search
+
+    The worker holding the store's writer lock deletes it at once (200);
+    other workers hand the delete to that worker, and it reaches every
+    worker's searches within a couple of sync intervals (202).
+    """
+    try:
+        if not USE_REAL_AI:
+            return jsonify({'success': False, 'error': 'Semantic search requires the real AI service'}), 503
+        if record_search.get_vector(record_id) is None:
+            return jsonify({'success': False, 'error': f'Record {record_id} is not indexed'}), 404
+        
+        deleted = record_search.delete(record_id)
+        return jsonify({'success': True, 'data': {'record_id': record_id, 'pending': not deleted}}), 200 if deleted else 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/trends/<patient_id>', methods=['GET'])
+def list_patient_trends(patient_id):
+    """List the lab and vital series stored for a patient"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'patient_id': patient_id,
+            'series': trend_store.list_series(patient_id)
+        }
+    })
+
+@app.route('/api/trends/<patient_id>/<analyte>', methods=['GET'])
+def get_patient_trend(patient_id, analyte):
+    """
+    Trend, deltas and out-of-range streaks for one analyte
+    
+    Optional query parameters: since, until (ISO dates)
+    """
+    try:
+        start = time.perf_counter()
+        result = trend_store.query(
+            patient_id,
+            analyte,
+            since=request.args.get('since'),
+            until=request.args.get('until')
+        )
+        if result is None:
+            return jsonify({'success': False, 'error': f'No trend data for {analyte}'}), 404
+        
+        result['query_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return jsonify({
+            'success': True,
+            'data': result
+        })
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'success': False, 'error': 'Request body too large'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
@@ -281,10 +938,13 @@ if __name__ == '__main__':
     print("📋 Available endpoints:")
     print("  GET  /health              - Health check")
     print("  POST /api/summarize       - Generate patient-friendly summary")
+    print("  POST /api/summarize/stream - Stream summary sentences (SSE)")
     print("  POST /api/extract         - Extract key information")
     print("  POST /api/assess-risk     - Assess risk level")
     print("  POST /api/analyze         - Complete analysis")
     print("  POST /api/batch-analyze   - Batch analysis")
+    print("  POST /api/search          - Semantic record search")
+    print("  GET  /api/trends/<patient_id>/<analyte> - Lab/vital trend")
     print("\n💡 Server running on http://localhost:5000")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch entity extraction
+Reports inline throughput and the process pool's speedup per worker count
+"""
+
+import argparse
+import os
+import random
+import time
+
+from entity_extraction import ExtractionPool, extract_section_entities
+from medication_lexicon import get_medication_lexicon
+from section_cache import split_sections
+
+
+SECTION_TEMPLATES = [
+    "Glucose: {value} mg/dL. Cholesterol: {value2} mg/dL.",
+    "BP {value}/{value3} on {month}/{day}/2024.",
+    "Take {drug} {dose}mg daily with food.",
+    "Patient reports history of hypertension and diabetes, currently stable.",
+    "Temperature {value3}.{day} F. Return if fever persists beyond 48 hours.",
+    "Avoid alcohol while taking {drug}. Monitor for dizziness.",
+    "Hemoglobin: {day}.{month} g/dL. WBC: {month}.{day} K/uL. Platelets: {value2} K/uL."
+]
+DRUGS = ["lisinopril", "metformin", "atorvastatin", "amoxicillin", "albuterol", "levothyroxine"]
+
+
+def synthetic_sections(count, seed=0):
+    """Distinct record sections, as a batch of new records would have"""
+    rng = random.Random(seed)
+    sections = []
+    while len(sections) < count:
+        record = " ".join(
+            rng.choice(SECTION_TEMPLATES).format(
+                value=rng.randint(70, 300), value2=rng.randint(100, 400), value3=rng.randint(60, 110),
+                month=rng.randint(1, 12), day=rng.randint(1, 28), drug=rng.choice(DRUGS),
+                dose=rng.choice([5, 10, 20, 500])
+            )
+            for _ in range(8)
+        )
+        sections.extend(split_sections(record))
+    return sections[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=200_000)
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    print(f"🧪 Extraction benchmark: {args.sections} sections, {os.cpu_count()} CPUs")
+    sections = synthetic_sections(args.sections)
+    lexicon = get_medication_lexicon()
+
+    start = time.perf_counter()
+    inline = [extract_section_entities(section, lexicon) for section in sections]
+    inline_s = time.perf_counter() - start
+    print(f"🐍 Inline: {inline_s:.2f}s ({len(sections) / inline_s:,.0f} sections/s)")
+
+    for processes in args.processes:
+        pool = ExtractionPool(processes=processes, min_sections=1)
+        pool.start()  # worker startup isn't part of per-batch cost
+        start = time.perf_counter()
+        pooled = pool.extract(sections)
+        pooled_s = time.perf_counter() - start
+        pool.close()
+        assert pooled == inline
+        print(f"⚡ {processes:2d} processes (chunks of {pool.chunksize(len(sections))}): {pooled_s:.2f}s "
+              f"({len(sections) / pooled_s:,.0f} sections/s, {inline_s / pooled_s:.2f}x inline)")
+
+
+if __name__ == "__main__":
+    main()
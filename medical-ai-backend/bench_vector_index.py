@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark the record embedding vector index
+Reports build time, search latency and recall@k against brute force
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def clustered_embeddings(n, dim, clusters=2000, seed=0):
+    """Synthetic embeddings with topic structure, like real record embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, clusters, n)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        end = min(start + 100000, n)
+        noise = rng.standard_normal((end - start, dim)).astype(np.float32)
+        vectors[start:end] = centers[assignments[start:end]] + 1.2 * noise
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print(f"🧪 Vector index benchmark: {args.vectors} x {args.dim}")
+    # Queries come from the same topic distribution as the stored records
+    vectors = clustered_embeddings(args.vectors + args.queries, args.dim)
+    vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+
+    start = time.perf_counter()
+    index = VectorIndex(args.dim, train_size=min(args.vectors, 100000), nlist=int(4 * np.sqrt(args.vectors)))
+    index.add_many([f"record_{i}" for i in range(args.vectors)], vectors)
+    print(f"🏗️ Built in {time.perf_counter() - start:.1f}s: {index.stats()}")
+
+    exact = []
+    start = time.perf_counter()
+    for query in queries:
+        exact.append({r["id"] for r in index.search(query, args.k, exact=True)})
+    brute_ms = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"📏 Brute force: {brute_ms:.2f}ms/query")
+
+    for nprobe in args.nprobe:
+        latencies, recalls = [], []
+        for query, truth in zip(queries, exact):
+            start = time.perf_counter()
+            results = index.search(query, args.k, nprobe=nprobe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(truth & {r["id"] for r in results}) / args.k)
+        print(f"⚡ nprobe={nprobe:3d}: p50 {np.percentile(latencies, 50):.2f}ms, "
+              f"p99 {np.percentile(latencies, 99):.2f}ms, recall@{args.k} {np.mean(recalls):.3f}")
+
+
+if __name__ == "__main__":
+    main()
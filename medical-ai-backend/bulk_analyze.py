@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Bulk Analysis
+Offline back-fill: analyzes JSONL or CSV records across worker processes
+and streams results to JSONL or columnar part files, checkpointing so an
+interrupted run resumes where it stopped
+
+JSONL input is memory-mapped and split into byte ranges that the workers
+read and decode themselves, so this process never parses a record.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from analysis_fields import STAGE_RUNNERS, compact_stage, parse_stages
+from columnar_output import ROW_GROUP_ROWS, ColumnarWriter, flatten_result
+from record_reader import RANGE_BYTES, MappedFile, iter_records, split_ranges
+
+
+PROGRESS_INTERVAL = 5.0  # seconds between progress lines
+# Checkpoint at least this often, however slowly tasks or parts fill up
+CHECKPOINT_SECONDS = 600
+FINGERPRINT_BYTES = 1024 * 1024  # hashed from each end of the input
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+
+
+def detect_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_records(path, fmt):
+    """Yield input records as dicts, in file order"""
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+    yield from iter_records(path)
+
+
+def count_records(path):
+    """CSV rows for the ETA (quoted fields may span lines, so it parses)"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return max(0, sum(1 for _ in csv.reader(f)) - 1)
+
+
+def input_fingerprint(path):
+    """
+    Identify an input by its size and a hash of its first and last
+    FINGERPRINT_BYTES, so a copied or touched archive still resumes while
+    a different or appended-to file doesn't
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            digest.update(f.read())
+    return {"size": size, "sha256_head_tail": digest.hexdigest()}
+
+
+def _json_default(value):
+    if hasattr(value, "tolist"):  # NumPy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# Per-process analysis service and output settings, set once by the pool initializer
+_service = None
+_stages = None
+_compact = False
+_columnar = False
+_embeddings = False
+
+
+def create_service(engine):
+    if engine == "demo":
+        from medical_ai_service_demo import MedicalAIService as DemoService
+        return DemoService()
+    from llmware_medical_ai import LLMwareMedicalAIService
+    service = LLMwareMedicalAIService()
+    if not service.model_loaded:
+        raise RuntimeError("LLMware models failed to load; use --engine demo for rule-based results")
+    return service
+
+
+def init_worker(engine, stages, compact, columnar=False, embeddings=False):
+    global _service, _stages, _compact, _columnar, _embeddings
+    _service = create_service(engine)
+    _stages = stages
+    _compact = compact
+    _columnar = columnar
+    _embeddings = embeddings
+
+
+def analyze_record(record):
+    """One result line, shaped like a /api/batch-analyze result"""
+    record_id = record.get("id", "unknown")
+    content = record.get("content")
+    if not content:
+        return {"id": record_id, "success": False, "error": "No content provided for this record"}
+    record_type = record.get("record_type") or "Medical Record"
+    try:
+        data = {}
+        for stage in _stages:
+            output = STAGE_RUNNERS[stage](_service, content, record_type)
+            data[stage] = compact_stage(stage, output) if _compact else output
+        data["record_type"] = record_type
+        result = {"id": record_id, "success": True, "data": data}
+    except Exception as e:
+        return {"id": record_id, "success": False, "error": str(e)}
+    if _embeddings:
+        embed_record = getattr(_service, "embed_record", None)  # the demo service has none
+        result["embedding"] = embed_record(content) if embed_record else None
+    return result
+
+
+def encode_results(results):
+    """
+    Worker-side output for a task: flattened rows for columnar output,
+    else the serialized JSONL lines, so the parent only writes
+    """
+    if _columnar:
+        return [flatten_result(result, result.pop("embedding", None)) for result in results]
+    return "".join(json.dumps(result, default=_json_default) + "\n" for result in results)
+
+
+def analyze_chunk(records):
+    """(records, encoded results) for a chunk of records"""
+    return len(records), encode_results([analyze_record(record) for record in records])
+
+
+def analyze_range(path, start, end):
+    """Like analyze_chunk, for the JSONL records in bytes [start, end) of path"""
+    results = []
+    with MappedFile(path, start, end) as mapped:
+        for record in mapped.records():
+            try:
+                data = record.load()
+            except ValueError as e:
+                results.append({"id": f"offset:{record.start}", "success": False,
+                                "error": f"Malformed JSON record: {str(e)}"})
+                continue
+            results.append(analyze_record(data if isinstance(data, dict) else {}))
+    return len(results), encode_results(results)
+
+
+class JsonlSink:
+    def __init__(self, path, output_bytes):
+        self._file = open(path, "a+b")
+        self._file.truncate(output_bytes)  # drop a partial write after the checkpoint
+        self._file.seek(output_bytes)
+
+    def write_rows(self, lines):
+        self._file.write(lines.encode("utf-8"))
+
+    def commit(self):
+        """Make everything written durable; returns the output length"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        """Close; anything written since the last commit is cut on resume"""
+        self._file.close()
+
+
+class Checkpoint:
+    def __init__(self, path, fingerprint):
+        """
+        Progress of one run: how many input records have their results in
+        the output, where they end in the input (JSONL byte offset), and the
+        output position at that point (JSONL bytes, or committed columnar
+        parts)
+
+        Results are written in input order, so that prefix is all a resume
+        needs; anything past output_position is a partial write and is cut.
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self.records_done = 0
+        self.input_offset = 0
+        self.output_position = 0
+
+    @classmethod
+    def load(cls, path, fingerprint):
+        checkpoint = cls(path, fingerprint)
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return checkpoint
+        if saved.get("input") != fingerprint:
+            raise SystemExit(f"❌ {path} belongs to a different input file; delete it or pick another --output")
+        checkpoint.records_done = saved["records_done"]
+        checkpoint.input_offset = saved.get("input_offset", 0)
+        checkpoint.output_position = saved["output_position"]
+        return checkpoint
+
+    def reset(self):
+        self.records_done = self.input_offset = self.output_position = 0
+
+    def save(self, records_done, input_offset, output_position):
+        self.records_done = records_done
+        self.input_offset = input_offset
+        self.output_position = output_position
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"input": self.fingerprint, "records_done": records_done, "input_offset": input_offset,
+                       "output_position": output_position, "saved_at": time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+
+def chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Progress:
+    def __init__(self, total, position, records, interval=PROGRESS_INTERVAL):
+        """
+        Rate and ETA reporting; position and total are in the input's unit
+        of progress (bytes for JSONL, records for CSV)
+        """
+        self.total = total
+        self.start_position = position
+        self.start_records = records
+        self.started = time.perf_counter()
+        self.interval = interval
+        self._last = self.started
+
+    def rate(self, records):
+        elapsed = time.perf_counter() - self.started
+        return (records - self.start_records) / elapsed if elapsed > 0 else 0.0
+
+    def update(self, position, records, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        line = f"📈 {records:,} records"
+        if self.total:
+            line += f" ({100 * position / self.total:.1f}%)"
+        line += f", {self.rate(records):,.1f} records/s"
+        progressed = position - self.start_position
+        if self.total and progressed > 0:
+            remaining = (self.total - position) * (now - self.started) / progressed
+            line += f", ETA {int(remaining // 3600)}h{int(remaining % 3600 // 60):02d}m{int(remaining % 60):02d}s"
+        print(line, flush=True)
+
+
+def jsonl_tasks(path, input_offset, range_bytes):
+    for start, end in split_ranges(path, range_bytes, input_offset):
+        yield end, analyze_range, (path, start, end)
+
+
+def csv_tasks(path, records_done, chunk_size):
+    records = read_records(path, "csv")
+    for _ in range(records_done):  # already in the output
+        next(records, None)
+    for chunk in chunked(records, chunk_size):
+        records_done += len(chunk)
+        yield records_done, analyze_chunk, (chunk,)
+
+
+def iter_results(tasks, workers, worker_args):
+    """(input position, records, encoded results) per task, in input order"""
+    if workers <= 0:
+        init_worker(*worker_args)
+        for position, function, task_args in tasks:
+            yield (position,) + function(*task_args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=worker_args) as pool:
+        pending = deque()
+        for position, function, task_args in tasks:
+            pending.append((position, pool.submit(function, *task_args)))
+            # A couple of tasks queued per worker keeps them busy without
+            # holding much of the input or output in memory
+            if len(pending) >= 2 * workers:
+                position, future = pending.popleft()
+                yield (position,) + future.result()
+        while pending:
+            position, future = pending.popleft()
+            yield (position,) + future.result()
+
+
+def open_sink(args, output_position):
+    if args.output_format == "jsonl":
+        return JsonlSink(args.output, output_position)
+    return ColumnarWriter(args.output, EMBEDDING_DIM if args.embeddings else None,
+                          args.row_group_rows, backend=args.output_format, parts_done=output_position)
+
+
+def run(args):
+    fmt = args.format if args.format != "auto" else detect_format(args.input)
+    stages = parse_stages(args.stages, args.compact)
+    checkpoint_path = args.output + ".checkpoint"
+    # Starting from zero truncates the output, so never do that to results
+    # this tool can't account for
+    if os.path.exists(args.output) and not os.path.exists(checkpoint_path) and not args.overwrite:
+        raise SystemExit(f"❌ {args.output} already exists and has no checkpoint to resume from; "
+                         f"pass --overwrite to replace it")
+    checkpoint = Checkpoint.load(checkpoint_path, input_fingerprint(args.input))
+    if not os.path.exists(args.output):
+        checkpoint.reset()
+    sink = open_sink(args, checkpoint.output_position)
+    columnar = isinstance(sink, ColumnarWriter)
+
+    if checkpoint.records_done:
+        print(f"↩️ Resuming after {checkpoint.records_done:,} records")
+    print(f"🚀 Analyzing {args.input} ({fmt}) with {args.engine} on "
+          f"{args.workers or 'no'} worker processes: {', '.join(stages)}")
+
+    records_done = checkpoint.records_done
+    if fmt == "csv":
+        position = records_done
+        total = None if args.no_count else count_records(args.input)
+        tasks = csv_tasks(args.input, records_done, args.chunk_size)
+    else:
+        position = checkpoint.input_offset
+        total = os.path.getsize(args.input)
+        tasks = jsonl_tasks(args.input, position, args.range_bytes)
+
+    progress = Progress(total, position, records_done)
+    worker_args = (args.engine, stages, args.compact, columnar, args.embeddings)
+    tasks_since_checkpoint = 0
+    last_checkpoint = time.monotonic()
+    try:
+        for position, count, output in iter_results(tasks, args.workers, worker_args):
+            sink.write_rows(output)
+            records_done += count
+            tasks_since_checkpoint += 1
+            # Columnar output commits a part per checkpoint, so parts are
+            # sized in rows rather than tasks
+            due = sink.part_rows >= args.part_rows if columnar else tasks_since_checkpoint >= args.checkpoint_every
+            if due or time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+                checkpoint.save(records_done, position, sink.commit())
+                tasks_since_checkpoint = 0
+                last_checkpoint = time.monotonic()
+            progress.update(position, records_done)
+        checkpoint.save(records_done, position, sink.commit())
+    except KeyboardInterrupt:
+        print(f"\n⏸️ Interrupted; rerun the same command to resume after {checkpoint.records_done:,} records")
+        return 130
+    finally:
+        sink.close()
+
+    progress.update(position, records_done, force=True)
+    print(f"✅ Wrote {records_done:,} results to {args.output} "
+          f"({progress.rate(records_done):,.1f} records/s this run)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL or CSV records with content, record_type and id fields")
+    parser.add_argument("output", help="JSONL results file, or a directory of columnar parts; "
+                                       "<output>.checkpoint tracks progress")
+    parser.add_argument("--format", choices=("auto", "jsonl", "csv"), default="auto")
+    parser.add_argument("--output-format", choices=("jsonl", "parquet", "npz"), default="jsonl",
+                        help="parquet needs pyarrow; npz is the NumPy-only columnar fallback")
+    parser.add_argument("--engine", choices=("llmware", "demo"), default="llmware")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, each with its own service (0 runs in this process)")
+    parser.add_argument("--range-bytes", type=int, default=RANGE_BYTES,
+                        help="JSONL bytes per task sent to a worker")
+    parser.add_argument("--chunk-size", type=int, default=64, help="CSV records per task sent to a worker")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="tasks between JSONL checkpoints")
+    parser.add_argument("--row-group-rows", type=int, default=ROW_GROUP_ROWS, help="rows per columnar row group")
+    parser.add_argument("--part-rows", type=int, default=8 * ROW_GROUP_ROWS,
+                        help="rows per columnar part file (one checkpoint each)")
+    parser.add_argument("--embeddings", action="store_true",
+                        help="add each record's document embedding (llmware engine)")
+    parser.add_argument("--stages", help="comma-separated stages (default all)")
+    parser.add_argument("--compact", action="store_true", help="trimmed output, as with the API's compact mode")
+    parser.add_argument("--no-count", action="store_true", help="skip counting CSV rows (no ETA)")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="replace an existing output that has no checkpoint")
+    args = parser.parse_args(argv)
+    try:
+        return run(args)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
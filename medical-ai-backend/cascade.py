@@ -0,0 +1,166 @@
+"""
+Cascade Routing
+Runs the microsecond rule-based engine first and escalates a stage to the
+embedding engine, then optionally the generative slim tools, only when the
+cheaper tier's confidence is below its threshold
+"""
+
+import os
+import threading
+import time
+
+
+RULES_THRESHOLD = float(os.environ.get("CASCADE_RULES_THRESHOLD", 0.7))
+EMBEDDING_THRESHOLD = float(os.environ.get("CASCADE_EMBEDDING_THRESHOLD", 0.6))
+# Model label on the placeholder the LLMware service returns when it fails
+FALLBACK_MODEL = "Fallback Mode"
+
+
+class RuleConfidence:
+    """
+    How far to trust a rule-based answer, checked against the lab reference
+    table and medication lexicon
+
+    The demo engine reports fixed confidences, so these scores come from
+    whether its keyword rules plausibly saw everything in the record.
+    """
+
+    def __init__(self, lab_reference=None, medication_lexicon=None):
+        self.lab_reference = lab_reference
+        self.medication_lexicon = medication_lexicon
+
+    def _abnormal_labs(self, content):
+        if self.lab_reference is None:
+            return 0, 0
+        results = self.lab_reference.classify(content)
+        return len(results), sum(1 for result in results if result["status"] in ("low", "high"))
+
+    def __call__(self, stage, output, content):
+        if stage == "risk_assessment":
+            found = output.get("indicators_found", {})
+            _, abnormal = self._abnormal_labs(content)
+            if found.get("high", 0) > 0:
+                return 0.9  # explicit emergency wording
+            if abnormal and output.get("risk_level") == "LOW":
+                return 0.3  # out-of-range values the keywords missed
+            if found.get("medium", 0) > 1:
+                return 0.75
+            if found.get("low", 0) > 0 and found.get("medium", 0) == 0:
+                return 0.8  # explicitly routine or stable
+            return 0.4
+
+        if stage == "summary":
+            template = output.get("template", "general")
+            labs, abnormal = self._abnormal_labs(content)
+            if template in ("prescription", "vaccination", "imaging") and not labs:
+                return 0.8
+            if template == "lab" and labs and not abnormal:
+                return 0.7
+            return 0.3  # generic wording can't explain specific findings
+
+        # key_information: the suffix patterns must have caught every
+        # medication the lexicon knows, and there must be no lab values left
+        # unextracted
+        info = output.get("extracted_info", {})
+        labs, _ = self._abnormal_labs(content)
+        if self.medication_lexicon is not None:
+            known = {canonical for canonical, _, _, _ in self.medication_lexicon.find(content)}
+            found = {name.lower() for name in info.get("medications", [])}
+            if known - found:
+                return 0.35
+        return 0.4 if labs else 0.8
+
+
+def reported_confidence(stage, output, content):
+    return float(output.get("confidence", 0.0))
+
+
+class CascadeTier:
+    def __init__(self, name, engine, run, confidence=None, threshold=None, stages=None):
+        """
+        One engine in the cascade
+
+        run(stage, content, record_type, **options) returns the stage
+        output, or None when the engine couldn't answer; a FALLBACK_MODEL
+        placeholder or an exception counts as no answer too. The last tier
+        a stage reaches needs no confidence or threshold.
+        """
+        self.name = name
+        self.engine = engine
+        self.run = run
+        self.confidence = confidence
+        self.threshold = threshold
+        self.stages = stages
+
+
+class CascadeRouter:
+    def __init__(self, tiers):
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        self.answered = {tier.name: 0 for tier in tiers}
+        self.runs = {tier.name: 0 for tier in tiers}
+        self.run_ms = {tier.name: 0.0 for tier in tiers}
+        self.skipped = {tier.name: 0 for tier in tiers}
+        self.failed = {tier.name: 0 for tier in tiers}
+
+    def run(self, stage, content, record_type, **options):
+        """Return (output, engine label) from the cheapest confident tier;
+        options are passed through to every tier"""
+        eligible = [tier for tier in self.tiers if tier.stages is None or stage in tier.stages]
+        answer = None
+        error = None
+        for position, tier in enumerate(eligible):
+            start = time.perf_counter()
+            try:
+                output = tier.run(stage, content, record_type, **options)
+            except Exception as e:
+                print(f"⚠️ Cascade tier {tier.name} failed on {stage}, escalating: {str(e)}")
+                output, error = None, e
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.runs[tier.name] += 1
+                self.run_ms[tier.name] += elapsed_ms
+
+            if output is not None and output.get("model") == FALLBACK_MODEL:
+                output = None  # the engine failed; keep the cheaper tier's answer
+            if output is not None:
+                answer = (output, tier)
+            else:
+                with self._lock:
+                    self.failed[tier.name] += 1
+            is_last = position == len(eligible) - 1
+            if is_last or (output is not None and tier.confidence(stage, output, content) >= tier.threshold):
+                with self._lock:
+                    for skipped in eligible[position + 1:]:
+                        self.skipped[skipped.name] += 1
+                break
+
+        if answer is None:
+            raise error or RuntimeError(f"No cascade tier answered {stage}")
+        output, tier = answer
+        with self._lock:
+            self.answered[tier.name] += 1
+        return output, tier.engine
+
+    def stats(self):
+        """Share of stage calls answered per tier, and the compute the
+        skipped escalations would have cost at each tier's mean latency"""
+        with self._lock:
+            total = sum(self.answered.values())
+            mean_ms = {name: self.run_ms[name] / self.runs[name] for name in self.runs if self.runs[name]}
+            return {
+                "tiers": {
+                    name: {
+                        "answered": self.answered[name],
+                        "share": round(self.answered[name] / total, 3) if total else 0.0,
+                        "runs": self.runs[name],
+                        "failed": self.failed[name],
+                        "mean_ms": round(mean_ms.get(name, 0.0), 3)
+                    }
+                    for name in self.answered
+                },
+                "stage_calls": total,
+                "estimated_ms_saved": round(sum(
+                    self.skipped[name] * mean_ms[name] for name in self.skipped if name in mean_ms
+                ), 1)
+            }
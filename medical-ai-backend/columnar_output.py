@@ -0,0 +1,256 @@
+"""
+Columnar Output
+Bulk analysis results as flat columns - Parquet through pyarrow when it is
+installed, NumPy .npz otherwise - written in row groups, so analytics can
+scan one column without parsing whole records
+"""
+
+import glob
+import os
+import re
+import zipfile
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+ROW_GROUP_ROWS = int(os.environ.get("BULK_ROW_GROUP_ROWS", 4096))
+# npz has no list type; list and map cells are joined into one string
+LIST_SEPARATOR = "; "
+PART_PATTERN = re.compile(r"^part-(\d{5})\.(parquet|npz)$")
+
+# Column name -> kind, in file order; "embedding" follows when enabled
+COLUMNS = {
+    "id": "str",
+    "success": "bool",
+    "error": "str",
+    "record_type": "str",
+    "risk_level": "str",
+    "risk_confidence": "float",
+    "summary": "str",
+    "categories": "list",
+    "medications": "list",
+    "conditions": "list",
+    "lab_values": "map",
+}
+
+
+def flatten_result(result, embedding=None):
+    """One row of COLUMNS (plus embedding) from a bulk or /api/batch-analyze result"""
+    data = result.get("data") or {}
+    summary = data.get("summary") or {}
+    info = (data.get("key_information") or {}).get("extracted_info")
+    info = info if isinstance(info, dict) else {}  # generative tools return free text
+    risk = data.get("risk_assessment") or {}
+    return {
+        "id": str(result.get("id", "")),
+        "success": bool(result.get("success")),
+        "error": result.get("error") or "",
+        "record_type": data.get("record_type") or "",
+        "risk_level": risk.get("risk_level") or "",
+        "risk_confidence": float(risk["confidence"]) if risk.get("confidence") is not None else np.nan,
+        "summary": summary.get("summary") or "",
+        "categories": [str(category) for category in info.get("detected_categories", [])],
+        "medications": [str(medication) for medication in info.get("medications", [])],
+        "conditions": [str(condition) for condition in info.get("conditions", [])],
+        # LLMware extraction reports "values", the demo service "vital_signs"
+        "lab_values": {str(k): str(v) for k, v in (info.get("values") or info.get("vital_signs") or {}).items()},
+        "embedding": embedding,
+    }
+
+
+def _embedding_matrix(rows, dim):
+    """(rows, dim) float32, NaN where a record has no embedding"""
+    matrix = np.full((len(rows), dim), np.nan, dtype=np.float32)
+    for i, row in enumerate(rows):
+        if row.get("embedding") is None:
+            continue
+        vector = np.asarray(row["embedding"], dtype=np.float32).reshape(-1)
+        if vector.size != dim:
+            raise ValueError(f"Embedding for {row['id']} has {vector.size} dimensions, expected {dim}")
+        matrix[i] = vector
+    return matrix
+
+
+class _ParquetPart:
+    extension = "parquet"
+
+    def __init__(self, f, embedding_dim):
+        fields = [(name, {
+            "str": pa.string(), "bool": pa.bool_(), "float": pa.float32(),
+            "list": pa.list_(pa.string()), "map": pa.map_(pa.string(), pa.string())
+        }[kind]) for name, kind in COLUMNS.items()]
+        if embedding_dim:
+            fields.append(("embedding", pa.list_(pa.float32(), embedding_dim)))  # fixed-size
+        self.schema = pa.schema(fields)
+        self.embedding_dim = embedding_dim
+        self._writer = pq.ParquetWriter(f, self.schema, compression="zstd")
+
+    def write_group(self, rows):
+        arrays = []
+        for name, kind in COLUMNS.items():
+            values = [row[name] for row in rows]
+            if kind == "map":
+                values = [list(value.items()) for value in values]
+            arrays.append(pa.array(values, type=self.schema.field(name).type))
+        if self.embedding_dim:
+            flat = pa.array(_embedding_matrix(rows, self.embedding_dim).reshape(-1))
+            arrays.append(pa.FixedSizeListArray.from_arrays(flat, self.embedding_dim))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class _NpzPart:
+    extension = "npz"
+
+    def __init__(self, f, embedding_dim):
+        # Members are <column>-<group>.npy, so np.load(path)[member] reads one
+        # column of one row group
+        self.embedding_dim = embedding_dim
+        self._zip = zipfile.ZipFile(f, "w", zipfile.ZIP_STORED, allowZip64=True)
+        self.groups = 0
+
+    def _columns(self, rows):
+        for name, kind in COLUMNS.items():
+            values = [row[name] for row in rows]
+            if kind == "list":
+                values = [LIST_SEPARATOR.join(value) for value in values]
+            elif kind == "map":
+                values = [LIST_SEPARATOR.join(f"{k}={v}" for k, v in value.items()) for value in values]
+            dtype = {"str": str, "list": str, "map": str, "bool": bool, "float": np.float32}[kind]
+            yield name, np.array(values, dtype=dtype)
+        if self.embedding_dim:
+            yield "embedding", _embedding_matrix(rows, self.embedding_dim)
+
+    def write_group(self, rows):
+        for name, array in self._columns(rows):
+            with self._zip.open(f"{name}-{self.groups:05d}.npy", "w", force_zip64=True) as member:
+                np.lib.format.write_array(member, array, allow_pickle=False)
+        self.groups += 1
+
+    def close(self):
+        self._zip.close()
+
+
+class ColumnarWriter:
+    def __init__(self, directory, embedding_dim=None, row_group_rows=ROW_GROUP_ROWS, backend=None, parts_done=0):
+        """
+        Write flattened rows into part-NNNNN.parquet (or .npz) files in a
+        directory
+
+        Rows are buffered until row_group_rows and then written as one row
+        group of the open part, so memory is bounded by a row group. commit()
+        finishes the open part and makes it visible; a part is written as a
+        .tmp first, so readers only ever see complete files, and close()
+        drops anything not committed. Parts numbered
+        from parts_done on, and leftover .tmp files, are from an interrupted
+        run and are removed.
+        """
+        backend = backend or ("parquet" if pq is not None else "npz")
+        if backend == "parquet" and pq is None:
+            raise ValueError("Parquet output needs pyarrow; install it or use the npz backend")
+        self.directory = directory
+        self.embedding_dim = embedding_dim
+        self.row_group_rows = row_group_rows
+        self._part_class = _ParquetPart if backend == "parquet" else _NpzPart
+        self.parts = parts_done
+        self.rows_written = 0
+        self.part_rows = 0  # rows in the part that commit() will finish
+        self._rows = []
+        self._file = None
+        self._part = None
+
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            match = PART_PATTERN.match(entry.name)
+            if entry.name.endswith(".tmp") or (match and int(match.group(1)) >= parts_done):
+                os.remove(entry.path)
+
+    @property
+    def backend(self):
+        return self._part_class.extension
+
+    def _path(self):
+        return os.path.join(self.directory, f"part-{self.parts:05d}.{self._part_class.extension}")
+
+    def write(self, row):
+        self._rows.append(row)
+        self.part_rows += 1
+        if len(self._rows) >= self.row_group_rows:
+            self._flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def _flush(self):
+        if not self._rows:
+            return
+        if self._part is None:
+            self._file = open(self._path() + ".tmp", "wb")
+            self._part = self._part_class(self._file, self.embedding_dim)
+        self._part.write_group(self._rows)
+        self.rows_written += len(self._rows)
+        self._rows = []
+
+    def commit(self):
+        """Write buffered rows and finish the open part; returns the committed part count"""
+        self._flush()
+        if self._part is not None:
+            self._part.close()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self._path() + ".tmp", self._path())
+            self._part = self._file = None
+            self.parts += 1
+            self.part_rows = 0
+        return self.parts
+
+    def close(self):
+        """Close without committing; rows since the last commit are dropped"""
+        if self._part is not None:
+            self._part.close()
+            self._file.close()
+            os.remove(self._path() + ".tmp")
+            self._part = self._file = None
+        self._rows = []
+        self.part_rows = 0
+
+
+def part_paths(directory):
+    return sorted(path for path in glob.glob(os.path.join(glob.escape(directory), "part-*"))
+                  if PART_PATTERN.match(os.path.basename(path)))
+
+
+def read_column(directory, name):
+    """
+    One column across every committed part, without decoding the others
+
+    Returns a NumPy array; embeddings come back as (rows, dim) float32.
+    List and map cells are Python objects from Parquet and
+    LIST_SEPARATOR-joined strings from npz.
+    """
+    chunks = []
+    for path in part_paths(directory):
+        if path.endswith(".parquet"):
+            column = pq.read_table(path, columns=[name]).column(name)
+            if pa.types.is_fixed_size_list(column.type):
+                values = column.combine_chunks().flatten().to_numpy()
+                chunks.append(values.reshape(-1, column.type.list_size))
+            else:
+                chunks.append(column.to_numpy())
+            continue
+        with np.load(path, allow_pickle=False) as npz:
+            members = sorted(member for member in npz.files if member.rsplit("-", 1)[0] == name)
+            chunks.extend(npz[member] for member in members)
+    if not chunks:
+        return np.array([])
+    return np.concatenate(chunks)
@@ -0,0 +1,123 @@
+"""
+Request Deadlines
+Per-request time budgets, and a runner that gives analysis stages until the
+deadline before filling the rest from a fallback engine
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from request_profiler import worker_profile
+
+
+DEFAULT_DEADLINE_MS = int(os.environ.get("DEFAULT_DEADLINE_MS", 3000))
+MAX_DEADLINE_MS = int(os.environ.get("MAX_DEADLINE_MS", 30000))
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+
+class Deadline:
+    def __init__(self, budget_ms):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    @classmethod
+    def from_header(cls, value):
+        """Deadline from an X-Deadline-Ms value, clamped to MAX_DEADLINE_MS;
+        raises ValueError for anything that isn't a positive number"""
+        if value is None or value == "":
+            return cls(DEFAULT_DEADLINE_MS)
+        budget_ms = float(value)
+        if not budget_ms > 0:
+            raise ValueError(f"{DEADLINE_HEADER} must be a positive number of milliseconds")
+        return cls(min(budget_ms, MAX_DEADLINE_MS))
+
+    def remaining(self):
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def share(self, parts):
+        """Deadline for one of `parts` pieces of work splitting what's left"""
+        return Deadline(self.remaining() * 1000 / max(1, parts))
+
+
+class DeadlineRunner:
+    def __init__(self, max_workers):
+        """
+        Run work on a bounded pool so callers can stop waiting at a deadline
+
+        A running stage can't be interrupted, but a timed-out task is
+        cancelled: it stops before its next stage, and one still queued
+        behind busy workers never starts its stages.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self.completed = 0
+        self.degraded = 0
+        self.abandoned = 0
+        self._lock = threading.Lock()
+
+    def run_stages(self, runners, fallback, deadline):
+        """
+        Run runners[stage]() in order until the deadline
+
+        Returns ({stage: output}, {stage: "primary" | "fallback"}); stages
+        that didn't finish in time, or raised, come from fallback(stage).
+        """
+        outputs = {}
+        lock = threading.Lock()
+        cancelled = threading.Event()
+
+        def work():
+            with worker_profile():  # joins the request's profile, if it has one
+                for stage, runner in runners.items():
+                    if cancelled.is_set() or deadline.expired():
+                        return
+                    output = runner()
+                    with lock:
+                        outputs[stage] = output
+
+        # In the caller's context, so work() sees its profile session
+        future = self._executor.submit(contextvars.copy_context().run, work)
+        try:
+            future.result(timeout=deadline.remaining())
+        except FutureTimeout:
+            cancelled.set()
+            if not future.cancel():  # only succeeds if it never started
+                with self._lock:
+                    self.abandoned += 1
+        except Exception as e:
+            print(f"⚠️ Analysis failed, using fallback: {str(e)}")
+
+        with lock:
+            cancelled.set()
+            finished = dict(outputs)
+        sources = {}
+        for stage in runners:
+            if stage in finished:
+                sources[stage] = "primary"
+            else:
+                finished[stage] = fallback(stage)
+                sources[stage] = "fallback"
+
+        with self._lock:
+            if "fallback" in sources.values():
+                self.degraded += 1
+            else:
+                self.completed += 1
+        return finished, sources
+
+    def stats(self):
+        with self._lock:
+            total = self.completed + self.degraded
+            return {
+                "completed": self.completed,
+                "degraded": self.degraded,
+                "degraded_rate": round(self.degraded / total, 3) if total else 0.0,
+                "abandoned": self.abandoned,
+                "default_deadline_ms": DEFAULT_DEADLINE_MS
+            }
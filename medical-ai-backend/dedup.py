@@ -0,0 +1,98 @@
+"""
+Duplicate Record Detection
+Exact duplicates by normalized content hash, plus an optional MinHash pass
+that flags near-duplicates such as rescans and re-faxed copies
+"""
+
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+
+SHINGLE_WORDS = 3
+NUM_PERMUTATIONS = 128
+BANDS = 32  # 32 bands x 4 rows: pairs above ~0.6 Jaccard almost always collide
+MERSENNE_PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(1719)
+_PERM_A = _rng.integers(1, MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_content(text):
+    """Case and whitespace-insensitive form of a record, for exact duplicates;
+    punctuation is kept since "<70" and ">70" are different results"""
+    return re.sub(r'\s+', ' ', text.lower()).strip()
+
+
+def shingle_words(text):
+    """Words of a record with punctuation dropped as well, for MinHash, where
+    a rescan's stray marks shouldn't hide the match"""
+    return re.sub(r'[^\w\s/.%-]', ' ', normalize_content(text)).split()
+
+
+def content_key(text, record_type=""):
+    """Hash of the normalized content; the record type is part of the key
+    because it changes the generated summary"""
+    normalized = normalize_content(text)
+    return hashlib.sha256(f"{record_type.lower()}\x00{normalized}".encode('utf-8')).hexdigest()
+
+
+def group_exact_duplicates(records):
+    """
+    Group record indices by content key
+
+    records is a list of (content, record_type) pairs. Returns an ordered
+    dict of key -> indices; the first index in each group is the one to
+    analyze.
+    """
+    groups = {}
+    for i, (content, record_type) in enumerate(records):
+        groups.setdefault(content_key(content, record_type), []).append(i)
+    return groups
+
+
+def minhash_signature(text):
+    """MinHash signature over word shingles of the normalized text"""
+    words = shingle_words(text)
+    shingles = {
+        " ".join(words[i:i + SHINGLE_WORDS])
+        for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    }
+    hashes = np.array([zlib.crc32(s.encode('utf-8')) for s in shingles], dtype=np.uint64) % MERSENNE_PRIME
+    # (a * x + b) mod p for every permutation and shingle at once; with
+    # a, x < 2^31 the product fits in uint64
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+
+def find_near_duplicates(texts, threshold=0.75):
+    """
+    Flag near-duplicate pairs with MinHash LSH banding
+
+    Returns {index: (earlier_index, estimated_similarity)} for every text
+    that closely matches an earlier one.
+    """
+    if len(texts) < 2:
+        return {}
+
+    signatures = np.stack([minhash_signature(text) for text in texts])
+    rows_per_band = NUM_PERMUTATIONS // BANDS
+
+    candidates = set()
+    for band in range(BANDS):
+        buckets = {}
+        band_slice = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for i, row in enumerate(band_slice):
+            buckets.setdefault(row.tobytes(), []).append(i)
+        for members in buckets.values():
+            for j in range(1, len(members)):
+                candidates.add((members[0], members[j]))
+
+    flagged = {}
+    for first, other in sorted(candidates):
+        similarity = float(np.mean(signatures[first] == signatures[other]))
+        if similarity >= threshold and other not in flagged:
+            flagged[other] = (first, similarity)
+    return flagged
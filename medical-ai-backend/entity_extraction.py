@@ -0,0 +1,264 @@
+"""
+Entity Extraction
+Module-level regex and lexicon extractors for one record section, plus a
+process pool that runs them for large batches outside the GIL
+"""
+
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from medication_lexicon import get_medication_lexicon
+
+
+# Process pool for batch extraction; 0 keeps extraction on the request thread
+EXTRACTION_PROCESSES = int(os.environ.get("EXTRACTION_PROCESSES", 0))
+# Below this many uncached sections the IPC costs more than it saves
+EXTRACTION_POOL_MIN_SECTIONS = int(os.environ.get("EXTRACTION_POOL_MIN_SECTIONS", 64))
+# Seconds before a broken pool is started again
+EXTRACTION_POOL_RESTART_DELAY = float(os.environ.get("EXTRACTION_POOL_RESTART_DELAY", 1.0))
+
+# Suffix heuristics, only used when the lexicon file can't be loaded
+FALLBACK_MEDICATION_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'\b\w+cillin\b',  # antibiotics
+        r'\b\w+pril\b',    # ACE inhibitors
+        r'\b\w+statin\b',  # statins
+        r'lisinopril\b', r'metformin\b', r'aspirin\b'
+    )
+]
+
+CONDITION_KEYWORDS = [
+    "hypertension", "diabetes", "asthma", "arthritis", "infection",
+    "pneumonia", "bronchitis", "allergies", "depression", "anxiety",
+    "high blood pressure", "elevated blood pressure"
+]
+
+INSTRUCTION_KEYWORDS = ["take", "avoid", "follow up", "return if", "call if", "monitor"]
+
+DATE_PATTERN = re.compile(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b')
+BP_PATTERN = re.compile(r'(\d{2,3})/(\d{2,3})')
+TEMPERATURE_PATTERN = re.compile(r'(\d{2,3}\.?\d?)\s*°?[Ff]')
+LAB_VALUE_PATTERN = re.compile(r'(\w+):\s*(\d+\.?\d*)\s*([a-zA-Z/]+)?')
+
+
+def extract_medications(text, lexicon):
+    """Medication names as written, first mention of each drug"""
+    if lexicon is None:
+        medications = []
+        for pattern in FALLBACK_MEDICATION_PATTERNS:
+            medications.extend(pattern.findall(text))
+        return list(dict.fromkeys(medications))
+
+    medications = []
+    seen = set()
+    for name, matched_text, _, _ in lexicon.find(text):
+        if name not in seen:
+            medications.append(matched_text)
+            seen.add(name)
+    return medications
+
+
+def find_medications(text, lexicon):
+    """
+    (name, matched_text, start, end) for each medication mention, in text
+    order; names are the lexicon's canonical ones, or the lowercased match
+    of FALLBACK_MEDICATION_PATTERNS when there is no lexicon
+    """
+    if lexicon is not None:
+        return list(lexicon.find(text))
+    mentions = {}
+    for pattern in FALLBACK_MEDICATION_PATTERNS:
+        for match in pattern.finditer(text):
+            mentions.setdefault(match.start(), (match.group(0).lower(), match.group(0), match.start(), match.end()))
+    return [mentions[start] for start in sorted(mentions)]
+
+
+def extract_conditions(text):
+    text_lower = text.lower()
+    return [condition.title() for condition in CONDITION_KEYWORDS if condition in text_lower]
+
+
+def extract_dates(text):
+    return DATE_PATTERN.findall(text)
+
+
+def extract_medical_values(text):
+    """Blood pressure, temperature and "name: value unit" measurements"""
+    values = {}
+
+    bp_match = BP_PATTERN.search(text)
+    if bp_match:
+        values['blood_pressure'] = f"{bp_match.group(1)}/{bp_match.group(2)}"
+
+    temp_match = TEMPERATURE_PATTERN.search(text)
+    if temp_match:
+        values['temperature'] = f"{temp_match.group(1)}°F"
+
+    for match in LAB_VALUE_PATTERN.findall(text):
+        values[f'lab_{match[0].lower()}'] = f"{match[1]} {match[2]}"
+
+    return values
+
+
+def extract_instructions(text):
+    instructions = []
+    for sentence in text.split('.'):
+        sentence_lower = sentence.lower()
+        if any(keyword in sentence_lower for keyword in INSTRUCTION_KEYWORDS):
+            instructions.append(sentence.strip())
+    return instructions
+
+
+def extract_section_entities(section_text, lexicon):
+    """Entities extracted from a single section"""
+    return {
+        "medications": extract_medications(section_text, lexicon),
+        "conditions": extract_conditions(section_text),
+        "dates": extract_dates(section_text),
+        "values": extract_medical_values(section_text),
+        "instructions": extract_instructions(section_text)
+    }
+
+
+# Per-process warm state, set up once by the pool initializer
+_worker_lexicon = None
+
+
+def _init_worker():
+    global _worker_lexicon
+    _worker_lexicon = get_medication_lexicon()
+
+
+def _extract_in_worker(section_text):
+    return extract_section_entities(section_text, _worker_lexicon)
+
+
+def _forkserver_context():
+    """
+    Workers forked from a forkserver that has imported only this module
+
+    Forking the API server itself, once its models are loaded and its
+    threads are running, could copy a lock another thread held mid-update
+    into the child; the forkserver is a fresh single-threaded process, and
+    preloading this module (not __main__) keeps it from loading models.
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+class ExtractionPool:
+    def __init__(self, processes=EXTRACTION_PROCESSES, min_sections=EXTRACTION_POOL_MIN_SECTIONS):
+        """
+        Process pool for section extraction
+
+        Call start() before serving requests: the workers are started then
+        from a forkserver (see _forkserver_context), so they neither re-run
+        the server module the way spawned workers would nor inherit its
+        threads. Each keeps the compiled patterns and the medication
+        lexicon warm for its lifetime. Sections are sent in chunks of
+        several per task to amortize the pickling round trips. Until the
+        pool is started, and while a broken pool is restarted in the
+        background, batches are extracted inline.
+        """
+        self.processes = processes
+        self.min_sections = min_sections
+        self._executor = None
+        self._lock = threading.Lock()
+        self._restarting = False
+        self.pooled_sections = 0
+        self.inline_sections = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    @property
+    def enabled(self):
+        return self.processes > 0
+
+    def start(self):
+        """Start the workers now; returns how many are running"""
+        if not self.enabled:
+            return 0
+        executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=_forkserver_context(),
+                                       initializer=_init_worker)
+        # Workers are started as tasks queue up, so one task each starts them all
+        for future in [executor.submit(os.getpid) for _ in range(self.processes)]:
+            future.result()
+        with self._lock:
+            previous, self._executor = self._executor, executor
+        if previous is not None:
+            previous.shutdown(wait=False, cancel_futures=True)
+        return self.processes
+
+    def _restart(self):
+        time.sleep(EXTRACTION_POOL_RESTART_DELAY)
+        try:
+            self.start()
+            with self._lock:
+                self.restarts += 1
+        except Exception as e:
+            print(f"⚠️ Extraction pool restart failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._restarting = False
+
+    def chunksize(self, count):
+        # About four chunks per worker keeps them evenly loaded
+        return max(1, math.ceil(count / (self.processes * 4)))
+
+    def extract(self, sections, timeout=None):
+        """
+        Entities for each section, in order, or None when the batch is too
+        small to be worth sending to the pool, the pool isn't running or
+        the batch didn't finish in time
+        """
+        with self._lock:
+            executor = self._executor
+            if executor is None or len(sections) < self.min_sections:
+                self.inline_sections += len(sections)
+                return None
+        try:
+            results = list(executor.map(_extract_in_worker, sections,
+                                        timeout=timeout, chunksize=self.chunksize(len(sections))))
+        except FutureTimeout:
+            with self._lock:
+                self.timeouts += 1
+            return None
+        except BrokenProcessPool as e:
+            print(f"⚠️ Extraction pool failed, extracting inline: {str(e)}")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                restart = not self._restarting
+                self._restarting = True
+            executor.shutdown(wait=False, cancel_futures=True)
+            if restart:  # never on the request path
+                threading.Thread(target=self._restart, name="extraction-pool-restart", daemon=True).start()
+            return None
+        with self._lock:
+            self.pooled_sections += len(sections)
+        return results
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "min_sections": self.min_sections,
+                "pooled_sections": self.pooled_sections,
+                "inline_sections": self.inline_sections,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+                "running": self._executor is not None
+            }
@@ -0,0 +1,159 @@
+"""
+HTTP Payload Encoding
+Fast JSON serialization with a stdlib fallback, Accept-Encoding negotiated
+response compression, and gzip-compressed request bodies
+"""
+
+import gzip
+import io
+import json
+import os
+import zlib
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MIN_COMPRESS_BYTES = int(os.environ.get("MIN_COMPRESS_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))  # 11 is too slow for per-request use
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson when it is installed
+
+    Anything orjson can't encode (Decimal, custom classes) and explicitly
+    indented output go through the stdlib encoder, so responses never fail
+    because of the fast path. Responses stay compact in debug mode too,
+    otherwise Flask asks for indentation and every response takes the slow
+    path.
+    """
+
+    compact = True
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and "indent" not in kwargs:
+            try:
+                return orjson.dumps(obj, option=self._orjson_options()).decode("utf-8")
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+def choose_encoding(accept_encodings):
+    """Best supported content coding from a parsed Accept-Encoding header"""
+    if brotli is not None and accept_encodings["br"] > 0:
+        return "br"
+    if accept_encodings["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def compress_response(response, accept_encodings):
+    """
+    Compress a buffered response body in place when the client accepts it
+
+    Streamed responses, small bodies, non-text types and responses that are
+    already encoded are left alone.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return response
+
+    encoding = choose_encoding(accept_encodings)
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+def gunzip_limited(data, max_bytes):
+    """Decompress a gzip body, refusing output larger than max_bytes"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    output = decompressor.decompress(data, max_bytes + 1)
+    if len(output) > max_bytes or decompressor.unconsumed_tail:
+        raise RequestTooLarge(f"Decompressed request body exceeds {max_bytes} bytes")
+    if not decompressor.eof:
+        raise zlib.error("Truncated gzip request body")
+    return output
+
+
+class GzipRequestMiddleware:
+    """
+    WSGI middleware that inflates "Content-Encoding: gzip" request bodies
+
+    The decompressed size is checked against limit_for_path(path), so a
+    small compressed upload can't expand past the endpoint's body limit.
+    Downstream code sees an ordinary uncompressed body.
+    """
+
+    def __init__(self, wsgi_app, limit_for_path):
+        self.wsgi_app = wsgi_app
+        self.limit_for_path = limit_for_path
+
+    def __call__(self, environ, start_response):
+        if environ.get("HTTP_CONTENT_ENCODING", "").strip().lower() != "gzip":
+            return self.wsgi_app(environ, start_response)
+
+        limit = self.limit_for_path(environ.get("PATH_INFO", ""))
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        if length > limit:
+            return self._error(start_response, "413 Request Entity Too Large",
+                               f"Request body too large ({length} bytes, limit {limit})")
+        body = environ["wsgi.input"].read(length) if length else b""
+        try:
+            data = gunzip_limited(body, limit)
+        except RequestTooLarge as e:
+            return self._error(start_response, "413 Request Entity Too Large", str(e))
+        except zlib.error:
+            return self._error(start_response, "400 Bad Request", "Request body is not valid gzip")
+
+        environ["wsgi.input"] = io.BytesIO(data)
+        environ["CONTENT_LENGTH"] = str(len(data))
+        del environ["HTTP_CONTENT_ENCODING"]
+        return self.wsgi_app(environ, start_response)
+
+    @staticmethod
+    def _error(start_response, status, message):
+        payload = json.dumps({"success": False, "error": message}).encode("utf-8")
+        start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(payload)))])
+        return [payload]
@@ -0,0 +1,400 @@
+"""
+Medical Knowledge Base
+Semantic categories loaded from versioned data files, embedded into one
+matrix, hot-reloaded with an atomic snapshot swap, and served per tenant or
+locale from a memory-budgeted registry. With a shared matrix store,
+worker processes map one copy of each KB version instead of building their
+own
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_KB_PATH = os.environ.get("KNOWLEDGE_BASE_PATH", os.path.join(DATA_DIR, "knowledge_base.json"))
+KB_DIRECTORY = os.environ.get("KNOWLEDGE_BASE_DIR", os.path.join(DATA_DIR, "knowledge_bases"))
+KB_CACHE_DIR = os.environ.get("KNOWLEDGE_BASE_CACHE_DIR", os.path.join(DATA_DIR, "kb_cache"))
+KB_RELOAD_INTERVAL = float(os.environ.get("KB_RELOAD_INTERVAL", 2.0))
+KB_MEMORY_BUDGET_MB = float(os.environ.get("KB_MEMORY_BUDGET_MB", 64))
+
+DEFAULT_KB_NAME = "default"
+KB_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_.-]{0,63}$")
+
+
+def _cache_path(cache_dir, fingerprint, model_name):
+    return os.path.join(cache_dir, f"{fingerprint[:16]}-{model_name}.npz")
+
+
+def load_pattern_cache(cache_dir, fingerprint, model_name):
+    """Precomputed pattern embeddings for one KB file version, or {}"""
+    if not cache_dir:
+        return {}
+    try:
+        with np.load(_cache_path(cache_dir, fingerprint, model_name)) as cached:
+            return dict(zip(cached["patterns"].tolist(), cached["vectors"]))
+    except (OSError, KeyError, ValueError):
+        return {}
+
+
+def unique_patterns(document):
+    return list(dict.fromkeys(
+        pattern for entry in document.get("entries", []) for pattern in entry.get("patterns", [])
+    ))
+
+
+def save_pattern_cache(cache_dir, fingerprint, model_name, pattern_vectors):
+    if not cache_dir or not pattern_vectors:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, fingerprint, model_name)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, patterns=np.array(list(pattern_vectors)),
+             vectors=np.stack(list(pattern_vectors.values())))
+    os.replace(tmp_path, path)
+
+
+class KnowledgeBase:
+    """
+    Immutable snapshot of one knowledge base version
+
+    Requests take a snapshot once and use it throughout, so a reload that
+    swaps in a new version never changes a KB under a request in flight.
+    """
+
+    def __init__(self, version, fingerprint, entries, pattern_vectors):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.entries = entries
+        self.pattern_vectors = pattern_vectors
+
+        rows = []
+        self.categories = []
+        for entry in entries:
+            vectors = [pattern_vectors[p] for p in entry["patterns"] if p in pattern_vectors]
+            if vectors:
+                rows.append(np.mean(vectors, axis=0))
+                self.categories.append(entry)
+        matrix = np.array(rows, dtype=np.float32).reshape(len(rows), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+    @property
+    def key(self):
+        """Version tag for cache keys: the declared version plus content hash"""
+        return f"v{self.version}-{self.fingerprint[:12]}"
+
+    def __len__(self):
+        return len(self.categories)
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes + sum(vector.nbytes for vector in self.pattern_vectors.values())
+
+    @classmethod
+    def build(cls, document, embed_fn, previous=None, fingerprint="", known=None):
+        """
+        Embed a parsed KB document, reusing pattern embeddings from the
+        previous snapshot (or a precomputed cache) so only new or changed
+        patterns are embedded
+        """
+        entries = document["entries"]
+        for entry in entries:
+            if not entry.get("category") or not entry.get("patterns"):
+                raise ValueError(f"Knowledge base entry needs a category and patterns: {entry!r}")
+
+        known = dict(known or {})
+        if previous is not None:
+            known.update(previous.pattern_vectors)
+        pattern_vectors = {}
+        embedded = 0
+        for entry in entries:
+            for pattern in entry["patterns"]:
+                if pattern in pattern_vectors:
+                    continue
+                if pattern in known:
+                    pattern_vectors[pattern] = known[pattern]
+                    continue
+                vector = embed_fn(pattern)
+                embedded += 1
+                if vector is not None:
+                    pattern_vectors[pattern] = np.asarray(vector, dtype=np.float32).flatten()
+
+        kb = cls(document.get("version", 0), fingerprint, entries, pattern_vectors)
+        kb.patterns_embedded = embedded
+        return kb
+
+    @classmethod
+    def from_file(cls, path, embed_fn, previous=None, cache_dir=None, model_name="embeddings", shared=None):
+        """
+        Load a KB file, using and refreshing the precomputed embedding
+        cache for this exact file content when cache_dir is given
+
+        With a shared matrix store, a version another process already
+        published is mapped instead of loaded or embedded, and a new one is
+        published for the others.
+        """
+        with open(path, "rb") as f:
+            raw = f.read()
+        fingerprint = hashlib.sha256(raw).hexdigest()
+        document = json.loads(raw)
+        # The path hash keeps KBs that share a basename (a registry entry
+        # named like the default KB) from replacing each other's segments
+        path_hash = hashlib.sha256(os.path.realpath(path).encode("utf-8")).hexdigest()[:8]
+        segment = f"kb-{os.path.splitext(os.path.basename(path))[0]}-{path_hash}"
+        segment_version = f"{fingerprint[:16]}-{model_name}"
+
+        known = None
+        if shared is not None:
+            patterns = unique_patterns(document)
+            vectors = shared.attach(segment, segment_version)
+            if vectors is not None and len(vectors) == len(patterns):
+                known = dict(zip(patterns, vectors))
+        if known is None:
+            known = load_pattern_cache(cache_dir, fingerprint, model_name)
+
+        kb = cls.build(document, embed_fn, previous, fingerprint, known)
+        if kb.patterns_embedded:
+            save_pattern_cache(cache_dir, fingerprint, model_name, kb.pattern_vectors)
+        if shared is not None:
+            kb.share(shared, segment, segment_version)
+        return kb
+
+    def share(self, store, segment, segment_version):
+        """Swap this snapshot's arrays for read-only views of shared segments"""
+        if not self.pattern_vectors:
+            return
+        patterns = list(self.pattern_vectors)
+        vectors = store.publish(segment, segment_version, lambda: np.stack(list(self.pattern_vectors.values())))
+        if vectors is not None and len(vectors) == len(patterns):
+            self.pattern_vectors = dict(zip(patterns, vectors))
+        matrix = store.publish(f"{segment}-categories", segment_version, lambda: self.matrix)
+        if matrix is not None and matrix.shape == self.matrix.shape:
+            self.matrix = matrix
+
+    def match(self, text_embedding, top_k=3):
+        """Top-k categories by cosine similarity, best first"""
+        if not len(self):
+            return []
+        query = np.asarray(text_embedding, dtype=np.float32).flatten()
+        norm = np.linalg.norm(query)
+        similarities = self.matrix @ (query / norm) if norm else np.zeros(len(self))
+        order = np.argsort(-similarities, kind="stable")[:top_k]
+        return [
+            {
+                "category": self.categories[i]["category"],
+                "similarity": float(similarities[i]),
+                "score": float(similarities[i]),
+                "responses": self.categories[i]["responses"],
+                "patterns": self.categories[i]["patterns"]
+            }
+            for i in order
+        ]
+
+
+class KnowledgeBaseSource:
+    def __init__(self, path, embed_fn, watch=True, interval=KB_RELOAD_INTERVAL, cache_dir=None,
+                 model_name="embeddings", shared=None):
+        """
+        Load a KB file and, when watch is set, poll it for changes
+
+        A changed file is parsed and embedded on the watcher thread; the new
+        snapshot replaces `current` in a single assignment. A file that
+        fails to parse or validate is reported and the current version
+        keeps serving.
+        """
+        self.path = path
+        self.embed_fn = embed_fn
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.shared = shared
+        self.reloads = 0
+        self.failed_reloads = 0
+        self._reload_lock = threading.Lock()
+        self._stat = self._file_stat()
+        self.current = KnowledgeBase.from_file(path, embed_fn, cache_dir=cache_dir, model_name=model_name,
+                                               shared=shared)
+
+        self._stop = threading.Event()
+        self._thread = None
+        if watch:
+            self._thread = threading.Thread(target=self._watch, name="kb-watcher", daemon=True)
+            self._thread.start()
+
+    def _file_stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.reload_if_changed()
+
+    def reload_if_changed(self):
+        try:
+            if self._file_stat() != self._stat:
+                self.reload()
+        except OSError:
+            pass  # mid-replace or removed; try again next interval
+
+    def reload(self):
+        """Rebuild from the file if its content changed; returns the live snapshot"""
+        with self._reload_lock:
+            self._stat = self._file_stat()
+            previous = self.current
+            try:
+                start = time.perf_counter()
+                candidate = KnowledgeBase.from_file(self.path, self.embed_fn, previous,
+                                                    self.cache_dir, self.model_name, self.shared)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.failed_reloads += 1
+                print(f"⚠️ Knowledge base reload failed, keeping {previous.key}: {str(e)}")
+                return previous
+
+            if candidate.fingerprint != previous.fingerprint:
+                self.current = candidate
+                self.reloads += 1
+                print(f"🔄 Knowledge base {previous.key} -> {candidate.key}: {len(candidate)} categories, "
+                      f"{candidate.patterns_embedded} patterns embedded in {time.perf_counter() - start:.2f}s")
+            return self.current
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self):
+        kb = self.current
+        return {
+            "version": kb.key,
+            "categories": len(kb),
+            "patterns": len(kb.pattern_vectors),
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads
+        }
+
+
+class KnowledgeBaseRegistry:
+    def __init__(self, embed_fn, model_name, default_path=DEFAULT_KB_PATH, directory=KB_DIRECTORY,
+                 cache_dir=KB_CACHE_DIR, budget_mb=KB_MEMORY_BUDGET_MB, watch=True, interval=KB_RELOAD_INTERVAL,
+                 shared=None):
+        """
+        Named knowledge bases, e.g. per clinic or locale
+
+        <directory>/<name>.json files load on first use, from the embedding
+        cache when this file version was embedded before. Least recently
+        used KBs are evicted when their matrices exceed budget_mb; the
+        default KB is always resident. One watcher thread hot-reloads every
+        resident KB. shared is an optional SharedMatrixStore.
+        """
+        self.embed_fn = embed_fn
+        self.model_name = model_name
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.shared = shared
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.default = KnowledgeBaseSource(default_path, embed_fn, watch=False, cache_dir=cache_dir,
+                                           model_name=model_name, shared=shared)
+        self._sources = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+        self._stop = threading.Event()
+        if watch:
+            threading.Thread(target=self._watch, args=(interval,), name="kb-watcher", daemon=True).start()
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            with self._lock:
+                sources = [self.default] + list(self._sources.values())
+            for source in sources:
+                source.reload_if_changed()
+
+    def path_for(self, name):
+        if not KB_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid knowledge base name: {name!r}")
+        return os.path.join(self.directory, f"{name}.json")
+
+    def exists(self, name):
+        return name == DEFAULT_KB_NAME or os.path.exists(self.path_for(name))
+
+    def get(self, name=None):
+        """
+        Live snapshot of a named KB (the default for None)
+
+        Raises ValueError for a malformed name and LookupError when no such
+        KB file exists.
+        """
+        if name is None or name == DEFAULT_KB_NAME:
+            return self.default.current
+        with self._lock:
+            source = self._sources.get(name)
+            if source is not None:
+                self._sources.move_to_end(name)
+                self.hits += 1
+                return source.current
+
+        path = self.path_for(name)
+        with self._load_lock:
+            with self._lock:
+                source = self._sources.get(name)
+                if source is not None:
+                    self._sources.move_to_end(name)
+                    return source.current
+            if not os.path.exists(path):
+                raise LookupError(f"No knowledge base named {name!r}")
+
+            start = time.perf_counter()
+            source = KnowledgeBaseSource(path, self.embed_fn, watch=False, cache_dir=self.cache_dir,
+                                         model_name=self.model_name, shared=self.shared)
+            print(f"📚 Knowledge base {name} {source.current.key} loaded in "
+                  f"{(time.perf_counter() - start) * 1000:.1f}ms "
+                  f"({source.current.patterns_embedded} patterns embedded)")
+            with self._lock:
+                self._sources[name] = source
+                self.loads += 1
+                self._evict(keep=name)
+            return source.current
+
+    def resolve(self, candidates):
+        """Snapshot for the first candidate name that exists, else the default"""
+        for name in candidates:
+            if name and KB_NAME_PATTERN.match(name) and self.exists(name):
+                return self.get(name)
+        return self.default.current
+
+    def _evict(self, keep):
+        """Drop least recently used KBs over the budget; caller holds _lock"""
+        for name in list(self._sources):
+            if self._resident_bytes() <= self.budget_bytes:
+                break
+            if name != keep:
+                del self._sources[name]
+                self.evictions += 1
+                print(f"♻️ Evicted knowledge base {name} to stay within the memory budget")
+
+    def _resident_bytes(self):
+        return sum(source.current.nbytes for source in self._sources.values())
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "default": self.default.stats(),
+                "resident": {name: source.current.key for name, source in self._sources.items()},
+                "resident_mb": round(self._resident_bytes() / (1024 * 1024), 2),
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
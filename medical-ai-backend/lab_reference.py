@@ -0,0 +1,216 @@
+"""
+Lab Reference Table
+Data-driven lab analytes, unit conversions and reference ranges, with all
+values found in a report classified low/normal/high in one NumPy pass
+"""
+
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+
+DEFAULT_TABLE_PATH = os.environ.get(
+    "LAB_REFERENCE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lab_reference.json")
+)
+
+STATUS_LOW = -1
+STATUS_NORMAL = 0
+STATUS_HIGH = 1
+STATUS_UNKNOWN = 2
+STATUS_NAMES = {STATUS_LOW: "low", STATUS_NORMAL: "normal", STATUS_HIGH: "high"}
+
+NUMBER = r'(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)'
+UNIT = r'((?:[x×]\s*10\s*\^?\s*[0-9³⁶⁹¹²]+\s*)?[a-zA-Zμµ%]*(?:\s*/\s*[a-zA-Zμµ]+)?)'
+
+INLINE_RANGE_PATTERN = re.compile(
+    r'(?:normal|ref(?:erence)?)(?:\s*range)?\s*[:=]?\s*' + NUMBER +
+    r'\s*[^\d\s\-–]*\s*[-–]\s*' + NUMBER,
+    re.IGNORECASE
+)
+MARKER_PATTERN = re.compile(r'[-–]\s*(LOW|HIGH|NORMAL)\b', re.IGNORECASE)
+MARKER_STATUS = {"low": STATUS_LOW, "normal": STATUS_NORMAL, "high": STATUS_HIGH}
+
+SUPERSCRIPTS = str.maketrans({"³": "3", "⁶": "6", "⁹": "9", "¹": "1", "²": "2", "μ": "u", "µ": "u", "×": "x"})
+
+
+def normalize_unit(unit):
+    """Canonical spelling of a unit so 'x10³/μL', 'x10^3/uL' and 'X10³/µl' compare equal"""
+    return re.sub(r'[\s^]', '', unit.translate(SUPERSCRIPTS).lower())
+
+
+def parse_number(value):
+    return float(value.replace(',', ''))
+
+
+class LabReferenceTable:
+    def __init__(self, table):
+        """Build the lookup arrays from a parsed reference table"""
+        analytes = table["analytes"]
+        self.version = table.get("version", 1)
+        self.names = [a["name"] for a in analytes]
+        self.name_index = {name: position for position, name in enumerate(self.names)}
+        self.units = [a["unit"] for a in analytes]
+        self.meanings = [(a.get("low_meaning", "a low value"), a.get("high_meaning", "a high value"))
+                         for a in analytes]
+
+        # Reference ranges and plausible bounds as contiguous arrays, indexed
+        # by analyte, so classification cost doesn't grow with the table
+        self.low = np.array([a["range"][0] for a in analytes], dtype=np.float64)
+        self.high = np.array([a["range"][1] for a in analytes], dtype=np.float64)
+        self.plausible_low = np.array([a.get("plausible", [-np.inf, np.inf])[0] for a in analytes], dtype=np.float64)
+        self.plausible_high = np.array([a.get("plausible", [-np.inf, np.inf])[1] for a in analytes], dtype=np.float64)
+
+        self.conversions = [
+            {normalize_unit(unit): float(factor) for unit, factor in a["conversions"].items()}
+            for a in analytes
+        ]
+
+        self.alias_index = {}
+        for position, analyte in enumerate(analytes):
+            for alias in analyte["aliases"]:
+                self.alias_index[alias.lower()] = position
+
+        # One alternation over every alias, longest first so "hemoglobin a1c"
+        # wins over "hemoglobin"
+        aliases = sorted(self.alias_index, key=len, reverse=True)
+        self.value_pattern = re.compile(
+            r'(?<![A-Za-z])(' + '|'.join(re.escape(alias) for alias in aliases) + r')(?![A-Za-z])'
+            r'[^\d\n]{0,20}?' + NUMBER + r'\s*' + UNIT,
+            re.IGNORECASE
+        )
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_TABLE_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _conversion_factor(self, analyte, unit, value):
+        """Factor to the canonical unit, inferring the unit when it's missing or unknown"""
+        factors = self.conversions[analyte]
+        factor = factors.get(normalize_unit(unit)) if unit else None
+        if factor is not None:
+            return factor
+
+        for candidate in factors.values():
+            if self.plausible_low[analyte] <= value * candidate <= self.plausible_high[analyte]:
+                return candidate
+        return np.nan
+
+    def extract(self, medical_text):
+        """Find every lab value in the text, with any inline range or LOW/HIGH marker"""
+        matches = list(self.value_pattern.finditer(medical_text))
+        rows = []
+
+        for position, match in enumerate(matches):
+            # Inline range and markers belong to this value only if they sit on
+            # the same line and before the next analyte
+            tail_end = medical_text.find('\n', match.end())
+            if tail_end == -1:
+                tail_end = len(medical_text)
+            if position + 1 < len(matches):
+                tail_end = min(tail_end, matches[position + 1].start())
+            tail = medical_text[match.end():tail_end]
+
+            analyte = self.alias_index[match.group(1).lower()]
+            raw_value = parse_number(match.group(2))
+            unit = match.group(3).strip()
+
+            inline_low = inline_high = np.nan
+            range_match = INLINE_RANGE_PATTERN.search(tail)
+            if range_match:
+                inline_low = parse_number(range_match.group(1))
+                inline_high = parse_number(range_match.group(2))
+
+            marker_match = MARKER_PATTERN.search(tail)
+            marker = MARKER_STATUS[marker_match.group(1).lower()] if marker_match else STATUS_UNKNOWN
+
+            rows.append((analyte, raw_value, unit, self._conversion_factor(analyte, unit, raw_value),
+                         inline_low, inline_high, marker))
+
+        return rows
+
+    def classify(self, medical_text):
+        """
+        Classify every lab value in a report as low, normal or high
+
+        Inline reference ranges in the text take precedence over the table;
+        an explicit LOW/HIGH marker is only used when the value can't be
+        compared against any range.
+        """
+        rows = self.extract(medical_text)
+        if not rows:
+            return []
+
+        analytes = np.array([r[0] for r in rows], dtype=np.intp)
+        raw = np.array([r[1] for r in rows], dtype=np.float64)
+        factor = np.array([r[3] for r in rows], dtype=np.float64)
+        inline_low = np.array([r[4] for r in rows], dtype=np.float64)
+        inline_high = np.array([r[5] for r in rows], dtype=np.float64)
+        marker = np.array([r[6] for r in rows], dtype=np.int8)
+
+        # Inline ranges are written in the report's own units, so compare the
+        # raw value; table ranges are canonical, so compare the converted value
+        has_inline = ~np.isnan(inline_low)
+        value = np.where(has_inline, raw, raw * factor)
+        low = np.where(has_inline, inline_low, self.low[analytes])
+        high = np.where(has_inline, inline_high, self.high[analytes])
+
+        status = np.select([value < low, value > high], [STATUS_LOW, STATUS_HIGH], STATUS_NORMAL)
+        status = np.where(np.isnan(value), marker, status)
+
+        results = []
+        for i, row in enumerate(rows):
+            if status[i] == STATUS_UNKNOWN:
+                continue
+            results.append({
+                "analyte": self.names[analytes[i]],
+                "value": float(raw[i]),
+                "unit": row[2] or None,
+                "canonical_value": None if np.isnan(raw[i] * factor[i]) else float(raw[i] * factor[i]),
+                "canonical_unit": self.units[analytes[i]],
+                "status": STATUS_NAMES[int(status[i])],
+                "range_source": "inline" if has_inline[i] else ("marker" if np.isnan(value[i]) else "reference"),
+                "reference_range": None if np.isnan(value[i]) else [float(low[i]), float(high[i])]
+            })
+        return results
+
+    def interpret(self, medical_text):
+        """Patient-friendly interpretation of each analyte's first reported value"""
+        interpretations = []
+        seen = set()
+
+        for result in self.classify(medical_text):
+            name = result["analyte"]
+            if name in seen:
+                continue
+            seen.add(name)
+
+            low_meaning, high_meaning = self.meanings[self.name_index[name]]
+            value = f"{result['value']:g}"
+            if result["status"] == "low":
+                interpretations.append(f"Your {name} is low ({value}) indicating {low_meaning}")
+            elif result["status"] == "high":
+                interpretations.append(f"Your {name} is elevated ({value}) suggesting {high_meaning}")
+            else:
+                interpretations.append(f"Your {name} is normal ({value})")
+
+        return interpretations
+
+
+_default_table = None
+_default_table_lock = threading.Lock()
+
+
+def get_lab_reference_table(path=DEFAULT_TABLE_PATH):
+    """Load the shared reference table once per process"""
+    global _default_table
+    if _default_table is None:
+        with _default_table_lock:
+            if _default_table is None:
+                _default_table = LabReferenceTable.from_file(path)
+                print(f"🧪 Lab reference table v{_default_table.version}: {len(_default_table.names)} analytes")
+    return _default_table
@@ -3,121 +3,163 @@ Medical AI Service using Real LLMware
 Combines embedding models with intelligent response generation for medical records
 """
 
+import hashlib
 import json
+import os
 import re
 import numpy as np
 from typing import Dict, Any, List, Tuple
-from llmware.models import ModelCatalog
 import time
 
+from section_cache import SectionCache, merge_section_entities
+from knowledge_base import KnowledgeBaseRegistry
+from medication_lexicon import get_medication_lexicon
+from lab_reference import get_lab_reference_table
+import entity_extraction
+from shared_matrices import get_shared_matrix_store
+
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Phrases whose embeddings anchor each risk level
+RISK_PATTERNS = {
+    "high": ["emergency", "critical", "severe", "acute", "urgent", "abnormal", "elevated"],
+    "medium": ["borderline", "mild", "monitor", "follow-up", "recheck"],
+    "low": ["normal", "stable", "routine", "within limits", "healthy"]
+}
+
+# Dose immediately following a medication name, e.g. "Lisinopril 10mg"
+DOSE_PATTERN = re.compile(r'\s*(\d+(?:\.\d+)?\s*(?:mg|ml|mcg|units?|g)\b)', re.IGNORECASE)
+
+# Softmax temperature turning cosine similarities into confidences; with
+# 0.05, a lead of 0.05 over the runner-up is roughly 0.73
+MATCH_TEMPERATURE = float(os.environ.get("MATCH_CONFIDENCE_TEMPERATURE", 0.05))
+
+
+def match_confidence(scores, chosen=0):
+    """
+    Confidence in scores[chosen] against the alternatives: its softmax
+    share over the similarities, so a clear winner scores near 1 and a
+    near-tie near 1/len(scores). 0.5 without alternatives to compare.
+    """
+    if len(scores) < 2:
+        return 0.5
+    weights = np.exp((np.asarray(scores, dtype=np.float64) - max(scores)) / MATCH_TEMPERATURE)
+    return float(weights[chosen] / weights.sum())
+
 
 class LLMwareMedicalAIService:
     def __init__(self):
         """Initialize the medical AI service with real LLMware models."""
         self.embedding_model = None
-        self.medical_knowledge_base = None
+        self.knowledge_base = None
+        self.knowledge_bases = None
+        self.risk_prototypes = None
+        self.section_cache = None
         self.model_loaded = False
+        # Read-only matrices mapped from one copy per host (SHARED_MATRIX_DIR)
+        self.shared_matrices = get_shared_matrix_store()
+        self.medication_lexicon = get_medication_lexicon()
+        self.lab_reference = get_lab_reference_table()
         self.load_models()
         
     def load_models(self):
         """Load LLMware embedding models for semantic understanding"""
         try:
             print("🤖 Loading LLMware embedding model...")
+            from llmware.models import ModelCatalog  # deferred: importing llmware is slow
             catalog = ModelCatalog()
             
             # Load the embedding model that we confirmed works
-            self.embedding_model = catalog.load_model("all-MiniLM-L6-v2")
+            self.embedding_model = catalog.load_model(EMBEDDING_MODEL)
             self.model_loaded = True
             
-            # Initialize medical knowledge base
-            self.medical_knowledge_base = self._create_medical_knowledge_base()
+            # Medical knowledge bases: data/knowledge_base.json plus named
+            # per-clinic / per-locale files loaded on first use, all reloaded
+            # in the background when their files change
+            self.knowledge_bases = KnowledgeBaseRegistry(self._embed_text, EMBEDDING_MODEL,
+                                                         shared=self.shared_matrices)
+            self.knowledge_base = self.knowledge_bases.default
+            self.risk_prototypes = self._create_risk_prototypes()
+            
+            # Per-section embeddings and entities, so edited records only
+            # recompute the sections that changed
+            self.section_cache = SectionCache(self._embed_text, self._extract_section_entities)
             
             print("✅ Real LLMware AI Service initialized successfully!")
             print(f"📊 Model: all-MiniLM-L6-v2 (384-dimensional embeddings)")
-            print(f"🏥 Medical knowledge base: {len(self.medical_knowledge_base)} entries")
+            print(f"🏥 Medical knowledge base {self.knowledge_base.current.key}: {len(self.knowledge_base.current)} entries")
             
         except Exception as e:
             print(f"❌ Failed to load LLMware models: {str(e)}")
             self.model_loaded = False
     
-    def _create_medical_knowledge_base(self):
-        """Create a medical knowledge base with embeddings for semantic matching"""
-        knowledge_entries = [
-            {
-                "category": "blood_pressure",
-                "patterns": ["blood pressure", "bp", "hypertension", "140/90", "systolic", "diastolic"],
-                "responses": {
-                    "normal": "Your blood pressure reading is within the normal range (less than 120/80), which indicates good cardiovascular health.",
-                    "elevated": "Your blood pressure is elevated (120-129 systolic). This suggests you should monitor it more closely and consider lifestyle changes.",
-                    "high": "Your blood pressure reading indicates hypertension (140/90 or higher). This condition requires medical attention and may need treatment to reduce cardiovascular risks."
-                }
-            },
-            {
-                "category": "blood_tests",
-                "patterns": ["cbc", "complete blood count", "hemoglobin", "hematocrit", "wbc", "rbc", "platelet"],
-                "responses": {
-                    "normal": "Your blood test results show all values within normal ranges, indicating healthy blood cell counts and function.",
-                    "abnormal": "Some values in your blood test are outside normal ranges. Your healthcare provider will discuss what this means for your health.",
-                    "follow_up": "These blood test results provide important information about your health. Follow up with your doctor to discuss the findings."
-                }
-            },
-            {
-                "category": "medications",
-                "patterns": ["medication", "prescription", "take", "daily", "mg", "dosage", "pill"],
-                "responses": {
-                    "instruction": "This medication has been prescribed specifically for your condition. Take it exactly as directed by your healthcare provider.",
-                    "safety": "Always take medications as prescribed. Contact your pharmacist or doctor if you have questions about side effects or interactions.",
-                    "compliance": "Consistent medication adherence is important for managing your health condition effectively."
-                }
-            },
-            {
-                "category": "lab_results",
-                "patterns": ["glucose", "cholesterol", "triglycerides", "liver", "kidney", "thyroid"],
-                "responses": {
-                    "normal": "Your laboratory results are within normal limits, which is reassuring for your overall health.",
-                    "borderline": "Some of your lab values are borderline. Your doctor may recommend monitoring or lifestyle changes.",
-                    "abnormal": "These lab results show some values that need attention. Your healthcare team will help you understand next steps."
-                }
-            },
-            {
-                "category": "imaging",
-                "patterns": ["x-ray", "ct scan", "mri", "ultrasound", "imaging", "radiologist"],
-                "responses": {
-                    "normal": "Your imaging study shows normal findings with no acute abnormalities detected.",
-                    "follow_up": "The imaging results provide valuable information for your healthcare team to guide your treatment plan.",
-                    "specialist": "Based on the imaging findings, your doctor may recommend follow-up with a specialist if needed."
-                }
-            }
-        ]
-        
-        # Create embeddings for each knowledge entry
-        knowledge_base = []
-        for entry in knowledge_entries:
-            # Create embeddings for patterns
-            pattern_embeddings = []
-            for pattern in entry["patterns"]:
-                try:
-                    embedding = self.embedding_model.embedding(pattern)
-                    if embedding is not None:
-                        pattern_embeddings.append(np.array(embedding))
-                except:
-                    continue
-            
-            if pattern_embeddings:
-                # Average the embeddings for this category
-                avg_embedding = np.mean(pattern_embeddings, axis=0).flatten()  # Ensure 1D
-                knowledge_base.append({
-                    "category": entry["category"],
-                    "embedding": avg_embedding,
-                    "responses": entry["responses"],
-                    "patterns": entry["patterns"]
-                })
+    def _create_risk_prototypes(self):
+        """Embed the risk indicator phrases once instead of on every request"""
+        def embed_level(patterns):
+            embeddings = [e for e in (self._embed_text(pattern) for pattern in patterns) if e is not None]
+            return np.stack(embeddings) if embeddings else None
+        
+        prototypes = {}
+        for level, patterns in RISK_PATTERNS.items():
+            if self.shared_matrices is not None:
+                # Versioned by the phrases and model, so edits publish anew
+                version = hashlib.sha256(json.dumps(patterns).encode("utf-8")).hexdigest()[:16]
+                matrix = self.shared_matrices.publish(f"risk-{level}", f"{version}-{EMBEDDING_MODEL}",
+                                                      lambda: embed_level(patterns))
+            else:
+                matrix = embed_level(patterns)
+            if matrix is not None:
+                prototypes[level] = matrix
         
-        return knowledge_base
+        return prototypes
+    
+    def _embed_text(self, text):
+        """Embed a piece of text, returning a 1D vector or None on failure"""
+        try:
+            embedding = self.embedding_model.embedding(text)
+        except Exception:
+            return None
+        if embedding is None:
+            return None
+        return np.array(embedding).flatten()  # Ensure 1D
+    
+    def _analyze_document(self, medical_text):
+        """Section-level analysis of a record, reusing cached unchanged sections"""
+        analysis = self.section_cache.analyze_document(medical_text)
+        print(f"♻️ DEBUG - Sections recomputed: {analysis['sections_recomputed']}/{analysis['sections_total']}")
+        return analysis
+    
+    def embed_record(self, medical_text):
+        """Document embedding for indexing and search (None if unavailable)"""
+        if not self.model_loaded:
+            return None
+        return self.section_cache.analyze_document(medical_text)["embedding"]
+    
+    def _extract_section_entities(self, section_text):
+        """Entities extracted from a single section, cached alongside its embedding"""
+        return entity_extraction.extract_section_entities(section_text, self.medication_lexicon)
     
-    def create_patient_friendly_summary(self, medical_text, record_type="Medical Record"):
+    def prefetch_section_entities(self, medical_texts, pool, timeout=None):
         """
-        Create a patient-friendly summary using real LLMware embeddings
+        Run extraction for the uncached sections of a batch in the process
+        pool, so the analysis that follows only has to embed them
+
+        Returns how many sections were extracted in the pool.
+        """
+        if not self.model_loaded or not pool.enabled:
+            return 0
+        sections = self.section_cache.missing_sections(medical_texts)
+        entities = pool.extract(sections, timeout)
+        if entities is None:
+            return 0
+        self.section_cache.prefetch_entities(sections, entities)
+        return len(sections)
+    
+    def create_patient_friendly_summary(self, medical_text, record_type="Medical Record", knowledge_base=None):
+        """
+        Create a patient-friendly summary using real LLMware embeddings,
+        matched against knowledge_base (a snapshot; the default KB if None)
         """
         print(f"\n🔍 DEBUG - Summary Input:")
         print(f"📝 Medical Text: '{medical_text[:100]}...'")
@@ -130,17 +172,17 @@ class LLMwareMedicalAIService:
         try:
             # Get semantic understanding of the medical text
             print("🤖 DEBUG - Generating embeddings...")
-            text_embedding = self.embedding_model.embedding(medical_text)
+            text_embedding = self._analyze_document(medical_text)["embedding"]
             if text_embedding is None:
                 print("❌ DEBUG - Failed to generate embeddings")
                 return self._fallback_response(medical_text, "summary")
             
-            text_embedding = np.array(text_embedding).flatten()  # Ensure 1D
             print(f"📊 DEBUG - Embedding shape: {text_embedding.shape}")
             
-            # Find most relevant medical knowledge
+            # Find most relevant medical knowledge, in one KB snapshot
             print("🔍 DEBUG - Finding semantic matches...")
-            best_matches = self._find_semantic_matches(text_embedding, top_k=2)
+            knowledge_base = knowledge_base or self.knowledge_base.current
+            best_matches = self._find_semantic_matches(text_embedding, top_k=2, knowledge_base=knowledge_base)
             match_info = [(m['category'], f"{m['score']:.3f}") for m in best_matches]
             print(f"🎯 DEBUG - Best matches: {match_info}")
             
@@ -149,13 +191,16 @@ class LLMwareMedicalAIService:
             summary = self._generate_intelligent_summary(medical_text, best_matches, record_type)
             print(f"📄 DEBUG - Generated summary: '{summary[:100]}...'")
             
+            confidence = match_confidence([match['score'] for match in best_matches])
             return {
                 "summary": summary,
-                "confidence": float(best_matches[0]['score']) if best_matches else 0.5,
+                "confidence": confidence,
                 "ai_mode": "Real LLMware AI",
                 "semantic_analysis": {
                     "primary_match": best_matches[0]['category'] if best_matches else "general",
-                    "confidence": float(best_matches[0]['score']) if best_matches else 0.5
+                    "confidence": confidence,
+                    "similarity": float(best_matches[0]['score']) if best_matches else 0.0,
+                    "knowledge_base": knowledge_base.key
                 }
             }
             
@@ -163,7 +208,7 @@ class LLMwareMedicalAIService:
             print(f"Error in AI summary: {str(e)}")
             return self._fallback_response(medical_text, "summary")
     
-    def extract_key_information(self, medical_text):
+    def extract_key_information(self, medical_text, knowledge_base=None):
         """
         Extract key medical information using semantic understanding
         """
@@ -172,30 +217,36 @@ class LLMwareMedicalAIService:
         
         try:
             # Use embeddings to understand content semantically
-            text_embedding = self.embedding_model.embedding(medical_text)
+            analysis = self._analyze_document(medical_text)
+            text_embedding = analysis["embedding"]
             if text_embedding is None:
                 return self._fallback_response(medical_text, "extraction")
             
-            text_embedding = np.array(text_embedding).flatten()  # Ensure 1D
-            
             # Find semantic matches
-            matches = self._find_semantic_matches(text_embedding, top_k=3)
+            knowledge_base = knowledge_base or self.knowledge_base.current
+            matches = self._find_semantic_matches(text_embedding, top_k=3, knowledge_base=knowledge_base)
             
-            # Extract information based on semantic understanding
+            # Rebuild document-level entities from the cached sections
+            entities = merge_section_entities(analysis["section_entities"])
             key_info = {
                 "detected_categories": [match["category"] for match in matches],
                 "confidence_scores": [f"{match['similarity']:.2f}" for match in matches],
-                "medications": self._extract_medications(medical_text),
-                "conditions": self._extract_conditions_semantic(medical_text, matches),
-                "dates": self._extract_dates(medical_text),
-                "values": self._extract_medical_values(medical_text),
-                "instructions": self._extract_instructions(medical_text)
+                "medications": entities["medications"],
+                "conditions": entities["conditions"],
+                "dates": entities["dates"],
+                "values": entities["values"],
+                "instructions": entities["instructions"]
             }
             
             return {
                 "extracted_info": key_info,
-                "confidence": 0.82,
-                "model": "LLMware Semantic Analysis"
+                "confidence": match_confidence([match["similarity"] for match in matches]),
+                "model": "LLMware Semantic Analysis",
+                "knowledge_base": knowledge_base.key,
+                "incremental": {
+                    "sections_total": analysis["sections_total"],
+                    "sections_recomputed": analysis["sections_recomputed"]
+                }
             }
             
         except Exception as e:
@@ -210,33 +261,16 @@ class LLMwareMedicalAIService:
         
         try:
             # Semantic risk analysis
-            text_embedding = self.embedding_model.embedding(medical_text)
+            text_embedding = self._analyze_document(medical_text)["embedding"]
             if text_embedding is None:
                 return self._fallback_response(medical_text, "risk")
             
-            text_embedding = np.array(text_embedding).flatten()  # Ensure 1D
-            
-            # Risk indicators with embeddings
-            risk_patterns = {
-                "high": ["emergency", "critical", "severe", "acute", "urgent", "abnormal", "elevated"],
-                "medium": ["borderline", "mild", "monitor", "follow-up", "recheck"],
-                "low": ["normal", "stable", "routine", "within limits", "healthy"]
-            }
-            
+            # Compare against the precomputed risk indicator embeddings
             risk_scores = {}
-            for level, patterns in risk_patterns.items():
-                scores = []
-                for pattern in patterns:
-                    try:
-                        pattern_emb = self.embedding_model.embedding(pattern)
-                        if pattern_emb is not None:
-                            similarity = self._cosine_similarity(text_embedding, np.array(pattern_emb))
-                            scores.append(similarity)
-                    except:
-                        continue
-                
-                if scores:
-                    risk_scores[level] = max(scores)  # Take highest similarity
+            for level, prototypes in self.risk_prototypes.items():
+                norms = np.linalg.norm(prototypes, axis=1) * np.linalg.norm(text_embedding)
+                similarities = prototypes @ text_embedding / np.where(norms == 0, 1, norms)
+                risk_scores[level] = float(similarities.max())  # Take highest similarity
             
             # Determine risk level
             if risk_scores.get("high", 0) > 0.3:
@@ -253,45 +287,17 @@ class LLMwareMedicalAIService:
                 "risk_level": risk_level,
                 "explanation": explanation,
                 "semantic_scores": {k: float(v) for k, v in risk_scores.items()},  # Convert to float
-                "confidence": 0.78,
+                "confidence": match_confidence(list(risk_scores.values()),
+                                               list(risk_scores).index(risk_level.lower())),
                 "model": "LLMware Semantic Risk Analysis"
             }
             
         except Exception as e:
             return self._fallback_response(medical_text, "risk")
     
-    def _find_semantic_matches(self, text_embedding, top_k=3):
+    def _find_semantic_matches(self, text_embedding, top_k=3, knowledge_base=None):
         """Find the most semantically similar knowledge base entries"""
-        similarities = []
-        
-        for entry in self.medical_knowledge_base:
-            similarity = self._cosine_similarity(text_embedding, entry["embedding"])
-            similarities.append({
-                "category": entry["category"],
-                "similarity": float(similarity),  # Convert to regular Python float
-                "score": float(similarity),  # Add score field for consistency
-                "responses": entry["responses"],
-                "patterns": entry["patterns"]
-            })
-        
-        # Sort by similarity and return top k
-        similarities.sort(key=lambda x: x["similarity"], reverse=True)
-        return similarities[:top_k]
-    
-    def _cosine_similarity(self, a, b):
-        """Calculate cosine similarity between two vectors"""
-        # Ensure both vectors are 1D
-        a = np.array(a).flatten()
-        b = np.array(b).flatten()
-        
-        dot_product = np.dot(a, b)
-        norm_a = np.linalg.norm(a)
-        norm_b = np.linalg.norm(b)
-        
-        if norm_a == 0 or norm_b == 0:
-            return 0
-        
-        return dot_product / (norm_a * norm_b)
+        return (knowledge_base or self.knowledge_base.current).match(text_embedding, top_k)
     
     def _generate_intelligent_summary(self, medical_text, semantic_matches, record_type):
         """Generate summary based on semantic understanding and actual content"""
@@ -305,11 +311,10 @@ class LLMwareMedicalAIService:
         summary_parts = []
         text_lower = medical_text.lower()
         
-        # Check if this is a lab report and analyze values
-        if any(word in text_lower for word in ["hemoglobin", "hematocrit", "wbc", "white blood", "platelets", "lab", "blood count"]):
-            lab_analysis = self._analyze_lab_values(medical_text)
-            if lab_analysis:
-                summary_parts.extend(lab_analysis)
+        # Analyze any lab values against the reference table
+        lab_analysis = self._analyze_lab_values(medical_text)
+        if lab_analysis:
+            summary_parts.extend(lab_analysis)
         
         # Extract medications with dosages
         medications = self._extract_medications_detailed(medical_text)
@@ -349,111 +354,33 @@ class LLMwareMedicalAIService:
     
     def _analyze_lab_values(self, medical_text):
         """Analyze lab values and provide meaningful interpretations"""
-        interpretations = []
-        text_lines = medical_text.split('\n')
-        
-        # Lab value patterns with normal ranges and interpretations
-        lab_patterns = {
-            'hemoglobin': {
-                'pattern': r'hemoglobin[:\s]*(\d+\.?\d*)\s*g/dl',
-                'normal_range': (13.5, 17.5),
-                'low_meaning': 'anemia (low red blood cell count)',
-                'high_meaning': 'elevated hemoglobin levels'
-            },
-            'hematocrit': {
-                'pattern': r'hematocrit[:\s]*(\d+\.?\d*)\s*%',
-                'normal_range': (41, 53),
-                'low_meaning': 'low blood volume percentage',
-                'high_meaning': 'elevated blood volume percentage'
-            },
-            'white blood cells': {
-                'pattern': r'white blood cells?[:\s]*(\d+,?\d*)\s*/μl',
-                'normal_range': (4000, 11000),
-                'low_meaning': 'low white blood cell count (weakened immune system)',
-                'high_meaning': 'elevated white blood cell count (possible infection or inflammation)'
-            },
-            'platelets': {
-                'pattern': r'platelets[:\s]*(\d+,?\d*)\s*/μl',
-                'normal_range': (150000, 450000),
-                'low_meaning': 'low platelet count (bleeding risk)',
-                'high_meaning': 'elevated platelet count'
-            }
-        }
-        
-        import re
-        
-        for lab_name, lab_info in lab_patterns.items():
-            match = re.search(lab_info['pattern'], medical_text, re.IGNORECASE)
-            if match:
-                value_str = match.group(1).replace(',', '')
-                try:
-                    value = float(value_str)
-                    min_normal, max_normal = lab_info['normal_range']
-                    
-                    if value < min_normal:
-                        interpretations.append(f"Your {lab_name} is low ({value}) indicating {lab_info['low_meaning']}")
-                    elif value > max_normal:
-                        interpretations.append(f"Your {lab_name} is elevated ({value}) suggesting {lab_info['high_meaning']}")
-                    else:
-                        interpretations.append(f"Your {lab_name} is normal ({value})")
-                except ValueError:
-                    continue
-        
-        # Check for explicit LOW/HIGH markers in the text
-        for line in text_lines:
-            line = line.strip()
-            if '- LOW' in line.upper() or '- HIGH' in line.upper():
-                if 'hemoglobin' in line.lower() and '- low' in line.lower():
-                    if not any('hemoglobin' in interp for interp in interpretations):
-                        interpretations.append("Your hemoglobin is low, indicating anemia")
-                elif 'white blood' in line.lower() and '- high' in line.lower():
-                    if not any('white blood' in interp for interp in interpretations):
-                        interpretations.append("Your white blood cell count is elevated, suggesting possible infection")
-        
-        return interpretations
+        # Reference ranges come from data/lab_reference.json; inline
+        # "Normal range: ..." text in the report takes precedence
+        return self.lab_reference.interpret(medical_text)
     
     def _extract_medications_detailed(self, medical_text):
         """Extract medications with dosages"""
         medications = []
-        text = medical_text.lower()
-        
-        # Common medication patterns  
-        import re
-        
-        # Pattern to match medication name followed by dosage
-        pattern = r'\b([a-zA-Z]{3,})\s+(\d+\s*(?:mg|ml|mcg|units?|g)\b)'
-        matches = re.findall(pattern, medical_text, re.IGNORECASE)
         
         seen_meds = set()  # Prevent duplicates
-        for med_name, dosage in matches:
-            # Filter out common non-medication words
-            med_lower = med_name.lower()
-            if med_lower not in ['take', 'with', 'daily', 'twice', 'once', 'every', 'for']:
-                med_key = f"{med_name.lower()}_{dosage.lower()}"
-                if med_key not in seen_meds:
-                    medications.append({"name": med_name.title(), "dosage": dosage})
-                    seen_meds.add(med_key)
+        # Without the lexicon, the same fallback patterns as key_information
+        for name, matched_text, start, end in entity_extraction.find_medications(medical_text, self.medication_lexicon):
+            # Only drugs directly followed by a dose count
+            dose_match = DOSE_PATTERN.match(medical_text, end)
+            if not dose_match:
+                continue
+            dosage = dose_match.group(1)
+            med_key = f"{name}_{dosage.lower()}"
+            if med_key not in seen_meds:
+                medications.append({"name": matched_text.title(), "dosage": dosage})
+                seen_meds.add(med_key)
         
         print(f"🔍 DEBUG - Extracted medications: {medications}")
         return medications
     
     def _extract_conditions_from_text(self, medical_text):
         """Extract medical conditions from text"""
-        conditions = []
-        text_lower = medical_text.lower()
-        
-        # Common medical conditions
-        condition_keywords = [
-            "hypertension", "diabetes", "asthma", "arthritis", "infection", 
-            "pneumonia", "bronchitis", "allergies", "depression", "anxiety",
-            "high blood pressure", "elevated blood pressure"
-        ]
-        
-        for condition in condition_keywords:
-            if condition in text_lower:
-                conditions.append(condition.title())
-        
-        return list(set(conditions))  # Remove duplicates
+        return entity_extraction.extract_conditions(medical_text)
     
     def _extract_conditions_semantic(self, medical_text, semantic_matches):
         """Extract conditions using semantic matching"""
@@ -462,62 +389,19 @@ class LLMwareMedicalAIService:
     # Helper methods (same as before but with semantic enhancement)
     def _extract_medications(self, text):
         """Extract medication names"""
-        med_patterns = [
-            r'\b\w+cillin\b',  # antibiotics
-            r'\b\w+pril\b',    # ACE inhibitors
-            r'\b\w+statin\b',  # statins
-            r'lisinopril\b', r'metformin\b', r'aspirin\b'
-        ]
-        
-        medications = []
-        for pattern in med_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            medications.extend(matches)
-        
-        return list(set(medications))
+        return entity_extraction.extract_medications(text, self.medication_lexicon)
     
     def _extract_dates(self, text):
         """Extract dates from text"""
-        date_pattern = r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b'
-        return re.findall(date_pattern, text)
+        return entity_extraction.extract_dates(text)
     
     def _extract_medical_values(self, text):
         """Extract medical measurements and values"""
-        values = {}
-        
-        # Blood pressure
-        bp_pattern = r'(\d{2,3})/(\d{2,3})'
-        bp_match = re.search(bp_pattern, text)
-        if bp_match:
-            values['blood_pressure'] = f"{bp_match.group(1)}/{bp_match.group(2)}"
-        
-        # Temperature
-        temp_pattern = r'(\d{2,3}\.?\d?)\s*°?[Ff]'
-        temp_match = re.search(temp_pattern, text)
-        if temp_match:
-            values['temperature'] = f"{temp_match.group(1)}°F"
-        
-        # Lab values
-        lab_pattern = r'(\w+):\s*(\d+\.?\d*)\s*([a-zA-Z/]+)?'
-        lab_matches = re.findall(lab_pattern, text)
-        for match in lab_matches:
-            values[f'lab_{match[0].lower()}'] = f"{match[1]} {match[2]}"
-        
-        return values
+        return entity_extraction.extract_medical_values(text)
     
     def _extract_instructions(self, text):
         """Extract care instructions"""
-        instruction_keywords = ["take", "avoid", "follow up", "return if", "call if", "monitor"]
-        instructions = []
-        
-        sentences = text.split('.')
-        for sentence in sentences:
-            for keyword in instruction_keywords:
-                if keyword in sentence.lower():
-                    instructions.append(sentence.strip())
-                    break
-        
-        return instructions
+        return entity_extraction.extract_instructions(text)
     
     def _fallback_response(self, medical_text, response_type):
         """Fallback to basic responses if AI fails"""
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Load harness for the Medical AI API
+Drives an endpoint at a fixed concurrency and reports tail latency and
+rejections, to check that overload is shed quickly instead of queueing
+"""
+
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+
+SAMPLE_RECORD = {
+    "content": "Complete Blood Count: WBC 12.5 x10³/μL (Normal range: 4.0-11.0), Hemoglobin 11.2 g/dL. "
+               "Prescribed Amoxicillin 500mg three times daily. Follow up in 2 weeks.",
+    "record_type": "Lab Test"
+}
+
+
+def timed_request(url, payload, timeout):
+    start = time.perf_counter()
+    try:
+        response = requests.post(url, json=payload, timeout=timeout)
+        status = response.status_code
+    except requests.exceptions.RequestException as e:
+        status = type(e).__name__
+    return status, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:5000/api/analyze")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"🚀 {args.requests} requests to {args.url} at concurrency {args.concurrency}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: timed_request(args.url, SAMPLE_RECORD, args.timeout),
+                                range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    by_status = {}
+    for status, latency in results:
+        by_status.setdefault(status, []).append(latency)
+
+    print(f"\n⏱️ {elapsed:.1f}s total, {args.requests / elapsed:.1f} req/s")
+    print(f"📊 Status counts: {dict(Counter(status for status, _ in results))}")
+    for status, latencies in sorted(by_status.items(), key=lambda item: str(item[0])):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"  {status}: p50 {p50:.0f}ms, p95 {p95:.0f}ms, p99 {p99:.0f}ms, max {max(latencies):.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,48 +3,56 @@ Medical AI Service using LLMware
 Provides patient-friendly summaries and insights for medical records
 """
 
-from llmware.models import ModelCatalog
+from model_registry import ModelRegistry, PRELOAD_MODELS
+from prompt_cache import PromptCache
+from summary_stream import stream_sentences, MAX_SUMMARY_SENTENCES
 import json
 import re
 
+
+def load_catalog_model(name):
+    from llmware.models import ModelCatalog  # deferred: importing llmware is slow
+    return ModelCatalog().load_model(name)
+
+
 class MedicalAIService:
-    def __init__(self):
-        """Initialize the medical AI service with LLMware models"""
-        self.summary_model = None
-        self.extract_model = None
-        self.loaded_models = set()
+    def __init__(self, registry=None, preload=PRELOAD_MODELS, prompt_cache=None):
+        """
+        Initialize the medical AI service with LLMware models
+
+        Models listed in PRELOAD_MODELS load here; others load on first use
+        and may be evicted under MODEL_MEMORY_BUDGET_MB. Generation results
+        are cached on disk by model, function and prompt.
+        """
+        self.models = registry or ModelRegistry(load_catalog_model)
+        self.prompt_cache = prompt_cache or PromptCache()
+        self.models.preload(preload)
         
     def load_model(self, model_name):
-        """Load a model if not already loaded"""
-        if model_name not in self.loaded_models:
-            print(f"Loading {model_name} model...")
-            if model_name == "slim-summary-tool":
-                self.summary_model = ModelCatalog().load_model("slim-summary-tool")
-            elif model_name == "slim-extract-tool":
-                self.extract_model = ModelCatalog().load_model("slim-extract-tool")
-            self.loaded_models.add(model_name)
-            print(f"✅ {model_name} loaded successfully!")
+        """Return a resident model, loading it if needed"""
+        return self.models.get(model_name)
+    
+    def function_call(self, model_name, prompt, function):
+        """Run a tool function, answering repeated prompts from the cache
+        without loading the model"""
+        cached = self.prompt_cache.get(model_name, function, prompt)
+        if cached is not None:
+            return cached
+        # Leased, so a load on another thread can't evict it mid-call
+        with self.models.lease(model_name) as model:
+            response = model.function_call(prompt, function=function)
+        self.prompt_cache.put(model_name, function, prompt, response)
+        return response
         
     def create_patient_friendly_summary(self, medical_text, record_type="Medical Record"):
         """
         Create a patient-friendly summary of medical text using LLMware
         """
         try:
-            # Load the summary model
-            self.load_model("slim-summary-tool")
-            
-            # Create a medical context prompt
-            prompt = f"""
-            Please provide a clear, patient-friendly summary of this {record_type.lower()}. 
-            Explain medical terms in simple language and highlight the most important points.
-            
-            Medical Content: {medical_text}
-            
-            Summary:
-            """
+            prompt = self._summary_prompt(medical_text, record_type)
             
             # Generate summary using LLMware
-            response = self.summary_model.function_call(prompt, function="summarize")
+            response = self.function_call("slim-summary-tool", prompt, "summarize")
             
             # Extract the summary from the response
             if isinstance(response, dict) and 'llm_response' in response:
@@ -72,14 +80,61 @@ class MedicalAIService:
                 "summary": "Unable to generate AI summary at this time."
             }
     
+    def _summary_prompt(self, medical_text, record_type):
+        """Create a medical context prompt"""
+        return f"""
+            Please provide a clear, patient-friendly summary of this {record_type.lower()}. 
+            Explain medical terms in simple language and highlight the most important points.
+            
+            Medical Content: {medical_text}
+            
+            Summary:
+            """
+    
+    def stream_patient_friendly_summary(self, medical_text, record_type="Medical Record"):
+        """
+        Yield summary sentences as the model generates them
+
+        Generation stops once the summary has MAX_SUMMARY_SENTENCES
+        sentences, the same limit clean_summary applies afterwards. The
+        finished text is cached, so a repeated record replays instantly.
+        """
+        prompt = self._summary_prompt(medical_text, record_type)
+        cached = (self.prompt_cache.get("slim-summary-tool", "stream", prompt)
+                  or self.prompt_cache.get("slim-summary-tool", "summarize", prompt))
+        
+        sentences = []
+        if cached is not None:
+            text = cached["llm_response"] if isinstance(cached, dict) else str(cached)
+            for sentence in self._summary_sentences(iter([text.strip()])):
+                sentences.append(sentence)
+                yield sentence
+        else:
+            # The lease lasts until generation stops, including when the
+            # client goes away and the generator is closed early
+            with self.models.lease("slim-summary-tool") as model:
+                if hasattr(model, "stream"):
+                    tokens = model.stream(prompt)
+                else:
+                    response = model.function_call(prompt, function="summarize")
+                    tokens = iter([response["llm_response"] if isinstance(response, dict) else str(response)])
+                for sentence in self._summary_sentences(tokens):
+                    sentences.append(sentence)
+                    yield sentence
+        
+        if cached is None and sentences:
+            self.prompt_cache.put("slim-summary-tool", "stream", prompt, {"llm_response": " ".join(sentences)})
+    
+    def _summary_sentences(self, tokens):
+        for index, sentence in enumerate(stream_sentences(tokens, MAX_SUMMARY_SENTENCES)):
+            # The first sentence carries any "Summary:" prefix the model adds
+            yield self.clean_summary(sentence) if index == 0 else sentence
+    
     def extract_key_information(self, medical_text):
         """
         Extract key medical information using LLMware
         """
         try:
-            # Load the extraction model
-            self.load_model("slim-extract-tool")
-            
             prompt = f"""
             Extract key medical information from this text:
             - Medications mentioned
@@ -93,7 +148,7 @@ class MedicalAIService:
             Key Information:
             """
             
-            response = self.extract_model.function_call(prompt, function="extract")
+            response = self.function_call("slim-extract-tool", prompt, "extract")
             
             if isinstance(response, dict) and 'llm_response' in response:
                 extracted = response['llm_response']
@@ -26,18 +26,24 @@ class MedicalAIService:
             
             # Generate summary based on record type and content
             if "blood test" in clean_text.lower() or "lab" in clean_text.lower():
+                template = "lab"
                 summary = self._generate_lab_summary(clean_text)
             elif "prescription" in clean_text.lower() or "medication" in clean_text.lower():
+                template = "prescription"
                 summary = self._generate_prescription_summary(clean_text)
             elif "x-ray" in clean_text.lower() or "imaging" in clean_text.lower():
+                template = "imaging"
                 summary = self._generate_imaging_summary(clean_text)
             elif "vaccination" in clean_text.lower() or "vaccine" in clean_text.lower():
+                template = "vaccination"
                 summary = self._generate_vaccination_summary(clean_text)
             else:
+                template = "general"
                 summary = self._generate_general_summary(clean_text, record_type)
             
             return {
                 "summary": summary,
+                "template": template,
                 "confidence": 0.85,
                 "processing_time": "1.2s",
                 "model": "Demo Mode"
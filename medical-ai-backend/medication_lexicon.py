@@ -0,0 +1,125 @@
+"""
+Medication Lexicon
+Compact drug-name lookup backed by a local lexicon file, used to find
+medications in medical text with a single pass over its tokens
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+
+DEFAULT_LEXICON_PATH = os.environ.get(
+    "MEDICATION_LEXICON_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "medications.txt")
+)
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9\-]*")
+
+# Bucket names by their first two characters so a lookup only bisects a
+# handful of entries, keeping it effectively constant-time at 50k+ names
+PREFIX_LENGTH = 2
+
+
+class MedicationLexicon:
+    def __init__(self, names):
+        """Build the lookup structure from an iterable of drug names"""
+        normalized = set()
+        for name in names:
+            name = " ".join(name.lower().split())
+            if name:
+                normalized.add(sys.intern(name))
+
+        # One sorted tuple of interned strings plus a small prefix index
+        self.names = tuple(sorted(normalized))
+        self.prefix_index = {}
+        for position, name in enumerate(self.names):
+            prefix = name[:PREFIX_LENGTH]
+            start, _ = self.prefix_index.get(prefix, (position, position))
+            self.prefix_index[prefix] = (start, position + 1)
+
+        self.max_words = max((name.count(" ") + 1 for name in self.names), default=1)
+        self.load_time_ms = 0.0
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_LEXICON_PATH):
+        """Load a lexicon file with one name per line ('#' starts a comment)"""
+        start = time.perf_counter()
+        with open(path, encoding="utf-8") as f:
+            names = [line.split("#", 1)[0] for line in f]
+        lexicon = cls(names)
+        lexicon.load_time_ms = (time.perf_counter() - start) * 1000
+        return lexicon
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        bucket = self.prefix_index.get(name[:PREFIX_LENGTH])
+        if bucket is None:
+            return False
+        start, end = bucket
+        position = bisect_left(self.names, name, start, end)
+        return position < end and self.names[position] == name
+
+    def find(self, text):
+        """
+        Find medication mentions in a single left-to-right pass over the tokens
+
+        Multi-word names are matched longest-first. Returns a list of
+        (canonical_name, matched_text, start, end) tuples in text order.
+        """
+        tokens = [(m.group(0).lower(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text)]
+        found = []
+
+        i = 0
+        while i < len(tokens):
+            for width in range(min(self.max_words, len(tokens) - i), 0, -1):
+                window = tokens[i:i + width]
+                candidate = " ".join(token for token, _, _ in window)
+                if candidate in self:
+                    start, end = window[0][1], window[-1][2]
+                    found.append((candidate, text[start:end], start, end))
+                    i += width
+                    break
+            else:
+                i += 1
+
+        return found
+
+    def stats(self):
+        """Report lexicon size, load time and approximate resident memory"""
+        memory_bytes = sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+        memory_bytes += sys.getsizeof(self.prefix_index) + sum(
+            sys.getsizeof(prefix) + sys.getsizeof(bounds) for prefix, bounds in self.prefix_index.items()
+        )
+        return {
+            "entries": len(self.names),
+            "max_words": self.max_words,
+            "load_time_ms": round(self.load_time_ms, 2),
+            "memory_kb": round(memory_bytes / 1024, 1)
+        }
+
+
+_default_lexicon = None
+_default_lexicon_lock = threading.Lock()
+
+
+def get_medication_lexicon(path=DEFAULT_LEXICON_PATH):
+    """Load the shared lexicon once per process; returns None if it can't be read"""
+    global _default_lexicon
+    if _default_lexicon is None:
+        with _default_lexicon_lock:
+            if _default_lexicon is None:
+                try:
+                    _default_lexicon = MedicationLexicon.from_file(path)
+                    stats = _default_lexicon.stats()
+                    print(f"💊 Medication lexicon: {stats['entries']} names loaded in "
+                          f"{stats['load_time_ms']}ms (~{stats['memory_kb']} KB)")
+                except OSError as e:
+                    print(f"⚠️ Medication lexicon unavailable: {str(e)}")
+                    return None
+    return _default_lexicon
@@ -0,0 +1,135 @@
+"""
+Memory Diagnostics
+Process and Python heap statistics, top allocation sites from tracemalloc
+and diffs between snapshots, for finding growth in a long-running server
+"""
+
+import gc
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+
+from model_registry import resident_bytes
+
+
+MEMORY_DIAGNOSTICS = os.environ.get("MEMORY_DIAGNOSTICS") == "1"
+# Frames kept per allocation; more frames show callers but cost more memory
+TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", 10))
+MAX_SNAPSHOTS = 8
+# When set, /debug endpoints require it in the X-Debug-Token header
+DEBUG_TOKEN = os.environ.get("DEBUG_TOKEN", "")
+DEBUG_TOKEN_HEADER = "X-Debug-Token"
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# Allocations made by the diagnostics machinery itself
+IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>",
+                 "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+def _mb(value):
+    return round(value / (1024 * 1024), 2)
+
+
+def debug_authorized(header_value, token=DEBUG_TOKEN):
+    if not token:
+        return True
+    return bool(header_value) and hmac.compare_digest(header_value.encode(), token.encode())
+
+
+class MemoryDiagnostics:
+    def __init__(self, frames=TRACEMALLOC_FRAMES, max_snapshots=MAX_SNAPSHOTS):
+        """
+        Start tracing allocations and keep the newest max_snapshots named
+        snapshots for diffing
+
+        Tracing slows allocation and stores a traceback per live block, so
+        this only runs when MEMORY_DIAGNOSTICS=1.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.frames = tracemalloc.get_traceback_limit()
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()  # id -> (taken_at, traced bytes, snapshot)
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def _take(self):
+        filters = [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+        return tracemalloc.take_snapshot().filter_traces(filters)
+
+    @staticmethod
+    def _stat(stat, group_by):
+        if group_by == "traceback":
+            site = stat.traceback.format()
+        elif group_by == "lineno":
+            site = f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}"
+        else:
+            site = stat.traceback[0].filename
+        return {"site": site, "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+
+    def report(self, limit=20, group_by="lineno", object_types=False):
+        """RSS, interpreter heap counters and the top allocation sites now"""
+        current, peak = tracemalloc.get_traced_memory()
+        report = {
+            "rss_mb": _mb(resident_bytes()),
+            "traced_mb": _mb(current),
+            "traced_peak_mb": _mb(peak),
+            "tracemalloc_overhead_mb": _mb(tracemalloc.get_tracemalloc_memory()),
+            "allocated_blocks": sys.getallocatedblocks(),
+            "gc": {
+                "counts": gc.get_count(),
+                "collections": [generation["collections"] for generation in gc.get_stats()],
+                "uncollectable": len(gc.garbage)
+            },
+            "top": [self._stat(stat, group_by) for stat in self._take().statistics(group_by)[:limit]]
+        }
+        if object_types:  # walks every tracked object; slow on a big heap
+            counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+            report["object_types"] = dict(counts.most_common(limit))
+        return report
+
+    def snapshot(self):
+        """Take and keep a snapshot; returns its id"""
+        snapshot = self._take()
+        traced, _ = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._sequence += 1
+            snapshot_id = str(self._sequence)
+            self._snapshots[snapshot_id] = (time.time(), traced, snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def diff(self, before_id, after_id=None, limit=20, group_by="lineno"):
+        """
+        Largest allocation changes from one kept snapshot to another (or
+        to now); raises KeyError for an unknown or evicted id
+        """
+        with self._lock:
+            before_at, _, before = self._snapshots[before_id]
+            after_at, _, after = self._snapshots[after_id] if after_id else (time.time(), 0, None)
+        if after is None:
+            after = self._take()
+        changes = after.compare_to(before, group_by)
+        return {
+            "from": before_id,
+            "to": after_id or "now",
+            "seconds": round(after_at - before_at, 1),
+            "size_diff_kb": round(sum(stat.size_diff for stat in changes) / 1024, 1),
+            "top": [
+                dict(self._stat(stat, group_by),
+                     size_diff_kb=round(stat.size_diff / 1024, 1), count_diff=stat.count_diff)
+                for stat in changes[:limit]
+            ]
+        }
+
+    def snapshots(self):
+        with self._lock:
+            return {
+                snapshot_id: {"taken_at": taken_at, "traced_mb": _mb(traced)}
+                for snapshot_id, (taken_at, traced, _) in self._snapshots.items()
+            }
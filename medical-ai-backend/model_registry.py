@@ -0,0 +1,200 @@
+"""
+Model Registry
+Keeps generative models resident within a memory budget: configured models
+are preloaded, the rest load on demand through a single loader, and the
+least recently used model that nobody is using is evicted when the
+budget is exceeded
+"""
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", 4096))
+PRELOAD_MODELS = [name.strip() for name in os.environ.get("PRELOAD_MODELS", "").split(",") if name.strip()]
+
+
+def resident_bytes():
+    """Resident set size of this process, or 0 when it can't be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _ResidentModel:
+    def __init__(self, model, size_bytes, load_seconds):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.hits = 0
+        self.leases = 0  # callers using the model right now
+        self.retired = False  # unloaded from the registry while leased
+
+
+class ModelRegistry:
+    def __init__(self, loader, budget_mb=MODEL_MEMORY_BUDGET_MB):
+        """
+        Initialize the registry
+
+        loader(name) returns a loaded model. A model's footprint is the
+        growth in resident memory while it loads, remembered across
+        evictions so a reload can make room before it starts. Models held
+        through lease() are never evicted; if nothing else can go, the
+        budget is exceeded until their leases end.
+        """
+        self.loader = loader
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._models = OrderedDict()  # least recently used first
+        self._known_sizes = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # one model loads at a time
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = {}
+
+    def get(self, name):
+        """
+        Return a resident model, loading it first if needed
+
+        The model may be evicted once this returns; use lease() to keep it
+        loaded while calling it from a thread that shares the registry.
+        """
+        return self._checkout(name, lease=False).model
+
+    @contextmanager
+    def lease(self, name):
+        """Use a model, loading it if needed, with eviction held off until the block exits"""
+        entry = self._checkout(name, lease=True)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                unload = entry.retired and entry.leases == 0
+            if unload:
+                self._unload(entry)
+
+    def _checkout(self, name, lease):
+        # The lease is taken under the same lock that finds the entry, so
+        # an eviction can't slip in between
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._models.move_to_end(name)
+                entry.hits += 1
+                entry.leases += lease
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        with self._load_lock:
+            # Another request may have loaded it while this one waited
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    self._models.move_to_end(name)
+                    entry.leases += lease
+                    return entry
+                self._evict_for(self._known_sizes.get(name, 0))
+
+            print(f"Loading {name} model...")
+            before = resident_bytes()
+            start = time.perf_counter()
+            model = self.loader(name)
+            elapsed = time.perf_counter() - start
+            size = max(0, resident_bytes() - before)
+
+            with self._lock:
+                entry = self._models[name] = _ResidentModel(model, size, elapsed)
+                entry.leases += lease
+                self._known_sizes[name] = size
+                self.loads += 1
+                self.load_seconds[name] = round(elapsed, 3)
+                self._evict_for(0, keep=name)
+            print(f"✅ {name} loaded successfully! ({elapsed:.1f}s, {size / (1024 * 1024):.0f}MB)")
+            return entry
+
+    def preload(self, names):
+        """Load models at startup so no user request pays for it"""
+        for name in names:
+            self.get(name)
+
+    def _resident_total(self):
+        return sum(entry.size_bytes for entry in self._models.values())
+
+    def _evict_for(self, incoming_bytes, keep=None):
+        """Evict least recently used, unleased models until incoming_bytes fits; caller holds _lock"""
+        evicted = False
+        for name in list(self._models):
+            if self._resident_total() + incoming_bytes <= self.budget_bytes:
+                break
+            if name == keep or self._models[name].leases:
+                continue
+            self._drop(name)
+            self.evictions += 1
+            evicted = True
+            print(f"♻️ Evicted {name} to stay within the model memory budget")
+        if evicted:
+            gc.collect()
+
+    def _drop(self, name):
+        entry = self._models.pop(name)
+        if entry.leases:
+            entry.retired = True  # the last lease unloads it
+        else:
+            self._unload(entry)
+
+    def _unload(self, entry):
+        # llmware GGUF models hold native memory until explicitly unloaded
+        unload = getattr(entry.model, "unload_model", None)
+        if callable(unload):
+            unload()
+
+    def unload(self, name):
+        """Remove a model; one still leased is unloaded when its last lease ends"""
+        with self._lock:
+            if name in self._models:
+                self._drop(name)
+                gc.collect()
+
+    def __contains__(self, name):
+        return name in self._models
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "resident": {
+                    name: {
+                        "memory_mb": round(entry.size_bytes / (1024 * 1024), 1),
+                        "load_seconds": round(entry.load_seconds, 3),
+                        "hits": entry.hits,
+                        "leases": entry.leases
+                    }
+                    for name, entry in self._models.items()
+                },
+                "resident_mb": round(self._resident_total() / (1024 * 1024), 1),
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "last_load_seconds": dict(self.load_seconds)
+            }
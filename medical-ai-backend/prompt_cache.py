@@ -0,0 +1,180 @@
+"""
+Prompt Result Cache
+Persistent SQLite cache of generative function_call results, keyed by
+model, function and prompt hash, with size-bounded LRU eviction and an
+expiry, since cached generations contain patient text
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "PROMPT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prompt_cache.sqlite3")
+)
+PROMPT_CACHE_MAX_MB = float(os.environ.get("PROMPT_CACHE_MAX_MB", 64))
+PROMPT_CACHE_TTL_HOURS = float(os.environ.get("PROMPT_CACHE_TTL_HOURS", 24))
+# Hits update last_used in batches rather than with a write per read
+TOUCH_BATCH = 64
+TOUCH_SECONDS = 30.0
+PURGE_SECONDS = 300.0
+
+
+def prompt_key(model_name, function, prompt):
+    return hashlib.sha256(f"{model_name}\x00{function}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_mb=PROMPT_CACHE_MAX_MB, ttl_hours=PROMPT_CACHE_TTL_HOURS):
+        """
+        Open (or create) the cache database
+
+        Entries survive restarts for ttl_hours after they were generated;
+        expired ones are never returned and are deleted at open and
+        periodically on writes. When the stored responses exceed max_mb,
+        the least recently used ones are deleted down to 90% of the limit.
+        Recency is updated lazily: hits are kept in memory and written every
+        TOUCH_BATCH hits or TOUCH_SECONDS, with the next put, or on close.
+        """
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_hours * 3600
+        self._lock = threading.Lock()
+        self._touched = {}  # key -> last hit time, not yet written
+        self._last_touch_flush = time.monotonic()
+        self._next_purge = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS prompt_results (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                function TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(prompt_results)")}
+        if "created" not in columns:
+            # Caches from before the expiry: count their age from last use
+            self._db.execute("ALTER TABLE prompt_results ADD COLUMN created REAL NOT NULL DEFAULT 0")
+            self._db.execute("UPDATE prompt_results SET created = last_used")
+        self._db.execute("CREATE INDEX IF NOT EXISTS prompt_results_last_used ON prompt_results (last_used)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS prompt_results_created ON prompt_results (created)")
+        self._db.commit()
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM prompt_results").fetchone()[0]
+        with self._lock:
+            self._purge_expired()
+            self._db.commit()
+
+    def get(self, model_name, function, prompt):
+        """Cached response, or None"""
+        key = prompt_key(model_name, function, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM prompt_results WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now - self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = now
+            if (len(self._touched) >= TOUCH_BATCH
+                    or time.monotonic() - self._last_touch_flush >= TOUCH_SECONDS):
+                self._flush_touched()
+                self._db.commit()
+        return json.loads(row[0])
+
+    def _flush_touched(self):
+        """Write pending last_used times; caller holds _lock and commits"""
+        if self._touched:
+            self._db.executemany("UPDATE prompt_results SET last_used = ? WHERE key = ?",
+                                 [(used, key) for key, used in self._touched.items()])
+            self._touched = {}
+        self._last_touch_flush = time.monotonic()
+
+    def _purge_expired(self):
+        """Delete entries past the TTL; caller holds _lock and commits"""
+        cutoff = time.time() - self.ttl_seconds
+        expired = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM prompt_results WHERE created < ?",
+                                   (cutoff,)).fetchone()
+        if expired[0]:
+            self._db.execute("DELETE FROM prompt_results WHERE created < ?", (cutoff,))
+            self._total_bytes -= expired[1]
+            self.expired += expired[0]
+        self._next_purge = time.monotonic() + PURGE_SECONDS
+
+    def put(self, model_name, function, prompt, response):
+        payload = json.dumps(response, default=str)
+        key = prompt_key(model_name, function, prompt)
+        now = time.time()
+        with self._lock:
+            self._flush_touched()  # this write commits anyway
+            if time.monotonic() >= self._next_purge:
+                self._purge_expired()
+            previous = self._db.execute("SELECT size FROM prompt_results WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO prompt_results (key, model, function, response, size, last_used, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, function, payload, len(payload), now, now)
+            )
+            self._total_bytes += len(payload) - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Delete least recently used entries down to 90% of the limit; caller holds _lock"""
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute("SELECT key, size FROM prompt_results ORDER BY last_used").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._db.executemany("DELETE FROM prompt_results WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._touched = {}
+            self._db.execute("DELETE FROM prompt_results")
+            self._db.commit()
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM prompt_results").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "size_mb": round(self._total_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "ttl_hours": round(self.ttl_seconds / 3600, 2)
+            }
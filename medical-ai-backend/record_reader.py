@@ -0,0 +1,132 @@
+"""
+Record Reader
+Memory-mapped JSONL input for bulk runs: record boundaries are found in
+the mapped pages, byte ranges go to workers, and a record is only decoded
+when it is read
+"""
+
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+RANGE_BYTES = int(os.environ.get("BULK_RANGE_BYTES", 64 * 1024))
+WHITESPACE = frozenset(b" \t\r\n")
+
+
+def loads(data):
+    """Decode one JSON record from bytes or a memoryview"""
+    if orjson is not None:
+        return orjson.loads(data)  # reads the mapped bytes in place
+    return json.loads(bytes(data))
+
+
+class LazyRecord:
+    __slots__ = ("_mapped", "start", "end")
+
+    def __init__(self, mapped, start, end):
+        """One line of a MappedFile, by file offset; usable while it is open"""
+        self._mapped = mapped
+        self.start = start
+        self.end = end
+
+    def raw(self):
+        return self._mapped.read(self.start, self.end)
+
+    def load(self):
+        """The decoded record; raises ValueError for malformed JSON"""
+        with self._mapped.view(self.start, self.end) as data:
+            return loads(data)
+
+
+class MappedFile:
+    def __init__(self, path, start=0, end=None):
+        """
+        Read-only mapping of bytes [start, end) of a file
+
+        Only that window is mapped, so a worker's resident memory follows
+        its range rather than the file, and the pages are read ahead in
+        order for a sequential scan. Offsets everywhere are file offsets.
+        """
+        size = os.path.getsize(path)
+        self.path = path
+        self.start = min(start, size)
+        self.end = size if end is None else min(end, size)
+        # mmap offsets must be multiples of the allocation granularity
+        self._base = self.start - self.start % mmap.ALLOCATIONGRANULARITY
+        self._map = None
+        if self.end > self.start:
+            with open(path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), self.end - self._base, access=mmap.ACCESS_READ,
+                                      offset=self._base)
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def view(self, start, end):
+        """Zero-copy memoryview of [start, end); release it (or use with) before close()"""
+        return memoryview(self._map)[start - self._base:end - self._base]
+
+    def read(self, start, end):
+        return self._map[start - self._base:end - self._base]
+
+    def next_boundary(self, position):
+        """Offset just after the first newline at or after position, or end"""
+        if self._map is None or position >= self.end:
+            return self.end
+        found = self._map.find(b"\n", position - self._base)
+        return self.end if found == -1 else found + 1 + self._base
+
+    def spans(self):
+        """(start, end) of each non-blank line, newline excluded"""
+        if self._map is None:
+            return
+        mapped, base = self._map, self._base
+        position, stop = self.start - base, self.end - base
+        while position < stop:
+            newline = mapped.find(b"\n", position, stop)
+            line_end = stop if newline == -1 else newline
+            # Blank lines are skipped; only whitespace-led lines get copied to check
+            if line_end > position and (mapped[position] not in WHITESPACE or mapped[position:line_end].strip()):
+                yield position + base, line_end + base
+            position = line_end + 1
+
+    def records(self):
+        for start, end in self.spans():
+            yield LazyRecord(self, start, end)
+
+
+def split_ranges(path, range_bytes=RANGE_BYTES, start=0):
+    """
+    Yield (start, end) byte ranges of about range_bytes that begin and end
+    on line boundaries, covering the file from start; start must itself be
+    a line boundary
+    """
+    with MappedFile(path) as mapped:
+        position = start
+        while position < mapped.end:
+            end = mapped.next_boundary(position + range_bytes - 1)
+            yield position, end
+            position = end
+
+
+def iter_records(path, start=0):
+    """Decoded records of a whole file, in order"""
+    with MappedFile(path, start) as mapped:
+        for record in mapped.records():
+            yield record.load()
@@ -0,0 +1,171 @@
+"""
+Record Search
+Per-process semantic search over the shared vector store: one process (the
+holder of the store's writer lock) appends, the others read the store
+read-only and hand their appends to the writer through an inbox
+"""
+
+import os
+import threading
+
+from vector_index import VectorIndex
+from vector_store import DEFAULT_STORE_PATH, AppendInbox, VectorStore, WriterLocked
+
+
+SYNC_INTERVAL = float(os.environ.get("VECTOR_STORE_SYNC_INTERVAL", 2.0))
+# Share of replaced or deleted rows at which the writer compacts the store
+COMPACT_RATIO = float(os.environ.get("VECTOR_STORE_COMPACT_RATIO", 0.25))
+
+
+class RecordSearch:
+    def __init__(self, path=DEFAULT_STORE_PATH, sync_interval=SYNC_INTERVAL, **index_options):
+        """
+        Open the store at path (if it exists yet) and index its live rows
+
+        Whichever process takes the writer lock first appends directly;
+        every other process opens the store read-only and its add() and
+        delete() calls are spooled to the inbox. sync(), run every
+        sync_interval seconds by start(), drains the inbox and compacts the
+        store once COMPACT_RATIO of its rows are dead when this process is
+        the writer, picks up rows and deletes committed by the writer
+        otherwise, reloads after a compaction, and takes over the writer
+        role if the writer has gone. Changes made through a reader reach
+        searches everywhere after the next sync of the writer and then of
+        each reader.
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.index_options = index_options
+        self.inbox = AppendInbox(path)
+        self.store = None
+        self.index = None
+        self.generation = None
+        self.indexed_rows = 0
+        self.applied_deletes = 0
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        if os.path.exists(os.path.join(path, "CURRENT")):
+            self._open()
+
+    def _open(self, dim=None):
+        try:
+            self.store = VectorStore(self.path, dim=dim, writable=True)
+        except WriterLocked:
+            self.store = VectorStore(self.path)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.index = VectorIndex.from_store(self.store, **self.index_options)
+        self.generation = self.store.generation
+        self.indexed_rows = self.store.count
+        self.applied_deletes = len(self.store.deletes)
+
+    def _catch_up(self):
+        """Index the rows and deletes the store has committed since the last call"""
+        ids, metadata, deleted_ids = self.store.records()
+        if self.store.count > self.indexed_rows:
+            rows = slice(self.indexed_rows, self.store.count)
+            self.index.add_many(ids[rows], self.store.vectors[rows], metadata[rows])
+            self.indexed_rows = self.store.count
+        for record_id in self.store.deletes[self.applied_deletes:]:
+            if record_id in deleted_ids:  # not re-added since
+                self.index.remove(record_id)
+        self.applied_deletes = len(self.store.deletes)
+
+    @property
+    def writer(self):
+        return self.store is not None and self.store.writable
+
+    def __len__(self):
+        return 0 if self.index is None else len(self.index)
+
+    def add(self, record_id, embedding, metadata=None):
+        """Store and index one record's embedding (spooled when this process only reads)"""
+        with self._lock:
+            if self.store is None:
+                try:
+                    self._open(dim=len(embedding))
+                except FileNotFoundError:
+                    pass  # another process holds the lock and hasn't created the store yet
+            if not self.writer:
+                self.inbox.put([record_id], [embedding], [metadata])
+                return False
+            self.store.append([record_id], [embedding], [metadata])
+            self.index.add(record_id, embedding, metadata)
+            self.indexed_rows = self.store.count
+            return True
+
+    def delete(self, record_id):
+        """Remove a record from search (spooled when this process only reads)"""
+        with self._lock:
+            if self.store is None:
+                return False
+            if not self.writer:
+                self.inbox.put_delete([record_id])
+                return False
+            self.store.delete(record_id)
+            self.index.remove(record_id)
+            self.applied_deletes = len(self.store.deletes)
+            return True
+
+    def sync(self):
+        """Catch up with the shared store; see __init__"""
+        with self._lock:
+            if self.store is None:
+                if not os.path.exists(os.path.join(self.path, "CURRENT")):
+                    return
+                self._open()
+            if self.store.try_become_writer() and self.store.generation != self.generation:
+                self._rebuild()  # took over from a writer that had compacted
+            if self.writer:
+                self.inbox.drain(self.store)
+                self._catch_up()
+                dead = self.index.count - len(self.index)
+                if dead and dead >= COMPACT_RATIO * self.store.count:
+                    print(f"🗜️ Vector store compacted: {self.store.compact()}")
+                    self._rebuild()
+                return
+            self.store.refresh()
+            if self.store.generation != self.generation:
+                self._rebuild()  # the writer compacted into a new generation
+            else:
+                self._catch_up()
+
+    def _run(self):
+        while not self._stop.wait(self.sync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️ Record search sync failed: {str(e)}")
+
+    def start(self):
+        if self._thread is None and self.sync_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="record-search-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.store is not None:
+            self.store.close()
+
+    # Reads go straight to the current index (it has its own lock), so
+    # searches don't queue behind a sync
+    def get_vector(self, record_id):
+        index = self.index
+        return None if index is None else index.get_vector(record_id)
+
+    def search(self, query, k=10, filters=None):
+        index = self.index
+        return [] if index is None else index.search(query, k, filters=filters)
+
+    def stats(self):
+        with self._lock:
+            stats = {"role": "writer" if self.writer else "reader", "inbox_pending": len(self.inbox.pending())}
+            if self.store is not None:
+                stats.update(self.store.stats())
+                stats["index"] = self.index.stats()
+            return stats
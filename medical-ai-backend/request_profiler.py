@@ -0,0 +1,234 @@
+"""
+Request Profiler
+Opt-in profiling of individual requests, chosen by an authorized header or
+a sampling rate, written as collapsed stacks for flamegraph tools
+"""
+
+import contextvars
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 2))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profiles")
+)
+PROFILE_HEADER = "X-Profile"
+PROFILE_MODE_HEADER = "X-Profile-Mode"
+
+# Session of the request being profiled; DeadlineRunner copies the context
+# into the analysis pool, so work done there on the request's behalf can
+# join its profile through worker_profile()
+current_session = contextvars.ContextVar("profile_session", default=None)
+
+
+def collapse_stack(frame):
+    """Root-first "file:function" names joined by ';', as flamegraph.pl reads them"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def worker_profile():
+    """Context manager adding the enclosed work, on whatever thread, to the
+    current request's profile; does nothing outside a profiled request"""
+    session = current_session.get()
+    return session.worker() if session is not None else _not_profiled()
+
+
+@contextmanager
+def _not_profiled():
+    yield
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval_ms=PROFILE_INTERVAL_MS):
+        """
+        Sample one thread's stack every interval_ms, plus the worker
+        threads tracked while they do this request's work (so other
+        requests sharing the analysis pool stay out of the profile)
+        """
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.samples = Counter()
+        self.workers = {}
+        self._workers_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def track(self, ident, name):
+        with self._workers_lock:
+            self.workers[ident] = name
+
+    def untrack(self, ident):
+        with self._workers_lock:
+            self.workers.pop(ident, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._workers_lock:
+                workers = dict(self.workers)
+            frames = sys._current_frames()
+            frame = frames.get(self.thread_id)
+            if frame is not None:
+                self.samples["request;" + collapse_stack(frame)] += 1
+            for ident, name in workers.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[f"{name};" + collapse_stack(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+class ProfileSession:
+    def __init__(self, mode, interval_ms):
+        """Start profiling the calling (request) thread and make this the
+        current session"""
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.worker_profiles = []
+        self._lock = threading.Lock()
+        if mode == "deterministic":
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.sampler = StackSampler(threading.get_ident(), interval_ms).start()
+        current_session.set(self)
+
+    @contextmanager
+    def worker(self):
+        """Profile the enclosed work on the calling worker thread as part
+        of this session"""
+        if self.mode == "deterministic":
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                with self._lock:
+                    self.worker_profiles.append(profile)
+            return
+        ident = threading.get_ident()
+        self.sampler.track(ident, threading.current_thread().name)
+        try:
+            yield
+        finally:
+            self.sampler.untrack(ident)
+
+    def stop(self):
+        if self.mode == "deterministic":
+            self.profile.disable()
+        else:
+            self.sampler.stop()
+        current_session.set(None)  # request threads are reused
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+
+    def write(self, path):
+        if self.mode == "deterministic":
+            stats = pstats.Stats(self.profile)
+            with self._lock:
+                for profile in self.worker_profiles:  # work that finished before the response
+                    stats.add(profile)
+            stats.dump_stats(path)  # pstats format
+            return
+        with open(path, "w") as f:
+            for stack, count in sorted(self.sampler.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    def __init__(self, directory=PROFILE_DIR, token=PROFILE_TOKEN, sample_rate=PROFILE_SAMPLE_RATE,
+                 interval_ms=PROFILE_INTERVAL_MS, max_files=PROFILE_MAX_FILES):
+        """
+        Decide which requests to profile and keep their profiles
+
+        A request is profiled when its X-Profile header matches the token,
+        or at random at sample_rate. Sampling mode writes <id>.folded
+        collapsed stacks; "X-Profile-Mode: deterministic" (token requests
+        only) runs cProfile and writes <id>.prof. Either way the profile
+        covers the request thread and the analysis work it hands to the
+        deadline runner, not other requests sharing that pool.
+        Only the newest max_files profiles are kept.
+        """
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self.profiled = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """A profiler when PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set, else None"""
+        if not PROFILE_TOKEN and PROFILE_SAMPLE_RATE <= 0:
+            return None
+        return cls()
+
+    def choose(self, header_value, mode_value=None):
+        """Profiling mode for a request, or None to leave it alone"""
+        if header_value and self.token and hmac.compare_digest(header_value.encode(), self.token.encode()):
+            return "deterministic" if mode_value == "deterministic" else "sampling"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampling"
+        return None
+
+    def start(self, mode):
+        return ProfileSession(mode, self.interval_ms)
+
+    def finish(self, session, label):
+        """Stop a session and write its profile; returns the file name"""
+        session.stop()
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:60]
+        extension = "prof" if session.mode == "deterministic" else "folded"
+        with self._lock:
+            self.profiled += 1
+            sequence = self.profiled
+        name = (f"{time.strftime('%Y%m%dT%H%M%S')}-{int(session.elapsed_ms)}ms-{slug}"
+                f"-{os.getpid()}-{sequence}.{extension}")
+        session.write(os.path.join(self.directory, name))
+        with self._lock:
+            self._prune()
+        return name
+
+    def _prune(self):
+        files = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith((".folded", ".prof"))),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in files[:max(0, len(files) - self.max_files)]:
+            os.remove(entry.path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "sample_rate": self.sample_rate,
+                "token_enabled": bool(self.token),
+                "profiled": self.profiled
+            }
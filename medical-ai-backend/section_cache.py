@@ -0,0 +1,184 @@
+"""
+Section-level cache for incremental re-analysis of medical records
+Splits records into sentences and caches each section's embedding and
+extracted entities by content hash, so an edited record only recomputes
+the sections that actually changed
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Sentence boundaries, plus hard line breaks so list-style lab reports
+# become one section per line
+SECTION_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9])|\n+')
+
+
+def split_sections(medical_text):
+    """Split a record into non-empty, whitespace-normalized sections"""
+    sections = []
+    for part in SECTION_SPLIT_PATTERN.split(medical_text):
+        part = re.sub(r'[ \t]+', ' ', part).strip()
+        if part:
+            sections.append(part)
+    return sections
+
+
+def section_key(section_text):
+    """Content hash used as the cache key for a section"""
+    return hashlib.sha256(section_text.encode('utf-8')).hexdigest()
+
+
+class SectionCache:
+    def __init__(self, embed_fn, extract_fn, max_entries=20000):
+        """
+        Initialize the cache
+
+        embed_fn(text) -> 1D embedding or None
+        extract_fn(text) -> dict of entities found in that section
+        """
+        self.embed_fn = embed_fn
+        self.extract_fn = extract_fn
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._prefetched = OrderedDict()  # section key -> entities computed elsewhere
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def missing_sections(self, medical_texts):
+        """Distinct sections of these records that aren't cached yet"""
+        sections = dict.fromkeys(section for text in medical_texts for section in split_sections(text))
+        with self._lock:
+            return [section for section in sections if section_key(section) not in self._entries]
+
+    def prefetch_entities(self, sections, entities):
+        """
+        Store entities extracted elsewhere (e.g. in a process pool) for
+        sections about to be analyzed; each is used once, on that section's
+        next miss, so only its embedding is left to compute
+        """
+        with self._lock:
+            for section, section_entities in zip(sections, entities):
+                self._prefetched[section_key(section)] = section_entities
+            while len(self._prefetched) > self.max_entries:
+                self._prefetched.popitem(last=False)
+
+    def _take_prefetched(self, key):
+        with self._lock:
+            return self._prefetched.pop(key, None)
+
+    def analyze_section(self, section_text):
+        """Return the cached analysis for one section, computing it on a miss"""
+        return self._analyze_section(section_text)[0]
+
+    def _analyze_section(self, section_text):
+        key = section_key(section_text)
+        entry = self._get(key)
+        if entry is not None:
+            return entry, False
+
+        embedding = self.embed_fn(section_text)
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype=np.float32).flatten()
+
+        entities = self._take_prefetched(key)
+        entry = {
+            "embedding": embedding,
+            "entities": entities if entities is not None else self.extract_fn(section_text),
+            "weight": len(section_text)
+        }
+        # Don't pin a failed embedding; retry it on the next submission
+        if embedding is not None:
+            self._put(key, entry)
+        return entry, True
+
+    def analyze_document(self, medical_text):
+        """
+        Analyze a record section by section
+
+        Returns the pooled document embedding (length-weighted mean of the
+        section embeddings), the per-section entities in document order and
+        how many sections had to be recomputed.
+        """
+        sections = split_sections(medical_text)
+        entries = []
+        recomputed = 0
+        for section in sections:
+            entry, computed = self._analyze_section(section)
+            entries.append(entry)
+            recomputed += computed
+        embedded = [e for e in entries if e["embedding"] is not None]
+
+        document_embedding = None
+        if embedded:
+            matrix = np.stack([e["embedding"] for e in embedded])
+            weights = np.array([e["weight"] for e in embedded], dtype=np.float32)
+            document_embedding = (weights[:, None] * matrix).sum(axis=0) / weights.sum()
+
+        return {
+            "embedding": document_embedding,
+            "section_entities": [e["entities"] for e in entries],
+            "sections_total": len(sections),
+            "sections_recomputed": recomputed
+        }
+
+    def stats(self):
+        """Report cache size and hit rate"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+
+def merge_section_entities(section_entities):
+    """Rebuild document-level entities from per-section results"""
+    merged = {
+        "medications": [],
+        "conditions": [],
+        "dates": [],
+        "values": {},
+        "instructions": []
+    }
+
+    for entities in section_entities:
+        for key in ("medications", "conditions", "dates", "instructions"):
+            for item in entities.get(key, []):
+                if item not in merged[key]:
+                    merged[key].append(item)
+        # Match a whole-document extraction: blood pressure and temperature
+        # come from the first match, while repeated lab_* analytes are
+        # collected into a dict, so the last one wins
+        for name, value in entities.get("values", {}).items():
+            if name.startswith("lab_"):
+                merged["values"][name] = value
+            else:
+                merged["values"].setdefault(name, value)
+
+    return merged
@@ -0,0 +1,104 @@
+"""
+Shared Matrices
+Read-only NumPy matrices published once as memory-mapped .npy files and
+attached zero-copy by every worker process on the host
+"""
+
+import glob
+import os
+import threading
+
+import numpy as np
+
+
+# e.g. /dev/shm/medical-ai for tmpfs-backed segments; unset keeps every
+# matrix private to its process
+SHARED_MATRIX_DIR = os.environ.get("SHARED_MATRIX_DIR", "")
+
+
+class SharedMatrixStore:
+    def __init__(self, directory):
+        """
+        Versioned matrix segments in a directory
+
+        A segment is <name>@<version>.npy. The first process to need a
+        version builds and publishes it (written to a temporary file and
+        renamed into place); everyone else maps the same pages read-only.
+        Publishing a new version of a name removes the old files; processes
+        still using them keep their mappings until they let go.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.attached = {}  # name -> (version, nbytes)
+        self.published = 0
+
+    def _path(self, name, version):
+        return os.path.join(self.directory, f"{name}@{version}.npy")
+
+    def attach(self, name, version):
+        """Map an already published segment, or None if there isn't one"""
+        try:
+            array = np.load(self._path(name, version), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self.attached[name] = (version, array.nbytes)
+        return array
+
+    def publish(self, name, version, build):
+        """
+        Attach name@version, calling build() to create and publish it when
+        no process has yet; returns None if build() returns None
+        """
+        array = self.attach(name, version)
+        if array is not None:
+            return array
+
+        matrix = build()
+        if matrix is None:
+            return None
+        path = self._path(name, version)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.published += 1
+
+        for stale in glob.glob(os.path.join(glob.escape(self.directory), f"{glob.escape(name)}@*.npy")):
+            if stale != path:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass  # another process removed it first
+        return self.attach(name, version)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "segments": {name: version for name, (version, _) in self.attached.items()},
+                "mapped_kb": round(sum(nbytes for _, nbytes in self.attached.values()) / 1024, 1),
+                "published": self.published
+            }
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_shared_matrix_store(directory=SHARED_MATRIX_DIR):
+    """The process-wide store, or None when sharing isn't configured"""
+    global _default_store
+    if not directory:
+        return None
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                try:
+                    _default_store = SharedMatrixStore(directory)
+                except OSError as e:
+                    print(f"⚠️ Shared matrices unavailable: {str(e)}")
+                    return None
+    return _default_store
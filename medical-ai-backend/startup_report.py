@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Startup Report
+Wall-clock phases of server startup, and an import-time breakdown of
+`import api_server` per top-level package to catch cold-start regressions
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+class StartupTimer:
+    def __init__(self):
+        """Checkpoint timer; each mark() records the time since the last one"""
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = {}
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self._last) * 1000, 1)
+        self._last = now
+
+    def report(self):
+        return {
+            "phases_ms": dict(self.phases),
+            "total_ms": round((self._last - self.started) * 1000, 1)
+        }
+
+
+def import_times(module="api_server", env=None):
+    """
+    Import `module` in a fresh interpreter under -X importtime
+
+    Returns (total_ms, {top-level package: self time in ms}).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, **(env or {})),
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+    return round(sum(packages.values()), 1), dict(packages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="api_server")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--lite", action="store_true", help="measure with LITE_MODE=1")
+    parser.add_argument("--max-ms", type=float, help="exit non-zero if imports take longer")
+    args = parser.parse_args()
+
+    total_ms, packages = import_times(args.module, {"LITE_MODE": "1"} if args.lite else None)
+    print(f"⏱️ import {args.module}{' (lite)' if args.lite else ''}: {total_ms:.1f}ms")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {ms:8.1f}ms  {100 * ms / total_ms:5.1f}%  {name}")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"❌ Over the {args.max_ms:.0f}ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Summary Streaming
+Turns a token stream into complete sentences, stopping generation once the
+sentence limit is reached, and formats them as server-sent events
+"""
+
+import json
+import re
+
+
+MAX_SUMMARY_SENTENCES = 3
+
+# Terminal punctuation followed by whitespace; requiring the whitespace
+# keeps decimals like "3.5" from ending a sentence mid-token
+SENTENCE_END = re.compile(r'[.!?](?=\s)')
+
+
+def stream_sentences(tokens, max_sentences=MAX_SUMMARY_SENTENCES):
+    """
+    Yield complete sentences from an iterable of text chunks
+
+    Stops pulling tokens once max_sentences have been yielded and closes
+    the token generator, so the model stops generating too.
+    """
+    buffer = ""
+    emitted = 0
+    try:
+        for token in tokens:
+            buffer += token
+            while emitted < max_sentences:
+                match = SENTENCE_END.search(buffer)
+                if match is None:
+                    break
+                sentence, buffer = buffer[:match.end()].strip(), buffer[match.end():]
+                if sentence:
+                    emitted += 1
+                    yield sentence
+            if emitted >= max_sentences:
+                return
+        if buffer.strip() and emitted < max_sentences:
+            yield buffer.strip()
+    finally:
+        close = getattr(tokens, "close", None)
+        if callable(close):
+            close()
+
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test admission control on the API: queue-full and queue-timeout
+rejections, Retry-After, and slots coming back on every path
+"""
+
+import os
+
+os.environ.setdefault("LITE_MODE", "1")
+
+import api_server
+from admission import AdmissionController
+
+
+CONTENT = "Patient has hypertension. Prescribed Lisinopril 10mg daily. Blood pressure 150/95."
+
+
+def use_controller(**options):
+    """Swap in a fresh controller with a single slot; returns it"""
+    api_server.admission = AdmissionController(max_in_flight=1, **options)
+    return api_server.admission
+
+
+def test_full_queue_rejected():
+    print("🧪 Testing 429 when the queue is full...")
+    admission = use_controller(max_queue=0, retry_after=3)
+    client = api_server.app.test_client()
+    admission.acquire()  # another request holds the only slot
+    try:
+        response = client.post("/api/analyze", json={"content": CONTENT})
+    finally:
+        admission.release()
+    print(f"🚦 {response.status_code} Retry-After={response.headers.get('Retry-After')}")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert "too many queued" in response.get_json()["error"]
+    assert admission.stats()["rejected_queue_full"] == 1 and admission.in_flight == 0
+
+    # Health checks bypass admission, so load balancers still see the server
+    admission.acquire()
+    try:
+        assert client.get("/health").status_code == 200
+    finally:
+        admission.release()
+    print("✅ Full queue test passed!")
+
+
+def test_queue_timeout():
+    print("\n🧪 Testing 503 after waiting out the queue timeout...")
+    admission = use_controller(max_queue=1, queue_timeout=0.05, retry_after=2)
+    client = api_server.app.test_client()
+    admission.acquire()
+    try:
+        response = client.post("/api/analyze", json={"content": CONTENT})
+    finally:
+        admission.release()
+    print(f"🚦 {response.status_code} Retry-After={response.headers.get('Retry-After')}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    stats = admission.stats()
+    assert stats["rejected_timeout"] == 1 and stats["queued"] == 0 and stats["in_flight"] == 0
+    print("✅ Queue timeout test passed!")
+
+
+def test_slot_released_on_errors():
+    print("\n🧪 Testing slots are released on error responses...")
+    admission = use_controller(max_queue=0)
+    client = api_server.app.test_client()
+
+    assert client.post("/api/analyze", json={}).status_code == 400
+    assert client.post("/api/analyze", data="x" * (api_server.content_limit("/api/analyze") + 1),
+                       content_type="application/json").status_code == 413
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("summary model crashed")
+    original = api_server.medical_ai.create_patient_friendly_summary
+    api_server.medical_ai.create_patient_friendly_summary = broken
+    try:
+        response = client.post("/api/summarize", json={"content": CONTENT})
+    finally:
+        api_server.medical_ai.create_patient_friendly_summary = original
+    assert response.status_code == 500
+
+    # With one slot and no queue, a leaked slot would turn this into a 429
+    assert admission.in_flight == 0
+    assert client.post("/api/analyze", json={"content": CONTENT}).status_code == 200
+    assert admission.stats()["admitted"] == 3  # the 413 is refused before admission
+    print("✅ Error path release test passed!")
+
+
+def test_streamed_response_holds_slot():
+    print("\n🧪 Testing a streamed response keeps its slot until closed...")
+    admission = use_controller(max_queue=0)
+    client = api_server.app.test_client()
+
+    response = client.post("/api/summarize/stream", json={"content": CONTENT}, buffered=False)
+    assert response.status_code == 200
+    assert admission.in_flight == 1  # the view returned, but the body is still being generated
+    assert client.post("/api/analyze", json={"content": CONTENT}).status_code == 429
+
+    body = b"".join(response.response)
+    assert b"event: done" in body
+    response.close()  # runs call_on_close
+    assert admission.in_flight == 0
+    assert client.post("/api/analyze", json={"content": CONTENT}).status_code == 200
+    print("✅ Streamed response test passed!")
+
+
+if __name__ == "__main__":
+    print("🚀 Admission Control Tests")
+    print("=" * 50)
+    test_full_queue_rejected()
+    test_queue_timeout()
+    test_slot_released_on_errors()
+    test_streamed_response_holds_slot()
+    print("\n🎉 All admission tests passed!")
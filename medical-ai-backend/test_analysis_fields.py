@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test stage selection and compact analysis output
+"""
+
+from analysis_fields import STAGES, COMPACT_DEFAULT_STAGES, parse_compact, parse_stages, compact_stage
+
+
+def test_parse_stages():
+    print("🧪 Testing stage parsing...")
+    assert parse_stages(None) == STAGES
+    assert parse_stages(None, compact=True) == COMPACT_DEFAULT_STAGES
+    assert parse_stages("risk_assessment, summary") == ("summary", "risk_assessment")
+    assert parse_stages(["key_information", "key_information"]) == ("key_information",)
+    for bad in (["risk"], 5, [1, 2], ",", [" "]):
+        try:
+            parse_stages(bad)
+        except ValueError as e:
+            print(f"🚫 {bad!r}: {e}")
+        else:
+            raise AssertionError(f"{bad!r} should be rejected")
+    assert parse_compact(None) is False and parse_compact(True) is True
+    for bad in ("false", "true", 1, 0):
+        try:
+            parse_compact(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"compact={bad!r} should be rejected")
+    print("✅ Stage parsing test passed!")
+
+
+def test_compact_stage():
+    print("\n🧪 Testing compact output...")
+    summary = compact_stage("summary", {
+        "summary": "Your hemoglobin is low. This can cause tiredness. Discuss iron with your doctor.",
+        "confidence": 0.8,
+        "semantic_analysis": {"primary_match": "lab_abnormal"}
+    })
+    extraction = compact_stage("key_information", {
+        "extracted_info": {
+            "detected_categories": ["lab_abnormal"],
+            "confidence_scores": ["0.61"],
+            "medications": ["Lisinopril 10mg"],
+            "dates": []
+        },
+        "confidence": 0.82
+    })
+    risk = compact_stage("risk_assessment", {
+        "risk_level": "MEDIUM",
+        "semantic_scores": {"high": 0.2},
+        "explanation": "Content indicates monitoring or follow-up may be needed"
+    })
+    print(f"📄 {summary} {extraction} {risk}")
+    assert summary == {"summary": "Your hemoglobin is low."}
+    assert extraction == {"extracted_info": {"medications": ["Lisinopril 10mg"]}}
+    assert risk == {"risk_level": "MEDIUM"}
+    print("✅ Compact output test passed!")
+
+
+if __name__ == "__main__":
+    test_parse_stages()
+    test_compact_stage()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test the offline bulk-analysis CLI with the demo engine
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+
+from bulk_analyze import Checkpoint, input_fingerprint, main
+
+
+NOTES = [
+    "Patient has hypertension. Prescribed Lisinopril 10mg daily. Blood pressure 150/95.",
+    "Chest pain reported, ECG normal. Follow up in 2 weeks.",
+    "Routine checkup, all values within normal limits."
+]
+
+
+def write_jsonl(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": f"r{i}", "content": NOTES[i % len(NOTES)],
+                                "record_type": "Clinical Note"}) + "\n")
+
+
+def read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def source_offset(path, line_number):
+    with open(path, "rb") as f:
+        return sum(len(f.readline()) for _ in range(line_number))
+
+
+def test_in_process_and_pooled_match():
+    print("🧪 Testing in-process and pooled runs...")
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "records.jsonl")
+    write_jsonl(source, 50)
+
+    local = os.path.join(directory, "local.jsonl")
+    pooled = os.path.join(directory, "pooled.jsonl")
+    assert main([source, local, "--engine", "demo", "--workers", "0", "--range-bytes", "512"]) == 0
+    assert main([source, pooled, "--engine", "demo", "--workers", "2", "--range-bytes", "512"]) == 0
+
+    results = read_results(pooled)
+    assert [result["id"] for result in results] == [f"r{i}" for i in range(50)]
+    assert all(result["success"] for result in results)
+    assert set(results[0]["data"]) == {"summary", "key_information", "risk_assessment", "record_type"}
+    assert [r["data"]["risk_assessment"]["risk_level"] for r in read_results(local)] == \
+        [r["data"]["risk_assessment"]["risk_level"] for r in results]
+    print("✅ In-process/pooled test passed!")
+
+
+def test_resume_after_interruption():
+    print("\n🧪 Testing resume from a checkpoint...")
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "records.jsonl")
+    output = os.path.join(directory, "results.jsonl")
+    write_jsonl(source, 40)
+    assert main([source, output, "--engine", "demo", "--workers", "0", "--range-bytes", "400"]) == 0
+    complete = read_results(output)
+
+    # Pretend the run stopped after 15 records, mid-way through writing the 16th
+    with open(output, "rb") as f:
+        lines = f.readlines()
+    kept = b"".join(lines[:15])
+    with open(output, "wb") as f:
+        f.write(kept + lines[15][:20])
+    Checkpoint(output + ".checkpoint", input_fingerprint(source)).save(15, source_offset(source, 15), len(kept))
+
+    assert main([source, output, "--engine", "demo", "--workers", "0", "--range-bytes", "400"]) == 0
+    assert read_results(output) == complete
+    print("✅ Resume test passed!")
+
+
+def test_rejects_checkpoint_for_other_input():
+    print("\n🧪 Testing checkpoints are tied to their input...")
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "records.jsonl")
+    output = os.path.join(directory, "results.jsonl")
+    write_jsonl(source, 10)
+    assert main([source, output, "--engine", "demo", "--workers", "0"]) == 0
+
+    write_jsonl(source, 12)  # input changed since the checkpoint
+    try:
+        main([source, output, "--engine", "demo", "--workers", "0"])
+        assert False, "expected the stale checkpoint to be rejected"
+    except SystemExit as e:
+        assert "different input" in str(e)
+    print("✅ Checkpoint fingerprint test passed!")
+
+
+def test_existing_output_needs_overwrite():
+    print("\n🧪 Testing an existing output without a checkpoint...")
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "records.jsonl")
+    output = os.path.join(directory, "results.jsonl")
+    write_jsonl(source, 5)
+    with open(output, "w") as f:
+        f.write("results from another tool\n")
+    try:
+        main([source, output, "--engine", "demo", "--workers", "0"])
+        assert False, "expected the existing output to be kept"
+    except SystemExit as e:
+        assert "--overwrite" in str(e)
+    with open(output) as f:
+        assert f.read() == "results from another tool\n"
+
+    assert main([source, output, "--engine", "demo", "--workers", "0", "--overwrite"]) == 0
+    assert [result["id"] for result in read_results(output)] == [f"r{i}" for i in range(5)]
+    print("✅ Overwrite test passed!")
+
+
+def test_copied_input_resumes():
+    print("\n🧪 Testing a copied and touched input still matches its checkpoint...")
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "records.jsonl")
+    copy = os.path.join(tempfile.mkdtemp(), "archive.jsonl")
+    write_jsonl(source, 10)
+    shutil.copy(source, copy)
+    os.utime(copy, ns=(0, 0))
+    assert input_fingerprint(copy) == input_fingerprint(source)
+
+    with open(copy, "a") as f:
+        f.write(json.dumps({"id": "extra", "content": NOTES[0]}) + "\n")
+    assert input_fingerprint(copy) != input_fingerprint(source)
+    print("✅ Fingerprint test passed!")
+
+
+def test_csv_compact_and_errors():
+    print("\n🧪 Testing CSV input, compact output and per-record errors...")
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "records.csv")
+    output = os.path.join(directory, "results.jsonl")
+    with open(source, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "content", "record_type"])
+        writer.writeheader()
+        writer.writerow({"id": "a", "content": NOTES[0], "record_type": "Lab Results"})
+        writer.writerow({"id": "b", "content": "", "record_type": "Lab Results"})
+
+    assert main([source, output, "--engine", "demo", "--workers", "0", "--compact",
+                 "--stages", "risk_assessment"]) == 0
+    first, second = read_results(output)
+    assert first["data"] == {"risk_assessment": {"risk_level": first["data"]["risk_assessment"]["risk_level"]},
+                             "record_type": "Lab Results"}
+    assert not second["success"] and "No content" in second["error"]
+
+    assert main([source, output + "2", "--engine", "demo", "--stages", "bogus"]) == 2
+    print("✅ CSV/compact/error test passed!")
+
+
+def test_malformed_jsonl_lines():
+    print("\n🧪 Testing malformed and blank JSONL lines...")
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "records.jsonl")
+    output = os.path.join(directory, "results.jsonl")
+    with open(source, "w") as f:
+        f.write(json.dumps({"id": "a", "content": NOTES[1]}) + "\n\n")
+        f.write('{"id": "b", "content": \n')
+        f.write(json.dumps({"id": "c", "content": NOTES[2]}))  # no trailing newline
+
+    assert main([source, output, "--engine", "demo", "--workers", "0"]) == 0
+    first, second, third = read_results(output)
+    assert first["success"] and third["success"] and third["id"] == "c"
+    assert not second["success"] and second["id"] == f"offset:{source_offset(source, 2)}"
+    assert "Malformed JSON" in second["error"]
+    print("✅ Malformed line test passed!")
+
+
+if __name__ == "__main__":
+    print("🚀 Bulk Analysis Tests")
+    print("=" * 50)
+    test_in_process_and_pooled_match()
+    test_resume_after_interruption()
+    test_rejects_checkpoint_for_other_input()
+    test_existing_output_needs_overwrite()
+    test_copied_input_resumes()
+    test_csv_compact_and_errors()
+    test_malformed_jsonl_lines()
+    print("\n🎉 All bulk analysis tests passed!")
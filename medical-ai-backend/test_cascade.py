@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test confidence-based cascade routing between engines
+"""
+
+from cascade import CascadeRouter, CascadeTier, RuleConfidence
+from lab_reference import get_lab_reference_table
+from medical_ai_service_demo import MedicalAIService as DemoService
+from medication_lexicon import get_medication_lexicon
+
+
+def make_router(rule_confidence):
+    demo = DemoService()
+    calls = []
+
+    def run_rules(stage, content, record_type):
+        calls.append("rules")
+        if stage == "summary":
+            return demo.create_patient_friendly_summary(content, record_type)
+        if stage == "key_information":
+            return demo.extract_key_information(content)
+        return demo.assess_risk_level(content)
+
+    def run_embeddings(stage, content, record_type):
+        calls.append("embeddings")
+        return {"risk_level": "MEDIUM", "summary": "Semantic summary", "confidence": 0.78}
+
+    router = CascadeRouter([
+        CascadeTier("rules", "Demo Mode", run_rules, rule_confidence, 0.7),
+        CascadeTier("embeddings", "Real LLMware AI", run_embeddings)
+    ])
+    return router, calls
+
+
+def test_routine_record_stays_on_rules():
+    print("🧪 Testing a routine record...")
+    router, calls = make_router(RuleConfidence(get_lab_reference_table(), get_medication_lexicon()))
+    text = "Influenza vaccine administered 10/12/2024. Routine preventive care, patient stable."
+    for stage in ("summary", "key_information", "risk_assessment"):
+        output, engine = router.run(stage, text, "Vaccination")
+        print(f"🪜 {stage}: {engine}")
+        assert engine == "Demo Mode"
+    assert calls == ["rules"] * 3
+    print("✅ Routine record test passed!")
+
+
+def test_abnormal_labs_escalate():
+    print("\n🧪 Testing escalation for out-of-range labs...")
+    router, calls = make_router(RuleConfidence(get_lab_reference_table(), get_medication_lexicon()))
+    text = "Lab results: Hemoglobin: 9.1 g/dL. Prescribed Metformin 500mg twice daily."
+    for stage in ("summary", "key_information", "risk_assessment"):
+        output, engine = router.run(stage, text, "Blood Test")
+        print(f"🪜 {stage}: {engine}")
+        assert engine == "Real LLMware AI"
+
+    stats = router.stats()
+    print(f"📊 Stats: {stats}")
+    assert stats["tiers"]["embeddings"]["answered"] == 3
+    assert stats["tiers"]["rules"]["runs"] == 3 and stats["tiers"]["rules"]["share"] == 0.0
+    print("✅ Escalation test passed!")
+
+
+def test_failed_tier_keeps_cheaper_answer():
+    print("\n🧪 Testing a tier that can't answer...")
+    router = CascadeRouter([
+        CascadeTier("rules", "Demo Mode", lambda *args: {"summary": "Rule summary"}, lambda *args: 0.1, 0.7),
+        CascadeTier("generative", "LLMware Slim Tools", lambda *args: None)
+    ])
+    output, engine = router.run("summary", "text", "Medical Record")
+    assert output == {"summary": "Rule summary"} and engine == "Demo Mode"
+    print("✅ Failed tier test passed!")
+
+
+def test_failed_escalation_keeps_rules_answer():
+    print("\n🧪 Testing an escalated tier that falls back...")
+    router, calls = make_router(RuleConfidence(get_lab_reference_table(), get_medication_lexicon()))
+    # What LLMwareMedicalAIService returns when embedding generation fails
+    router.tiers[1].run = lambda stage, content, record_type: calls.append("embeddings") or {
+        "summary": "This medical record contains important health information.",
+        "confidence": 0.5, "model": "Fallback Mode"
+    }
+    text = "Lab results: Hemoglobin: 9.1 g/dL. Prescribed Metformin 500mg twice daily."
+    output, engine = router.run("summary", text, "Blood Test")
+    print(f"🪜 summary: {engine}, {output['summary'][:60]}...")
+    assert calls == ["rules", "embeddings"] and engine == "Demo Mode"
+    assert output.get("model") != "Fallback Mode"
+    stats = router.stats()["tiers"]
+    assert stats["rules"]["answered"] == 1 and stats["embeddings"]["answered"] == 0
+    print("✅ Failed escalation test passed!")
+
+
+def test_raising_tier_escalates():
+    print("\n🧪 Testing a tier that raises...")
+    def crash(*args):
+        raise RuntimeError("embedding model unavailable")
+
+    router = CascadeRouter([
+        CascadeTier("rules", "Demo Mode", lambda *args: {"summary": "Rule summary"}, lambda *args: 0.1, 0.7),
+        CascadeTier("embeddings", "Real LLMware AI", crash, lambda *args: 1.0, 0.6),
+        CascadeTier("generative", "LLMware Slim Tools", lambda *args: {"summary": "Generated summary"})
+    ])
+    output, engine = router.run("summary", "text", "Medical Record")
+    assert output == {"summary": "Generated summary"} and engine == "LLMware Slim Tools"
+    assert router.stats()["tiers"]["embeddings"]["failed"] == 1
+
+    router.tiers = router.tiers[1:2]  # nothing else can answer
+    try:
+        router.run("summary", "text", "Medical Record")
+    except RuntimeError as e:
+        assert "unavailable" in str(e)
+    else:
+        raise AssertionError("a stage no tier answered should raise")
+    print("✅ Raising tier test passed!")
+
+
+def test_match_confidence():
+    print("\n🧪 Testing embedding confidence from match margins...")
+    from llmware_medical_ai import match_confidence
+    clear = match_confidence([0.72, 0.48, 0.41])
+    close = match_confidence([0.61, 0.60, 0.41])
+    print(f"📏 Clear winner {clear:.3f}, near tie {close:.3f}")
+    assert clear > 0.95 and close < 0.6  # a near tie escalates past EMBEDDING_THRESHOLD
+    assert abs(match_confidence([0.3, 0.5, 0.2], chosen=1) - match_confidence([0.5, 0.3, 0.2])) < 1e-9
+    assert match_confidence([0.9]) == 0.5
+    print("✅ Match confidence test passed!")
+
+
+if __name__ == "__main__":
+    test_routine_record_stays_on_rules()
+    test_abnormal_labs_escalate()
+    test_failed_tier_keeps_cheaper_answer()
+    test_failed_escalation_keeps_rules_answer()
+    test_raising_tier_escalates()
+    test_match_confidence()
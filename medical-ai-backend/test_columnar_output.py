@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test columnar result output (Parquet when pyarrow is installed, npz always)
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+import columnar_output
+from bulk_analyze import main
+from columnar_output import ColumnarWriter, flatten_result, part_paths, read_column
+
+
+def sample_result(i):
+    return {
+        "id": f"r{i}",
+        "success": True,
+        "data": {
+            "summary": {"summary": f"Summary {i}"},
+            "key_information": {"extracted_info": {
+                "detected_categories": ["cardiology", "diabetes"][:i % 3],
+                "medications": ["Metformin 500mg"],
+                "conditions": [],
+                "values": {"lab_glucose": f"{100 + i} mg/dL"}
+            }},
+            "risk_assessment": {"risk_level": ["LOW", "MEDIUM", "HIGH"][i % 3], "confidence": 0.78},
+            "record_type": "Lab Results"
+        }
+    }
+
+
+def write_rows(directory, backend, count, dim=4, row_group_rows=3):
+    writer = ColumnarWriter(directory, embedding_dim=dim, row_group_rows=row_group_rows, backend=backend)
+    for i in range(count):
+        embedding = None if i % 4 == 3 else np.full(dim, i, dtype=np.float64)
+        writer.write(flatten_result(sample_result(i), embedding))
+        if i == 4:
+            writer.commit()  # a second part starts here
+    writer.commit()
+    return writer
+
+
+def check_columns(directory, count):
+    assert list(read_column(directory, "id")) == [f"r{i}" for i in range(count)]
+    assert list(read_column(directory, "risk_level")) == [["LOW", "MEDIUM", "HIGH"][i % 3] for i in range(count)]
+    embeddings = read_column(directory, "embedding")
+    assert embeddings.dtype == np.float32 and embeddings.shape == (count, 4)
+    assert embeddings[2].tolist() == [2.0] * 4
+    assert np.isnan(embeddings[3]).all()  # records without an embedding
+    assert np.allclose(read_column(directory, "risk_confidence"), 0.78)
+
+
+def test_npz_row_groups_and_parts():
+    print("🧪 Testing npz row groups and parts...")
+    directory = tempfile.mkdtemp()
+    writer = write_rows(directory, "npz", 11)
+    assert writer.parts == 2 and writer.rows_written == 11
+    assert [os.path.basename(path) for path in part_paths(directory)] == ["part-00000.npz", "part-00001.npz"]
+    with np.load(part_paths(directory)[1]) as npz:
+        # 6 rows in groups of 3, one member per column per group
+        assert sorted(name for name in npz.files if name.startswith("id-")) == ["id-00000", "id-00001"]
+    check_columns(directory, 11)
+    assert read_column(directory, "categories")[2] == "cardiology; diabetes"
+    assert read_column(directory, "lab_values")[0] == "lab_glucose=100 mg/dL"
+    print("✅ npz test passed!")
+
+
+def test_parquet_without_pyarrow():
+    print("\n🧪 Testing Parquet is refused without pyarrow...")
+    if columnar_output.pq is not None:
+        pytest.skip("pyarrow is installed")
+    try:
+        ColumnarWriter(tempfile.mkdtemp(), backend="parquet")
+        assert False, "expected parquet without pyarrow to be rejected"
+    except ValueError:
+        pass
+    print("✅ Missing pyarrow test passed!")
+
+
+def test_parquet_output():
+    print("\n🧪 Testing Parquet output...")
+    pytest.importorskip("pyarrow")  # optional, see requirements-optional.txt
+    directory = tempfile.mkdtemp()
+    write_rows(directory, "parquet", 11)
+    check_columns(directory, 11)
+    metadata = columnar_output.pq.ParquetFile(part_paths(directory)[1]).metadata
+    assert metadata.num_row_groups == 2 and metadata.num_rows == 6
+    schema = columnar_output.pq.read_schema(part_paths(directory)[0])
+    assert schema.field("embedding").type.list_size == 4
+    assert list(read_column(directory, "categories")[2]) == ["cardiology", "diabetes"]
+    print("✅ Parquet test passed!")
+
+
+def test_interrupted_parts_are_discarded():
+    print("\n🧪 Testing restart after an interrupted part...")
+    directory = tempfile.mkdtemp()
+    writer = ColumnarWriter(directory, row_group_rows=2, backend="npz")
+    writer.write_rows(flatten_result(sample_result(i)) for i in range(3))
+    assert writer.commit() == 1
+    writer.write_rows(flatten_result(sample_result(i)) for i in range(3, 6))
+    assert os.path.exists(os.path.join(directory, "part-00001.npz.tmp"))  # open, uncommitted part
+
+    # The checkpoint says one part; the unfinished one is removed on restart
+    writer = ColumnarWriter(directory, row_group_rows=2, backend="npz", parts_done=1)
+    assert sorted(os.listdir(directory)) == ["part-00000.npz"]
+    writer.write_rows(flatten_result(sample_result(i)) for i in range(3, 5))
+    writer.commit()
+    writer.write(flatten_result(sample_result(5)))
+    writer.close()  # uncommitted rows are dropped
+    assert sorted(os.listdir(directory)) == ["part-00000.npz", "part-00001.npz"]
+    assert list(read_column(directory, "id")) == ["r0", "r1", "r2", "r3", "r4"]
+
+    try:
+        bad = ColumnarWriter(tempfile.mkdtemp(), embedding_dim=4, backend="npz")
+        bad.write(flatten_result(sample_result(0), np.zeros(3)))
+        bad.commit()
+        assert False, "expected a wrong-sized embedding to be rejected"
+    except ValueError:
+        pass
+    print("✅ Interrupted part test passed!")
+
+
+def test_bulk_columnar_output():
+    print("\n🧪 Testing bulk analysis with columnar output...")
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "records.jsonl")
+    with open(source, "w") as f:
+        for i in range(30):
+            f.write(f'{{"id": "n{i}", "content": "Urgent: severe chest pain, patient {i}.", '
+                    f'"record_type": "Emergency Note"}}\n')
+    output = os.path.join(directory, "results")
+    assert main([source, output, "--engine", "demo", "--workers", "0", "--output-format", "npz",
+                 "--embeddings", "--range-bytes", "300", "--row-group-rows", "8", "--part-rows", "16"]) == 0
+    assert len(part_paths(output)) == 2
+    assert list(read_column(output, "id")) == [f"n{i}" for i in range(30)]
+    assert set(read_column(output, "risk_level")) == {"HIGH"}
+    assert read_column(output, "embedding").shape == (30, 384)  # NaN rows: the demo engine has no embeddings
+    print("✅ Bulk columnar test passed!")
+
+
+if __name__ == "__main__":
+    print("🚀 Columnar Output Tests")
+    print("=" * 50)
+    test_npz_row_groups_and_parts()
+    for test in (test_parquet_without_pyarrow, test_parquet_output):
+        try:
+            test()
+        except pytest.skip.Exception as e:
+            print(f"⏭️ Skipped: {e}")
+    test_interrupted_parts_are_discarded()
+    test_bulk_columnar_output()
+    print("\n🎉 All columnar output tests passed!")
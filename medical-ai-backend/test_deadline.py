@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test per-request deadlines and fallback to the rule-based engine
+"""
+
+import os
+import time
+
+os.environ.setdefault("LITE_MODE", "1")
+
+from deadline import Deadline, DeadlineRunner
+
+
+def slow(seconds, value):
+    def run():
+        time.sleep(seconds)
+        return value
+    return run
+
+
+def test_partial_results():
+    print("🧪 Testing partial results at the deadline...")
+    runner = DeadlineRunner(max_workers=2)
+    start = time.perf_counter()
+    outputs, sources = runner.run_stages(
+        {"summary": slow(0.01, "real summary"), "risk_assessment": slow(1.0, "real risk")},
+        lambda stage: f"rule-based {stage}",
+        Deadline(200)
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"⏱️ {elapsed_ms:.0f}ms: {outputs} {sources}")
+    assert outputs == {"summary": "real summary", "risk_assessment": "rule-based risk_assessment"}
+    assert sources == {"summary": "primary", "risk_assessment": "fallback"}
+    assert elapsed_ms < 400
+    assert runner.stats()["degraded"] == 1
+    print("✅ Partial results test passed!")
+
+
+def test_failure_falls_back():
+    print("\n🧪 Testing fallback when the primary engine raises...")
+    def broken():
+        raise RuntimeError("embedding model unavailable")
+
+    runner = DeadlineRunner(max_workers=1)
+    outputs, sources = runner.run_stages({"summary": broken}, lambda stage: "rule-based", Deadline(1000))
+    assert outputs == {"summary": "rule-based"} and sources == {"summary": "fallback"}
+    print("✅ Failure fallback test passed!")
+
+
+def test_timed_out_work_cancelled():
+    print("\n🧪 Testing timed-out work stops instead of holding the pool...")
+    runner = DeadlineRunner(max_workers=1)
+    ran = []
+
+    def stage(name, seconds):
+        def run():
+            ran.append(name)
+            time.sleep(seconds)
+            return name
+        return run
+
+    runner.run_stages({"summary": stage("slow summary", 0.3), "risk_assessment": stage("slow risk", 0)},
+                      lambda stage: "rule-based", Deadline(50))
+    # Queued behind the busy worker, so it times out before starting
+    outputs, _ = runner.run_stages({"summary": stage("queued summary", 0)}, lambda stage: "rule-based", Deadline(50))
+    time.sleep(0.4)
+    print(f"🏃 Stages that ran: {ran}, stats: {runner.stats()}")
+    assert ran == ["slow summary"] and outputs == {"summary": "rule-based"}
+    assert runner.stats()["abandoned"] == 1
+    print("✅ Cancellation test passed!")
+
+
+def test_batch_records_share_deadline():
+    print("\n🧪 Testing batch records each get a share of the deadline...")
+    import api_server
+    from medical_ai_service_demo import MedicalAIService as DemoService
+
+    medical_ai = api_server.medical_ai
+    summarize = medical_ai.create_patient_friendly_summary
+    fallback_summarize = DemoService.create_patient_friendly_summary
+
+    def slow_summarize(content, *args, **kwargs):
+        time.sleep(1.0 if "slow" in content else 0.01)
+        return summarize(content, *args, **kwargs)
+
+    records = [{"id": f"r{i}", "content": f"{word} record: blood pressure 150/95 mmHg"}
+               for i, word in enumerate(["slow", "second", "third"])]
+    client = api_server.app.test_client()
+    api_server.fallback_ai = DemoService()
+    medical_ai.create_patient_friendly_summary = slow_summarize
+    try:
+        body = client.post("/api/batch-analyze", json={"records": records, "stages": ["summary"]},
+                           headers={"X-Deadline-Ms": "600"}).get_json()
+        engines = [result["data"]["engine"]["summary"] for result in body["results"]]
+        print(f"⚙️ Engines: {engines}")
+        assert engines == [api_server.FALLBACK_MODE, api_server.AI_MODE, api_server.AI_MODE]
+
+        # A record that overruns the whole deadline times out the rest
+        def stuck_fallback(service, content, *args, **kwargs):
+            time.sleep(0.5)
+            return fallback_summarize(service, content, *args, **kwargs)
+        DemoService.create_patient_friendly_summary = stuck_fallback
+        body = client.post("/api/batch-analyze", json={"records": records, "stages": ["summary"]},
+                           headers={"X-Deadline-Ms": "300"}).get_json()
+    finally:
+        DemoService.create_patient_friendly_summary = fallback_summarize
+        del medical_ai.create_patient_friendly_summary
+        api_server.fallback_ai = None
+    print(f"⌛ Timed out: {body['timed_out']}")
+    assert body["results"][0]["success"] and body["timed_out"] == 2
+    assert all(result["timed_out"] and not result["success"] for result in body["results"][1:])
+    print("✅ Batch deadline share test passed!")
+
+
+def test_header_parsing():
+    print("\n🧪 Testing deadline header parsing...")
+    assert Deadline.from_header(None).budget_ms > 0
+    assert Deadline.from_header("250").budget_ms == 250
+    assert Deadline.from_header("999999999").budget_ms <= 30000
+    for bad in ("0", "-5", "soon", "nan"):
+        try:
+            Deadline.from_header(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} should be rejected")
+    print("✅ Header parsing test passed!")
+
+
+if __name__ == "__main__":
+    test_partial_results()
+    test_failure_falls_back()
+    test_timed_out_work_cancelled()
+    test_batch_records_share_deadline()
+    test_header_parsing()
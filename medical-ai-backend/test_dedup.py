@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test duplicate detection for batch ingestion
+"""
+
+from dedup import content_key, group_exact_duplicates, find_near_duplicates
+
+
+REPORT = ("Complete Blood Count Report. Hemoglobin: 11.2 g/dL (Normal: 13.5-17.5 g/dL) - LOW. "
+          "Hematocrit: 33.8% - LOW. White Blood Cells: 12,500 /uL - HIGH. Platelets 150,000. "
+          "Follow up with Dr. Smith in two weeks to review results.")
+
+
+def test_exact_duplicates():
+    print("🧪 Testing exact duplicate grouping...")
+    records = [
+        (REPORT, "Blood Test"),
+        ("  " + REPORT.upper().replace(" ", "   ") + "\n", "Blood Test"),  # re-typed copy
+        (REPORT, "Lab Report"),  # different record type changes the summary
+        ("Prescribed Lisinopril 10mg daily.", "Prescription")
+    ]
+    groups = list(group_exact_duplicates(records).values())
+    print(f"📊 Groups: {groups}")
+    assert groups == [[0, 1], [2], [3]]
+
+    # Punctuation carries meaning in results, so only case and spacing fold
+    assert content_key("Glucose: <70 mg/dL", "Lab") != content_key("Glucose: >70 mg/dL", "Lab")
+    assert content_key("Glucose: <70 mg/dL", "Lab") == content_key("glucose:  <70 MG/DL ", "Lab")
+    print("✅ Exact duplicate test passed!")
+
+
+def test_near_duplicates():
+    print("\n🧪 Testing near-duplicate flagging...")
+    rescan = REPORT.replace("two weeks", "2 weeks")
+    unrelated = "Chest X-ray shows no acute abnormalities. Lungs clear, heart size normal."
+    flagged = find_near_duplicates([REPORT, unrelated, rescan])
+    print(f"🔁 Flagged: {flagged}")
+    assert list(flagged) == [2] and flagged[2][0] == 0
+    print("✅ Near-duplicate test passed!")
+
+
+if __name__ == "__main__":
+    test_exact_duplicates()
+    test_near_duplicates()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test module-level extraction and the batch extraction process pool
+"""
+
+import os
+import signal
+import time
+
+import entity_extraction
+from entity_extraction import ExtractionPool, extract_section_entities
+from medication_lexicon import get_medication_lexicon
+from section_cache import SectionCache, split_sections
+
+
+RECORDS = [
+    "Patient has hypertension. BP 150/95 on 03/12/2024. Take Lisinopril 10mg daily.",
+    "Glucose: 126 mg/dL. Cholesterol: 240 mg/dL. Avoid sugary drinks. Monitor blood sugar.",
+    "Temperature 101.2 F. Diagnosis: pneumonia. Prescribed amoxicillin 500mg. Return if fever persists.",
+    "Asthma and allergies, stable. Continue albuterol as needed. Follow up in 6 months."
+]
+
+
+def test_pool_matches_inline():
+    print("🧪 Testing pooled extraction against inline extraction...")
+    lexicon = get_medication_lexicon()
+    sections = [section for record in RECORDS for section in split_sections(record)]
+    pool = ExtractionPool(processes=2, min_sections=1)
+    try:
+        assert pool.start() == 2
+        pooled = pool.extract(sections)
+    finally:
+        pool.close()
+
+    inline = [extract_section_entities(section, lexicon) for section in sections]
+    assert pooled == inline
+    found = {name for entities in pooled for name in entities["medications"]}
+    print(f"💊 Medications found in workers: {sorted(found)}")
+    assert {"Lisinopril", "amoxicillin"} <= found
+    print(f"📊 Stats: {pool.stats()}")
+    assert pool.stats()["pooled_sections"] == len(sections)
+    print("✅ Pool extraction test passed!")
+
+
+def test_small_batches_stay_inline():
+    print("\n🧪 Testing that small batches skip the pool...")
+    pool = ExtractionPool(processes=2, min_sections=64)
+    assert pool.extract(["BP 120/80."]) is None
+    assert pool._executor is None  # never started for a small batch
+    assert ExtractionPool(processes=0).extract(["BP 120/80."] * 100) is None
+    print("✅ Small batch test passed!")
+
+
+def test_broken_pool_restarts_in_background():
+    print("\n🧪 Testing a broken pool is replaced off the request path...")
+    entity_extraction.EXTRACTION_POOL_RESTART_DELAY = 0.2
+    sections = [section for record in RECORDS for section in split_sections(record)]
+    pool = ExtractionPool(processes=2, min_sections=1)
+    try:
+        pool.start()
+        for process in list(pool._executor._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        time.sleep(0.1)
+
+        assert pool.extract(sections) is None  # broken: inline, restart scheduled
+        start = time.perf_counter()
+        assert pool.extract(sections) is None  # still restarting: no fork on this call
+        assert time.perf_counter() - start < 0.05
+
+        deadline = time.time() + 20
+        while pool.stats()["restarts"] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        print(f"📊 Stats: {pool.stats()}")
+        assert pool.stats()["running"] and pool.extract(sections) is not None
+    finally:
+        pool.close()
+    print("✅ Broken pool test passed!")
+
+
+def test_prefetched_entities_skip_extraction():
+    print("\n🧪 Testing prefetched entities in the section cache...")
+    calls = []
+    cache = SectionCache(lambda text: [1.0, 0.0], lambda text: calls.append(text) or {"medications": []})
+    missing = cache.missing_sections(RECORDS[:2] + RECORDS[:1])
+    assert len(missing) == len(set(missing)) == 7
+    cache.prefetch_entities(missing, [{"medications": ["from pool"]}] * len(missing))
+
+    analysis = cache.analyze_document(RECORDS[0])
+    assert not calls and analysis["section_entities"][0]["medications"] == ["from pool"]
+    assert len(cache.missing_sections(RECORDS[:2])) == 4
+    print("✅ Prefetch test passed!")
+
+
+if __name__ == "__main__":
+    test_pool_matches_inline()
+    test_small_batches_stay_inline()
+    test_broken_pool_restarts_in_background()
+    test_prefetched_entities_skip_extraction()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test JSON encoding, response compression and gzip request bodies
+"""
+
+import gzip
+import json
+from decimal import Decimal
+
+import numpy as np
+from flask import Flask, request, jsonify
+
+from http_codec import FastJSONProvider, GzipRequestMiddleware, compress_response
+
+
+def make_app():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.wsgi_app = GzipRequestMiddleware(app.wsgi_app, lambda path: 64 * 1024)
+
+    @app.after_request
+    def encode_response(response):
+        return compress_response(response, request.accept_encodings)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        records = request.get_json()['records']
+        return jsonify({'success': True, 'data': {'results': records}})
+
+    return app
+
+
+RECORD = {
+    'summary': 'Your blood test shows your white blood cell count is higher than normal, which can mean infection.',
+    'risk_assessment': {'level': 'medium', 'score': np.float32(0.5)}
+}
+
+
+def test_json_provider():
+    print("🧪 Testing JSON provider...")
+    app = make_app()
+    with app.app_context():
+        encoded = app.json.dumps({'b': 1, 'a': np.arange(3), 2: 'two'})
+        print(f"📦 Encoded: {encoded}")
+        assert json.loads(encoded) == {'2': 'two', 'a': [0, 1, 2], 'b': 1}
+        # Types orjson can't handle fall back to the stdlib encoder
+        assert json.loads(app.json.dumps({'dose': Decimal('2.5')})) == {'dose': '2.5'}
+    print("✅ JSON provider test passed!")
+
+
+def test_debug_mode_stays_fast():
+    print("\n🧪 Testing responses under app.debug...")
+    app = make_app()
+    app.debug = True
+    response = app.test_client().post('/echo', json={'records': [RECORD]})
+    body = response.get_data(as_text=True)
+    print(f"📦 Debug body: {body[:80]}...")
+    assert response.status_code == 200
+    assert json.loads(body)['data']['results'][0]['risk_assessment']['score'] == 0.5
+    # Flask would indent debug responses, which only the stdlib encoder does
+    assert '\n' not in body.strip()
+    print("✅ Debug mode test passed!")
+
+
+def test_response_compression():
+    print("\n🧪 Testing response compression...")
+    client = make_app().test_client()
+    payload = {'records': [RECORD] * 50}
+
+    plain = client.post('/echo', json=payload)
+    compressed = client.post('/echo', json=payload, headers={'Accept-Encoding': 'gzip, deflate'})
+    small = client.post('/echo', json={'records': []}, headers={'Accept-Encoding': 'gzip'})
+
+    print(f"📊 {len(plain.data)} bytes plain, {len(compressed.data)} bytes gzip")
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert json.loads(gzip.decompress(compressed.data)) == json.loads(plain.data)
+    assert len(compressed.data) * 10 < len(plain.data)
+    assert 'Content-Encoding' not in small.headers  # below MIN_COMPRESS_BYTES
+    print("✅ Response compression test passed!")
+
+
+def test_gzip_request_body():
+    print("\n🧪 Testing gzip request bodies...")
+    client = make_app().test_client()
+    body = json.dumps({'records': [{'content': 'WBC 12.5'}]}).encode('utf-8')
+
+    response = client.post('/echo', data=gzip.compress(body),
+                           headers={'Content-Encoding': 'gzip', 'Content-Type': 'application/json'})
+    assert response.status_code == 200
+    assert response.get_json()['data']['results'] == [{'content': 'WBC 12.5'}]
+
+    # A small upload that inflates past the limit is refused
+    bomb = gzip.compress(json.dumps({'records': ['x' * 200000]}).encode('utf-8'))
+    response = client.post('/echo', data=bomb,
+                           headers={'Content-Encoding': 'gzip', 'Content-Type': 'application/json'})
+    print(f"💣 {len(bomb)} byte upload -> {response.status_code}")
+    assert response.status_code == 413
+
+    response = client.post('/echo', data=b'not gzip',
+                           headers={'Content-Encoding': 'gzip', 'Content-Type': 'application/json'})
+    assert response.status_code == 400
+    print("✅ Gzip request body test passed!")
+
+
+if __name__ == "__main__":
+    test_json_provider()
+    test_debug_mode_stays_fast()
+    test_response_compression()
+    test_gzip_request_body()
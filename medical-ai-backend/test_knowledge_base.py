@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test knowledge base loading, incremental re-embedding, hot reload and the
+per-tenant registry
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from knowledge_base import KnowledgeBase, KnowledgeBaseRegistry, KnowledgeBaseSource, DEFAULT_KB_PATH, KB_DIRECTORY
+
+
+class CountingEmbedder:
+    """Deterministic stand-in for the embedding model that counts calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(384)
+
+
+def write_atomic(path, document):
+    with open(path + ".tmp", "w") as f:
+        json.dump(document, f)
+    os.replace(path + ".tmp", path)
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_hot_reload():
+    print("🧪 Testing hot reload with incremental re-embedding...")
+    path = os.path.join(tempfile.mkdtemp(), "knowledge_base.json")
+    shutil.copy(DEFAULT_KB_PATH, path)
+    embedder = CountingEmbedder()
+    source = KnowledgeBaseSource(path, embedder, interval=0.05)
+
+    original = source.current
+    initial_calls = embedder.calls
+    print(f"🏥 Loaded {original.key}: {len(original)} categories, {initial_calls} patterns embedded")
+    query = embedder("hemoglobin")  # random stand-in vectors: match a pattern exactly
+    assert original.match(query, top_k=1)[0]["category"] == "blood_tests"
+
+    with open(path) as f:
+        document = json.load(f)
+    document["version"] = 2
+    document["entries"].append({
+        "category": "vaccinations",
+        "patterns": ["vaccine", "immunization", "booster"],
+        "responses": {"routine": "This record shows a routine vaccination."}
+    })
+    document["entries"][0]["patterns"].append("mmhg")
+    embedder.calls = 0
+    write_atomic(path, document)
+
+    assert wait_for(lambda: source.current is not original), "reload not picked up"
+    reloaded = source.current
+    print(f"🔄 Reloaded {reloaded.key}: {len(reloaded)} categories, {embedder.calls} patterns embedded")
+    assert reloaded.version == 2 and len(reloaded) == 6
+    assert embedder.calls == 4  # three new vaccination patterns plus "mmhg"
+    # The old snapshot is untouched for requests still using it
+    assert len(original) == 5 and original.match(query, top_k=1)[0]["category"] == "blood_tests"
+    assert reloaded.match(embedder("booster"), top_k=1)[0]["category"] == "vaccinations"
+    print("✅ Hot reload test passed!")
+    source.close()
+
+
+def test_invalid_file_keeps_serving():
+    print("\n🧪 Testing a broken knowledge base file...")
+    path = os.path.join(tempfile.mkdtemp(), "knowledge_base.json")
+    shutil.copy(DEFAULT_KB_PATH, path)
+    source = KnowledgeBaseSource(path, CountingEmbedder(), watch=False)
+    live = source.current
+
+    with open(path, "w") as f:
+        f.write('{"version": 3, "entries": [')
+    assert source.reload() is live
+    write_atomic(path, {"version": 3, "entries": [{"category": "empty"}]})
+    assert source.reload() is live
+    stats = source.stats()
+    print(f"📊 Stats: {stats}")
+    assert stats["failed_reloads"] == 2 and stats["version"] == live.key
+    print("✅ Broken file test passed!")
+
+
+def test_embedding_cache():
+    print("\n🧪 Testing the precomputed embedding cache...")
+    cache_dir = tempfile.mkdtemp()
+    embedder = CountingEmbedder()
+    cold = KnowledgeBase.from_file(DEFAULT_KB_PATH, embedder, cache_dir=cache_dir, model_name="test-model")
+    cold_calls = embedder.calls
+    embedder.calls = 0
+    warm = KnowledgeBase.from_file(DEFAULT_KB_PATH, embedder, cache_dir=cache_dir, model_name="test-model")
+    print(f"📦 Cold load embedded {cold_calls} patterns, warm load {embedder.calls}")
+    assert cold_calls == 32 and embedder.calls == 0
+    assert warm.key == cold.key and np.allclose(warm.matrix, cold.matrix)
+
+    # A different embedding model never reuses another model's vectors
+    KnowledgeBase.from_file(DEFAULT_KB_PATH, embedder, cache_dir=cache_dir, model_name="other-model")
+    assert embedder.calls == 32
+    print("✅ Embedding cache test passed!")
+
+
+def test_registry_lazy_load_and_eviction():
+    print("\n🧪 Testing lazily loaded tenant knowledge bases...")
+    directory = tempfile.mkdtemp()
+    for name in ("clinic_a", "clinic_b", "clinic_c"):
+        shutil.copy(DEFAULT_KB_PATH, os.path.join(directory, f"{name}.json"))
+    shutil.copy(os.path.join(KB_DIRECTORY, "es.json"), os.path.join(directory, "es.json"))
+
+    embedder = CountingEmbedder()
+    default = KnowledgeBase.from_file(DEFAULT_KB_PATH, CountingEmbedder())
+    # Room for two tenant KBs besides the always-resident default
+    registry = KnowledgeBaseRegistry(embedder, "test-model", directory=directory, cache_dir=None,
+                                     budget_mb=2.5 * default.nbytes / (1024 * 1024), watch=False)
+    assert registry.stats()["resident"] == {}
+
+    spanish = registry.get("es")
+    assert spanish.match(embedder("hemoglobina"), top_k=1)[0]["category"] == "blood_tests"
+    assert registry.get("clinic_a") is not registry.get("default")
+    registry.get("es")  # clinic_a is now least recently used
+    registry.get("clinic_b")
+    stats = registry.stats()
+    print(f"📊 Stats: {stats}")
+    assert set(stats["resident"]) == {"es", "clinic_b"}
+    assert stats["evictions"] == 1 and stats["loads"] == 3 and stats["hits"] == 1
+
+    # Per-request resolution: most specific existing name, else the default
+    assert registry.resolve(["clinic_c.fr", "clinic_c"]) is registry.get("clinic_c")
+    assert registry.resolve(["clinic_z.fr", "clinic_z", "fr"]) is registry.default.current
+    for name, error in (("../secrets", ValueError), ("clinic_z", LookupError)):
+        try:
+            registry.get(name)
+            assert False, f"{name} should raise {error.__name__}"
+        except error as e:
+            print(f"🚫 {name}: {e}")
+    print("✅ Registry test passed!")
+
+
+if __name__ == "__main__":
+    test_hot_reload()
+    test_invalid_file_keeps_serving()
+    test_embedding_cache()
+    test_registry_lazy_load_and_eviction()
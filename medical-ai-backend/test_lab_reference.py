@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test data-driven lab classification
+Covers scaled units, inline reference ranges and explicit LOW/HIGH markers
+"""
+
+import time
+
+from lab_reference import LabReferenceTable
+
+
+def test_lab_classification():
+    print("🧪 Testing lab reference classification...")
+    table = LabReferenceTable.from_file()
+
+    cbc_text = """
+    White Blood Cell Count: 7.2 x10³/μL (Normal range: 4.0-11.0)
+    Hemoglobin: 11.2 g/dL (Normal: 13.5-17.5 g/dL) - LOW
+    Platelets: 150,000 /μL
+    Glucose: 6.1 mmol/L
+    """
+    results = {r["analyte"]: r for r in table.classify(cbc_text)}
+    for name, result in results.items():
+        print(f"  {name}: {result['value']} {result['unit']} -> {result['status']} ({result['range_source']})")
+
+    assert results["white blood cells"]["status"] == "normal"
+    assert results["white blood cells"]["range_source"] == "inline"
+    assert results["hemoglobin"]["status"] == "low"
+    assert results["platelets"]["range_source"] == "reference"
+    assert results["glucose"]["status"] == "high"  # 6.1 mmol/L is ~110 mg/dL
+    print("✅ Lab classification test passed!")
+
+
+def test_large_table():
+    print("\n🧪 Testing classification cost with a 500-analyte table...")
+    analytes = [{
+        "name": f"analyte {i}",
+        "aliases": [f"analyte{i}"],
+        "unit": "mg/dL",
+        "range": [10, 20],
+        "conversions": {"mg/dL": 1}
+    } for i in range(500)]
+    table = LabReferenceTable({"analytes": analytes})
+
+    report = "\n".join(f"Analyte{i}: {i % 30} mg/dL" for i in range(0, 500, 5))
+    start = time.perf_counter()
+    results = table.classify(report)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"⏱️ Classified {len(results)} values in {elapsed_ms:.2f}ms")
+    assert len(results) == 100
+    print("✅ Large table test passed!")
+
+
+if __name__ == "__main__":
+    test_lab_classification()
+    test_large_table()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test the medication lexicon lookup
+Checks extraction against the bundled lexicon and lookup cost at 50k+ names
+"""
+
+import random
+import string
+import time
+
+from llmware_medical_ai import LLMwareMedicalAIService
+from medication_lexicon import MedicationLexicon
+
+
+def test_bundled_lexicon():
+    print("🧪 Testing bundled medication lexicon...")
+    lexicon = MedicationLexicon.from_file()
+    print(f"📊 Stats: {lexicon.stats()}")
+
+    text = "Prescribed Lisinopril 10mg daily and Insulin Glargine 20 units at night. Take with morning meal."
+    found = [name for name, _, _, _ in lexicon.find(text)]
+    print(f"💊 Found: {found}")
+    assert found == ["lisinopril", "insulin glargine"]
+    assert "take" not in lexicon and "morning" not in lexicon
+    print("✅ Bundled lexicon test passed!")
+
+
+def test_large_lexicon_lookup():
+    print("\n🧪 Testing lookup cost at 50k names...")
+    rng = random.Random(42)
+    names = {"".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 14))) for _ in range(60000)}
+
+    start = time.perf_counter()
+    lexicon = MedicationLexicon(names)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"📊 Built {len(lexicon)} names in {build_ms:.1f}ms: {lexicon.stats()}")
+
+    probes = rng.sample(sorted(names), 5000) + ["notadrugname"] * 5000
+    start = time.perf_counter()
+    hits = sum(1 for probe in probes if probe in lexicon)
+    per_lookup_us = (time.perf_counter() - start) / len(probes) * 1e6
+    print(f"⏱️ {per_lookup_us:.2f}µs per lookup")
+    assert hits == 5000
+    print("✅ Large lexicon test passed!")
+
+
+def test_dosages_without_lexicon():
+    print("\n🧪 Testing dosage extraction when the lexicon is missing...")
+    service = LLMwareMedicalAIService.__new__(LLMwareMedicalAIService)  # no models needed
+    text = "Take Lisinopril 10mg daily and Atorvastatin 20 mg at night. Amoxicillin course finished."
+
+    service.medication_lexicon = None
+    fallback = service._extract_medications_detailed(text)
+    service.medication_lexicon = MedicationLexicon.from_file()
+    with_lexicon = service._extract_medications_detailed(text)
+    print(f"💊 Fallback: {fallback}")
+    # Amoxicillin has no dose, so neither path lists it
+    assert fallback == with_lexicon == [{"name": "Lisinopril", "dosage": "10mg"},
+                                        {"name": "Atorvastatin", "dosage": "20 mg"}]
+    print("✅ Fallback dosage test passed!")
+
+
+if __name__ == "__main__":
+    test_bundled_lexicon()
+    test_large_lexicon_lookup()
+    test_dosages_without_lexicon()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test memory reports and snapshot diffs
+"""
+
+from memory_diagnostics import MemoryDiagnostics, debug_authorized
+
+
+retained = []
+
+
+def leaky_handler():
+    retained.append(bytearray(64 * 1024))
+
+
+def test_report():
+    print("🧪 Testing the memory report...")
+    diagnostics = MemoryDiagnostics(frames=5)
+    blocks = [bytearray(256 * 1024) for _ in range(8)]  # 2 MB at one line
+    report = diagnostics.report(limit=5, object_types=True)
+    print(f"📊 RSS {report['rss_mb']} MB, traced {report['traced_mb']} MB, top: {report['top'][0]}")
+    assert report["rss_mb"] > 0 and report["traced_mb"] >= 2
+    assert "test_memory_diagnostics.py:" in report["top"][0]["site"]
+    assert report["top"][0]["size_kb"] >= 2048
+    assert len(report["object_types"]) == 5 and "function" in report["object_types"]
+    del blocks
+    print("✅ Report test passed!")
+
+
+def test_snapshot_diff_finds_growth():
+    print("\n🧪 Testing snapshot diffs...")
+    diagnostics = MemoryDiagnostics(frames=5, max_snapshots=2)
+    before = diagnostics.snapshot()
+    for _ in range(20):
+        leaky_handler()
+    after = diagnostics.snapshot()
+
+    diff = diagnostics.diff(before, after, limit=3)
+    print(f"📈 Growth {diff['size_diff_kb']} KB, top: {diff['top'][0]}")
+    assert "test_memory_diagnostics.py:" in diff["top"][0]["site"]
+    assert diff["top"][0]["count_diff"] >= 20 and diff["top"][0]["size_diff_kb"] >= 1280
+
+    traceback = diagnostics.diff(before, limit=1, group_by="traceback")["top"][0]["site"]
+    assert any("leaky_handler" in line for line in traceback)
+
+    diagnostics.snapshot()  # only the newest two are kept
+    try:
+        diagnostics.diff(before)
+        assert False, "evicted snapshot should raise KeyError"
+    except KeyError:
+        pass
+    print("✅ Snapshot diff test passed!")
+
+
+def test_debug_token():
+    print("\n🧪 Testing the debug token check...")
+    assert debug_authorized(None, token="")
+    assert not debug_authorized(None, token="dbg")
+    assert not debug_authorized("nope", token="dbg")
+    assert debug_authorized("dbg", token="dbg")
+    print("✅ Debug token test passed!")
+
+
+if __name__ == "__main__":
+    test_report()
+    test_snapshot_diff_finds_growth()
+    test_debug_token()
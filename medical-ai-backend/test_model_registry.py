@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test the memory-budgeted model registry with stand-in models
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from medical_ai_service import MedicalAIService
+from model_registry import ModelRegistry
+from prompt_cache import PromptCache
+
+
+class FakeModel:
+    """Holds ~size_mb of touched memory, like a loaded GGUF model"""
+
+    def __init__(self, name, size_mb):
+        self.name = name
+        self.weights = np.ones(size_mb * 1024 * 1024 // 8)
+        self.unloaded = False
+
+    def unload_model(self):
+        self.unloaded = True
+        self.weights = None
+
+    def function_call(self, prompt, function=None):
+        started = getattr(self, "started", None)
+        if started is not None:
+            started.set()
+            self.proceed.wait(5)
+        assert not self.unloaded, f"{self.name} was unloaded while generating"
+        return {"llm_response": f"{self.name} {function}"}
+
+
+def make_loader(size_mb=80, delay=0.0):
+    calls = []
+
+    def loader(name):
+        calls.append(name)
+        time.sleep(delay)
+        return FakeModel(name, size_mb)
+    return loader, calls
+
+
+def test_single_loader():
+    print("🧪 Testing concurrent first use...")
+    loader, calls = make_loader(size_mb=8, delay=0.2)
+    registry = ModelRegistry(loader, budget_mb=1024)
+
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.get("slim-summary-tool")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"📊 Loader calls: {calls}")
+    assert calls == ["slim-summary-tool"]
+    assert all(model is models[0] for model in models)
+    print("✅ Single loader test passed!")
+
+
+def test_budget_eviction():
+    print("\n🧪 Testing LRU eviction under the memory budget...")
+    loader, calls = make_loader(size_mb=80)
+    registry = ModelRegistry(loader, budget_mb=200)
+
+    summary = registry.get("slim-summary-tool")
+    registry.get("slim-extract-tool")
+    registry.get("slim-summary-tool")  # summary is now most recently used
+    registry.get("slim-sentiment-tool")
+
+    stats = registry.stats()
+    print(f"📊 Resident: {list(stats['resident'])}, {stats['resident_mb']}MB of {stats['budget_mb']}MB")
+    assert "slim-extract-tool" not in registry
+    assert "slim-summary-tool" in registry and "slim-sentiment-tool" in registry
+    assert stats["evictions"] == 1 and not summary.unloaded
+    assert 120 <= stats["resident_mb"] <= 200
+
+    registry.get("slim-extract-tool")
+    stats = registry.stats()
+    print(f"📊 Hits {stats['hits']}, misses {stats['misses']}, hit rate {stats['hit_rate']}, "
+          f"loads {stats['loads']}, evictions {stats['evictions']}")
+    assert calls.count("slim-extract-tool") == 2 and "slim-summary-tool" not in registry
+    assert stats["hits"] == 1 and stats["misses"] == 4
+    print("✅ Budget eviction test passed!")
+
+
+def test_leased_models_not_evicted():
+    print("\n🧪 Testing eviction skips models in use...")
+    loader, calls = make_loader(size_mb=80)
+    registry = ModelRegistry(loader, budget_mb=100)  # room for one model
+
+    with registry.lease("slim-summary-tool") as summary:
+        registry.get("slim-extract-tool")  # over budget, but summary is in use
+        assert "slim-summary-tool" in registry and not summary.unloaded
+        assert registry.stats()["resident"]["slim-summary-tool"]["leases"] == 1
+
+        registry.unload("slim-summary-tool")  # deferred until the lease ends
+        assert "slim-summary-tool" not in registry and not summary.unloaded
+    assert summary.unloaded
+
+    # Once nothing is leased the budget applies again
+    registry.get("slim-sentiment-tool")
+    assert list(registry.stats()["resident"]) == ["slim-sentiment-tool"]
+    print("✅ Leased model test passed!")
+
+
+def test_concurrent_eviction_during_call():
+    print("\n🧪 Testing a load on another thread while a model generates...")
+    loader, calls = make_loader(size_mb=80)
+    registry = ModelRegistry(loader, budget_mb=100)
+    service = MedicalAIService(registry=registry, preload=[],
+                               prompt_cache=PromptCache(os.path.join(tempfile.mkdtemp(), "prompts.db")))
+    summary = registry.get("slim-summary-tool")
+    summary.started, summary.proceed = threading.Event(), threading.Event()
+
+    results = []
+    caller = threading.Thread(target=lambda: results.append(
+        service.function_call("slim-summary-tool", "BP 150/95", "summarize")))
+    caller.start()
+    assert summary.started.wait(5)
+    # Loading the extractor needs summary's memory, but summary is mid-call
+    service.function_call("slim-extract-tool", "BP 150/95", "extract")
+    assert not summary.unloaded
+    summary.proceed.set()
+    caller.join()
+
+    print(f"📊 Results: {results}, resident {list(registry.stats()['resident'])}")
+    assert results == [{"llm_response": "slim-summary-tool summarize"}]
+    assert registry.stats()["resident"]["slim-summary-tool"]["leases"] == 0
+    registry.get("slim-sentiment-tool")  # now summary can go
+    assert summary.unloaded
+    print("✅ Concurrent eviction test passed!")
+
+
+if __name__ == "__main__":
+    test_single_loader()
+    test_budget_eviction()
+    test_leased_models_not_evicted()
+    test_concurrent_eviction_during_call()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test the persistent prompt result cache
+"""
+
+import os
+import tempfile
+import time
+
+from prompt_cache import PromptCache
+
+
+PROMPT = "Please provide a clear, patient-friendly summary of this lab report. Medical Content: WBC 12.5"
+
+
+def test_persistence():
+    print("🧪 Testing cache hits across restarts...")
+    path = os.path.join(tempfile.mkdtemp(), "prompt_cache.sqlite3")
+    response = {"llm_response": "Your white blood cell count is high.", "usage": {"output": 9}}
+
+    cache = PromptCache(path)
+    assert cache.get("slim-summary-tool", "summarize", PROMPT) is None
+    cache.put("slim-summary-tool", "summarize", PROMPT, response)
+    cache.close()
+
+    reopened = PromptCache(path)
+    start = time.perf_counter()
+    cached = reopened.get("slim-summary-tool", "summarize", PROMPT)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"⚡ Hit after reopen in {elapsed_ms:.2f}ms")
+    assert cached == response
+    # Same prompt to a different model or function is a different entry
+    assert reopened.get("slim-extract-tool", "summarize", PROMPT) is None
+    assert reopened.get("slim-summary-tool", "extract", PROMPT) is None
+
+    stats = reopened.stats()
+    print(f"📊 Stats: {stats}")
+    assert stats["entries"] == 1 and stats["hits"] == 1 and stats["misses"] == 2
+    print("✅ Persistence test passed!")
+
+
+def test_size_bounded_eviction():
+    print("\n🧪 Testing size-bounded eviction...")
+    cache = PromptCache(":memory:", max_mb=0.01)  # ~10KB
+    for i in range(40):
+        cache.put("slim-summary-tool", "summarize", f"{PROMPT} #{i}", {"llm_response": "x" * 500})
+        time.sleep(0.001)
+        cache.get("slim-summary-tool", "summarize", f"{PROMPT} #0")  # keep the first one hot
+
+    stats = cache.stats()
+    print(f"📊 Stats: {stats}")
+    assert stats["size_mb"] <= 0.01 and stats["evictions"] > 0
+    assert cache.get("slim-summary-tool", "summarize", f"{PROMPT} #0") is not None
+    assert cache.get("slim-summary-tool", "summarize", f"{PROMPT} #1") is None
+    assert cache.get("slim-summary-tool", "summarize", f"{PROMPT} #39") is not None
+    print("✅ Eviction test passed!")
+
+
+def test_hits_do_not_write():
+    print("\n🧪 Testing cache hits stay off the write path...")
+    path = os.path.join(tempfile.mkdtemp(), "prompt_cache.sqlite3")
+    cache = PromptCache(path)
+    cache.put("slim-summary-tool", "summarize", PROMPT, {"llm_response": "cached"})
+    writes = cache._db.total_changes
+    for _ in range(10):
+        assert cache.get("slim-summary-tool", "summarize", PROMPT) is not None
+    assert cache._db.total_changes == writes  # recency is held in memory
+    cache.close()  # and written on close
+    reopened = PromptCache(path)
+    last_used, created = reopened._db.execute("SELECT last_used, created FROM prompt_results").fetchone()
+    assert last_used > created
+    print("✅ Lazy recency test passed!")
+
+
+def test_entries_expire():
+    print("\n🧪 Testing cached generations expire...")
+    path = os.path.join(tempfile.mkdtemp(), "prompt_cache.sqlite3")
+    cache = PromptCache(path, ttl_hours=1)
+    cache.put("slim-summary-tool", "summarize", PROMPT, {"llm_response": "cached"})
+    cache.put("slim-summary-tool", "summarize", PROMPT + " again", {"llm_response": "fresh"})
+    # Age the first entry past the TTL
+    cache._db.execute("UPDATE prompt_results SET created = created - 7200 WHERE response LIKE '%cached%'")
+    cache._db.commit()
+    assert cache.get("slim-summary-tool", "summarize", PROMPT) is None
+    cache.close()
+
+    reopened = PromptCache(path, ttl_hours=1)  # expired rows are deleted at open
+    stats = reopened.stats()
+    print(f"📊 Stats: {stats}")
+    assert stats["entries"] == 1 and stats["expired"] == 1
+    assert reopened.get("slim-summary-tool", "summarize", PROMPT + " again") == {"llm_response": "fresh"}
+    print("✅ Expiry test passed!")
+
+
+if __name__ == "__main__":
+    test_persistence()
+    test_size_bounded_eviction()
+    test_hits_do_not_write()
+    test_entries_expire()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test memory-mapped JSONL reading and byte-range splitting
+"""
+
+import json
+import mmap
+import os
+import tempfile
+
+from record_reader import MappedFile, iter_records, split_ranges
+
+
+def write_lines(lines, trailing_newline=True):
+    path = os.path.join(tempfile.mkdtemp(), "records.jsonl")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + ("\n" if trailing_newline else ""))
+    return path
+
+
+def read_ranges(path, ranges):
+    records = []
+    for start, end in ranges:
+        with MappedFile(path, start, end) as mapped:
+            records.extend(record.load() for record in mapped.records())
+    return records
+
+
+def test_ranges_cover_every_record_once():
+    print("🧪 Testing byte ranges split on record boundaries...")
+    # Long enough that ranges start past the allocation granularity
+    lines = [json.dumps({"id": i, "content": "x" * (i % 97)}) for i in range(3000)]
+    expected = [json.loads(line) for line in lines]
+    for trailing_newline in (True, False):
+        path = write_lines(lines, trailing_newline)
+        size = os.path.getsize(path)
+        assert size > 2 * mmap.ALLOCATIONGRANULARITY
+        for range_bytes in (1, 100, 4096, 65536, size * 2):
+            ranges = list(split_ranges(path, range_bytes))
+            assert ranges[0][0] == 0 and ranges[-1][1] == size
+            assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+            assert read_ranges(path, ranges) == expected, range_bytes
+    print("✅ Range split test passed!")
+
+
+def test_resume_from_offset():
+    print("\n🧪 Testing ranges that start mid-file...")
+    lines = [json.dumps({"id": i}) for i in range(500)]
+    path = write_lines(lines)
+    offset = sum(len(line) + 1 for line in lines[:321])
+    assert [record["id"] for record in iter_records(path, offset)] == list(range(321, 500))
+    assert [record["id"] for record in read_ranges(path, split_ranges(path, 700, offset))] == list(range(321, 500))
+    print("✅ Offset test passed!")
+
+
+def test_lazy_decoding():
+    print("\n🧪 Testing blank lines and lazy decoding...")
+    path = write_lines(['{"id": 1}', "", "   ", '{"id": 2, "note": "café"}', "{broken", '\t{"id": 3}'])
+    with MappedFile(path) as mapped:
+        records = list(mapped.records())  # nothing decoded yet, so the broken line is fine here
+        assert len(records) == 4
+        assert records[1].load() == {"id": 2, "note": "café"}
+        assert records[2].raw() == b"{broken"
+        try:
+            records[2].load()
+            assert False, "expected malformed JSON to raise"
+        except ValueError:
+            pass
+        assert records[3].load() == {"id": 3}
+    # Every view was released, so the mapping closed cleanly
+
+    empty = write_lines([], trailing_newline=False)
+    assert list(split_ranges(empty)) == [] and list(iter_records(empty)) == []
+    print("✅ Lazy decoding test passed!")
+
+
+if __name__ == "__main__":
+    print("🚀 Record Reader Tests")
+    print("=" * 50)
+    test_ranges_cover_every_record_once()
+    test_resume_from_offset()
+    test_lazy_decoding()
+    print("\n🎉 All record reader tests passed!")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test the opt-in request profiler
+"""
+
+import os
+import pstats
+import tempfile
+import threading
+import time
+
+from deadline import Deadline, DeadlineRunner
+from request_profiler import RequestProfiler, current_session
+
+
+def busy_work(duration):
+    end = time.perf_counter() + duration
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(i * i for i in range(200))
+    return total
+
+
+def other_request_work(duration):
+    return busy_work(duration)
+
+
+def test_token_and_sampling_choice():
+    print("🧪 Testing which requests get profiled...")
+    profiler = RequestProfiler(tempfile.mkdtemp(), token="s3cret", sample_rate=0)
+    assert profiler.choose(None) is None
+    assert profiler.choose("wrong") is None
+    assert profiler.choose("s3cret") == "sampling"
+    assert profiler.choose("s3cret", "deterministic") == "deterministic"
+    assert RequestProfiler(tempfile.mkdtemp(), token="", sample_rate=0).choose("") is None
+    always = RequestProfiler(tempfile.mkdtemp(), token="", sample_rate=1.0)
+    assert always.choose(None, "deterministic") == "sampling"  # deterministic needs the token
+    print("✅ Profile choice test passed!")
+
+
+def test_sampling_writes_collapsed_stacks():
+    print("\n🧪 Testing collapsed stack output...")
+    directory = tempfile.mkdtemp()
+    profiler = RequestProfiler(directory, token="s3cret", interval_ms=1)
+    session = profiler.start("sampling")
+    busy_work(0.2)
+    name = profiler.finish(session, "POST /api/analyze")
+    print(f"📄 Wrote {name}")
+    assert name.endswith(".folded") and "POST_api_analyze" in name
+
+    with open(os.path.join(directory, name)) as f:
+        lines = f.read().splitlines()
+    stacks = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+    busy = sum(count for stack, count in stacks.items() if "test_request_profiler.py:busy_work" in stack)
+    print(f"🔥 {sum(stacks.values())} samples, {busy} in busy_work")
+    assert all(stack.startswith("request;") for stack in stacks)
+    assert busy > 0.5 * sum(stacks.values())
+    print("✅ Collapsed stack test passed!")
+
+
+def test_deterministic_profile_and_pruning():
+    print("\n🧪 Testing deterministic profiles and pruning...")
+    directory = tempfile.mkdtemp()
+    profiler = RequestProfiler(directory, token="s3cret", max_files=2)
+    names = []
+    for _ in range(3):
+        session = profiler.start("deterministic")
+        busy_work(0.01)
+        names.append(profiler.finish(session, "GET /health"))
+        time.sleep(0.01)  # distinct modification times
+    assert sorted(os.listdir(directory)) == sorted(names[1:])
+    functions = {func[2] for func in pstats.Stats(os.path.join(directory, names[-1])).stats}
+    assert "busy_work" in functions
+    assert profiler.stats()["profiled"] == 3
+    print("✅ Deterministic profile test passed!")
+
+
+def test_profiles_follow_the_request_into_the_pool():
+    print("\n🧪 Testing profiles cover the request's own analysis work only...")
+    directory = tempfile.mkdtemp()
+    profiler = RequestProfiler(directory, token="s3cret", interval_ms=1)
+    runner = DeadlineRunner(max_workers=2)
+
+    def fallback(stage):
+        return None
+
+    # Another request's stage, busy on the same pool the whole time
+    other = threading.Thread(target=runner.run_stages,
+                             args=({"summary": lambda: other_request_work(0.5)}, fallback, Deadline(2000)))
+    other.start()
+    time.sleep(0.02)
+
+    session = profiler.start("sampling")
+    runner.run_stages({"summary": lambda: busy_work(0.2)}, fallback, Deadline(2000))
+    name = profiler.finish(session, "POST /api/analyze")
+    with open(os.path.join(directory, name)) as f:
+        stacks = [line.rsplit(" ", 1)[0] for line in f.read().splitlines()]
+    workers = [stack for stack in stacks if stack.startswith("analysis")]
+    print(f"🔥 {len(stacks)} stacks, {len(workers)} from the analysis pool")
+    assert any("test_request_profiler.py:busy_work" in stack for stack in workers)
+    assert not any("other_request_work" in stack for stack in stacks)
+
+    session = profiler.start("deterministic")
+    runner.run_stages({"summary": lambda: busy_work(0.01)}, fallback, Deadline(2000))
+    name = profiler.finish(session, "POST /api/analyze")
+    functions = {func[2] for func in pstats.Stats(os.path.join(directory, name)).stats}
+    assert "busy_work" in functions and "other_request_work" not in functions
+    assert current_session.get() is None
+    other.join()
+    print("✅ Pool profiling test passed!")
+
+
+if __name__ == "__main__":
+    test_token_and_sampling_choice()
+    test_sampling_writes_collapsed_stacks()
+    test_deterministic_profile_and_pruning()
+    test_profiles_follow_the_request_into_the_pool()
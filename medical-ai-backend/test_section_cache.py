@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test incremental section-level re-analysis
+Checks that an edited record only recomputes the sections that changed
+"""
+
+import hashlib
+
+import numpy as np
+
+from section_cache import SectionCache, split_sections, merge_section_entities
+
+
+def hashed_embedding(text, dim=32):
+    """Deterministic stand-in embedding so the cache can be tested offline"""
+    seed = int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(dim)
+
+
+def word_entities(text):
+    return {"conditions": [w for w in ("hypertension", "diabetes") if w in text.lower()]}
+
+
+def test_incremental_reanalysis():
+    print("🧪 Testing incremental section re-analysis...")
+    embed_calls = []
+
+    def embed(text):
+        embed_calls.append(text)
+        return hashed_embedding(text)
+
+    cache = SectionCache(embed, word_entities)
+
+    original = (
+        "Patient has hypertension. Blood pressure 150/95 mmHg.\n"
+        "Hemoglobin: 14.2 g/dL\n"
+        "Take Lisinopril 10mg daily. Follow up in 3 months."
+    )
+    edited = original.replace("3 months", "6 months")
+
+    first = cache.analyze_document(original)
+    print(f"📊 First pass: {first['sections_recomputed']}/{first['sections_total']} sections computed")
+    assert first["sections_recomputed"] == first["sections_total"] == len(split_sections(original))
+
+    embed_calls.clear()
+    second = cache.analyze_document(edited)
+    print(f"♻️ After one-line edit: {second['sections_recomputed']}/{second['sections_total']} sections computed")
+    assert second["sections_recomputed"] == 1
+    assert embed_calls == ["Follow up in 6 months."]
+
+    entities = merge_section_entities(second["section_entities"])
+    assert entities["conditions"] == ["hypertension"]
+    assert second["embedding"].shape == (32,)
+
+    print(f"📈 Cache stats: {cache.stats()}")
+    print("✅ Incremental re-analysis test passed!")
+
+
+def test_merge_keeps_last_lab_value():
+    print("\n🧪 Testing merged values match a whole-document extraction...")
+    entities = merge_section_entities([
+        {"values": {"blood_pressure": "150/95", "lab_glucose": "100 mg"}},
+        {"values": {"blood_pressure": "120/80", "lab_glucose": "200 mg", "lab_hemoglobin": "14.2 g"}}
+    ])
+    print(f"📋 Values: {entities['values']}")
+    # The first blood pressure (re.search) and the last glucose (findall into a dict)
+    assert entities["values"] == {"blood_pressure": "150/95", "lab_glucose": "200 mg", "lab_hemoglobin": "14.2 g"}
+    print("✅ Merge order test passed!")
+
+
+if __name__ == "__main__":
+    test_incremental_reanalysis()
+    test_merge_keeps_last_lab_value()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test publishing and attaching shared read-only matrices
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from knowledge_base import KnowledgeBase, DEFAULT_KB_PATH
+from shared_matrices import SharedMatrixStore
+
+
+def fake_embedding(text):
+    seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(384)
+
+
+def test_publish_once_attach_everywhere():
+    print("🧪 Testing publish once, attach everywhere...")
+    directory = tempfile.mkdtemp()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    first = SharedMatrixStore(directory).publish("prototypes", "v1", build)
+    second = SharedMatrixStore(directory).publish("prototypes", "v1", build)
+    assert len(builds) == 1
+    assert isinstance(second, np.memmap) and not second.flags.writeable
+    assert np.array_equal(first, second)
+
+    # Another process maps the same file without building anything
+    code = ("import sys; from shared_matrices import SharedMatrixStore; "
+            f"m = SharedMatrixStore({directory!r}).attach('prototypes', 'v1'); print(float(m.sum()))")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert float(output) == 66.0
+
+    # A new version replaces the old file
+    SharedMatrixStore(directory).publish("prototypes", "v2", lambda: np.ones((2, 4)))
+    assert sorted(os.listdir(directory)) == ["prototypes@v2.npy"]
+    assert first.sum() == 66.0  # existing mappings stay valid
+    print("✅ Publish/attach test passed!")
+
+
+def test_knowledge_base_attaches_published_version():
+    print("\n🧪 Testing knowledge bases built once per host...")
+    store = SharedMatrixStore(tempfile.mkdtemp())
+    path = os.path.join(tempfile.mkdtemp(), "knowledge_base.json")
+    shutil.copy(DEFAULT_KB_PATH, path)
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return fake_embedding(text)
+
+    published = KnowledgeBase.from_file(path, embed, shared=store)
+    embedded = len(calls)
+    attached = KnowledgeBase.from_file(path, embed, shared=store)
+    print(f"📦 Publisher embedded {embedded} patterns, attacher {len(calls) - embedded}")
+    print(f"📊 Stats: {store.stats()}")
+    assert embedded == 32 and len(calls) == embedded
+    assert isinstance(attached.matrix, np.memmap)
+    assert all(isinstance(v, np.memmap) for v in attached.pattern_vectors.values())
+    query = fake_embedding("hemoglobin")
+    assert attached.match(query) == published.match(query)
+    assert attached.match(query, top_k=1)[0]["category"] == "blood_tests"
+    print("✅ Knowledge base sharing test passed!")
+
+
+def test_same_basename_kbs_keep_their_segments():
+    print("\n🧪 Testing two KBs with the same file name...")
+    store = SharedMatrixStore(tempfile.mkdtemp())
+    paths = [os.path.join(tempfile.mkdtemp(), "knowledge_base.json") for _ in range(2)]
+    shutil.copy(DEFAULT_KB_PATH, paths[0])
+    with open(DEFAULT_KB_PATH) as f, open(paths[1], "w") as out:
+        out.write(f.read().replace("hemoglobin", "haemoglobin"))  # a different version
+
+    first = KnowledgeBase.from_file(paths[0], fake_embedding, shared=store)
+    second = KnowledgeBase.from_file(paths[1], fake_embedding, shared=store)
+    again = KnowledgeBase.from_file(paths[0], fake_embedding, shared=store)
+    segments = store.stats()["segments"]
+    print(f"📦 Segments: {sorted(segments)}")
+    assert len(segments) == 4  # patterns and categories for each file
+    # Neither publish removed the other's files, so all three stay shared
+    for kb in (first, second, again):
+        assert isinstance(kb.matrix, np.memmap)
+    assert len(os.listdir(store.directory)) == 4
+    print("✅ Same basename test passed!")
+
+
+if __name__ == "__main__":
+    test_publish_once_attach_everywhere()
+    test_knowledge_base_attaches_published_version()
+    test_same_basename_kbs_keep_their_segments()
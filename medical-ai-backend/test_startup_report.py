@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test lite mode imports and the startup report
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from startup_report import StartupTimer, import_times
+
+
+def test_startup_timer():
+    print("🧪 Testing startup phase timing...")
+    timer = StartupTimer()
+    time.sleep(0.02)
+    timer.mark("imports")
+    timer.mark("ai_service")
+    report = timer.report()
+    print(f"📊 Report: {report}")
+    assert list(report["phases_ms"]) == ["imports", "ai_service"]
+    assert report["phases_ms"]["imports"] >= 20
+    assert report["total_ms"] >= report["phases_ms"]["imports"]
+    print("✅ Startup timer test passed!")
+
+
+def test_lite_mode_skips_llmware():
+    print("\n🧪 Testing that lite mode never imports llmware...")
+    code = (
+        "import json, sys, api_server; "
+        "health = api_server.app.test_client().get('/health').json; "
+        "print(json.dumps({'heavy': sorted(m for m in ('llmware', 'llmware_medical_ai', 'vector_store', "
+        "'vector_index', 'knowledge_base') if m in sys.modules), 'mode': health['mode'], "
+        "'lite': health['lite'], 'phases': list(health['startup']['phases_ms'])}))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, LITE_MODE="1"), capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"🪶 {result}")
+    assert result["heavy"] == [] and result["lite"] and result["mode"] == "Demo Mode"
+    assert sorted(result["phases"]) == ["ai_service", "extraction_pool", "imports", "record_index"]
+
+    total_ms, packages = import_times("api_server", {"LITE_MODE": "1"})
+    print(f"⏱️ Lite import: {total_ms:.1f}ms across {len(packages)} packages")
+    assert "llmware" not in packages and "flask" in packages
+    print("✅ Lite mode test passed!")
+
+
+if __name__ == "__main__":
+    test_startup_timer()
+    test_lite_mode_skips_llmware()
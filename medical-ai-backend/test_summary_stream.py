@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test sentence streaming and early stop for generated summaries
+"""
+
+import json
+import os
+import tempfile
+
+from summary_stream import stream_sentences, sse_event
+
+TOKENS = ["Your white", " cell count is 12.5.", " That is above", " normal. It can",
+          " mean infection.", " Drink fluids.", " Rest well."]
+
+
+def test_early_stop():
+    print("🧪 Testing early stop at the sentence limit...")
+    produced = []
+
+    def tokens():
+        for token in TOKENS:
+            produced.append(token)
+            yield token
+
+    sentences = list(stream_sentences(tokens(), max_sentences=3))
+    print(f"📄 Sentences: {sentences}")
+    print(f"🛑 Tokens generated: {len(produced)} of 7")
+    assert sentences == ["Your white cell count is 12.5.", "That is above normal.", "It can mean infection."]
+    assert len(produced) == 6  # stopped one token after the third sentence ended
+    print("✅ Early stop test passed!")
+
+
+def test_unterminated_tail():
+    print("\n🧪 Testing a summary that ends without punctuation...")
+    sentences = list(stream_sentences(iter(["Hemoglobin is 3.5 g/dL. Follow up", " with your doctor"])))
+    print(f"📄 Sentences: {sentences}")
+    assert sentences == ["Hemoglobin is 3.5 g/dL.", "Follow up with your doctor"]
+    print("✅ Unterminated tail test passed!")
+
+
+def test_sse_format():
+    print("\n🧪 Testing server-sent event format...")
+    event = sse_event("sentence", {"index": 0, "text": "Your results are normal."})
+    print(repr(event))
+    assert event.startswith("event: sentence\ndata: ") and event.endswith("\n\n")
+    assert json.loads(event.split("data: ", 1)[1]) == {"index": 0, "text": "Your results are normal."}
+    print("✅ SSE format test passed!")
+
+
+class StreamingModel:
+    """Stand-in slim model that records how far generation got"""
+
+    def __init__(self):
+        self.produced = []
+
+    def stream(self, prompt):
+        for token in TOKENS:
+            self.produced.append(token)
+            yield token
+
+
+def test_endpoint_streams_from_generative_service():
+    print("\n🧪 Testing /api/summarize/stream with a generative service...")
+    os.environ.setdefault("LITE_MODE", "1")
+    import api_server
+    from medical_ai_service import MedicalAIService
+    from model_registry import ModelRegistry
+    from prompt_cache import PromptCache
+
+    model = StreamingModel()
+    original = api_server.generative_ai
+    api_server.generative_ai = MedicalAIService(
+        registry=ModelRegistry(lambda name: model), preload=[],
+        prompt_cache=PromptCache(os.path.join(tempfile.mkdtemp(), "prompts.db")))
+    try:
+        client = api_server.app.test_client()
+        response = client.post("/api/summarize/stream", json={"content": "WBC 12.5"}, buffered=False)
+        assert response.status_code == 200 and response.mimetype == "text/event-stream"
+        chunks = iter(response.response)
+        first = next(chunks)
+        print(f"📡 First event after {len(model.produced)} tokens: {first!r}")
+        # The first sentence is sent once the token after it arrives, long
+        # before generation finishes
+        assert first.startswith(b"event: sentence") and len(model.produced) == 3
+        events = [first] + list(chunks)
+        response.close()
+    finally:
+        api_server.generative_ai = original
+
+    done = json.loads(events[-1].decode().split("data: ", 1)[1])
+    print(f"🛑 Tokens generated: {len(model.produced)} of {len(TOKENS)}")
+    assert len(events) == 4 and events[-1].startswith(b"event: done")
+    assert done["summary"] == "Your white cell count is 12.5. That is above normal. It can mean infection."
+    assert len(model.produced) == 6  # generation stopped at the sentence limit
+    print("✅ Streaming endpoint test passed!")
+
+
+if __name__ == "__main__":
+    test_early_stop()
+    test_unterminated_tail()
+    test_sse_format()
+    test_endpoint_streams_from_generative_service()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test the longitudinal lab trend store
+Records values across several years and queries trends without re-parsing
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from lab_reference import LabReferenceTable
+from trend_store import LEGACY_COLUMNS, TrendStore, extract_vitals
+
+
+def test_record_and_query():
+    print("🧪 Testing trend store record and query...")
+    table = LabReferenceTable.from_file()
+    store = TrendStore(tempfile.mkdtemp())
+
+    reports = [
+        ("2021-03-01", "Fasting glucose: 92 mg/dL. BP 118/76 mmHg"),
+        ("2022-03-01", "Fasting glucose: 104 mg/dL. BP 128/82 mmHg"),
+        ("2023-03-01", "Fasting glucose: 6.4 mmol/L. BP 135/88 mmHg"),
+        ("2024-03-01", "Fasting glucose: 131 mg/dL (Normal range: 70-99 mg/dL). BP 142/90 mmHg")
+    ]
+    for timestamp, text in reports:
+        store.record("patient_1", timestamp, table.classify(text), extract_vitals(text))
+
+    print(f"📋 Series: {store.list_series('patient_1')}")
+    trend = store.query("patient_1", "glucose")
+    print(f"📈 Glucose trend/year: {trend['trend_per_year']:.1f}, streaks: {trend['out_of_range_streaks']}")
+    assert trend["count"] == 4
+    assert trend["out_of_range_streaks"]["current"]["length"] == 3
+    assert trend["deltas"]["since_first"] > 30
+
+    systolic = store.query("patient_1", "bp_systolic", since="2023-01-01")
+    assert systolic["count"] == 2
+    print("✅ Record and query test passed!")
+
+
+def test_query_latency():
+    print("\n🧪 Testing query latency over 20 years of daily values...")
+    store = TrendStore(tempfile.mkdtemp())
+    days = 365 * 20
+    t = 1_000_000_000 + np.arange(days, dtype=np.int64) * 86400
+    values = 90 + np.random.default_rng(0).normal(0, 10, days)
+    status = np.where(values > 100, 1, 0)
+    store.append("patient_2", "glucose", t, values, np.full(days, 70), np.full(days, 100), status)
+
+    start = time.perf_counter()
+    trend = store.query("patient_2", "glucose", since="2015-01-01")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"⏱️ Queried {trend['count']} points in {elapsed_ms:.1f}ms")
+    print("✅ Query latency test passed!")
+
+
+def test_resubmitted_record_replaces_points():
+    print("\n🧪 Testing re-submitted and edited records...")
+    table = LabReferenceTable.from_file()
+    store = TrendStore(tempfile.mkdtemp())
+    original = "Fasting glucose: 131 mg/dL. BP 142/90 mmHg"
+    edited = "Fasting glucose: 113 mg/dL"  # BP line removed
+    for text in (original, original, edited):
+        store.record("p1", "2024-03-01", table.classify(text), extract_vitals(text), record_id="r1")
+    store.record("p1", "2024-03-01", table.classify(original), extract_vitals(original))  # no ID: kept as is
+
+    glucose = store.query("p1", "glucose")
+    print(f"📈 Glucose points: {glucose['points']}")
+    assert [point["value"] for point in glucose["points"]] == [113.0, 131.0]
+    assert store.query("p1", "bp_systolic")["count"] == 1  # only the record without an ID
+    print("✅ Re-submission test passed!")
+
+
+def test_torn_append_and_legacy_columns():
+    print("\n🧪 Testing an interrupted append and old column files...")
+    store = TrendStore(tempfile.mkdtemp())
+    store.append("p1", "glucose", [100], [90.0], [70.0], [99.0], [0])
+    series_dir = store._series_dir("p1", "glucose")
+    with open(os.path.join(series_dir, "points.bin"), "ab") as f:
+        f.write(b"\x01" * 11)  # a row cut off mid-write
+    assert store.load("p1", "glucose")["value"].tolist() == [90.0]
+    store.append("p1", "glucose", [200], [120.0], [70.0], [99.0], [1])
+    series = store.load("p1", "glucose")
+    assert series["t"].tolist() == [100, 200] and series["value"].tolist() == [90.0, 120.0]
+
+    # A series from before points.bin, with one column torn
+    legacy_dir = store._series_dir("p1", "heart_rate")
+    os.makedirs(legacy_dir)
+    for column, data in {"t": [10, 20], "value": [70, 72], "low": [60, 60], "high": [100, 100],
+                         "status": [0]}.items():
+        np.asarray(data, dtype=LEGACY_COLUMNS[column]).tofile(os.path.join(legacy_dir, f"{column}.bin"))
+    assert store.load("p1", "heart_rate")["t"].tolist() == [10]
+    store.append("p1", "heart_rate", [30], [75.0], [60.0], [100.0], [0])
+    assert sorted(os.listdir(legacy_dir)) == ["points.bin"]
+    assert store.load("p1", "heart_rate")["value"].tolist() == [70.0, 75.0]
+    print("✅ Torn append and legacy test passed!")
+
+
+def test_invalid_timestamp_rejected_before_analysis():
+    print("\n🧪 Testing invalid timestamps are rejected up front...")
+    os.environ.setdefault("LITE_MODE", "1")
+    import api_server
+    api_server.trend_store = TrendStore(tempfile.mkdtemp())
+    client = api_server.app.test_client()
+    content = "Fasting glucose: 131 mg/dL. BP 142/90 mmHg"
+
+    response = client.post("/api/analyze", json={"content": content, "patient_id": "p1", "timestamp": "last tuesday"})
+    print(f"📋 Single record: {response.status_code} {response.get_json()['error']}")
+    assert response.status_code == 400 and "Invalid timestamp" in response.get_json()["error"]
+    assert api_server.trend_store.list_series("p1") == []
+
+    # Without a patient ID the timestamp is only echoed back, so anything goes
+    assert client.post("/api/analyze", json={"content": content, "timestamp": "last tuesday"}).status_code == 200
+
+    response = client.post("/api/batch-analyze", json={"records": [
+        {"id": "bad", "content": content, "patient_id": "p1", "timestamp": float("1e300")},
+        {"id": "good", "content": content, "patient_id": "p1", "timestamp": "2024-03-01"}
+    ]})
+    bad, good = response.get_json()["results"]
+    assert response.status_code == 200
+    assert not bad["success"] and "Invalid timestamp" in bad["error"]
+    assert good["success"] and api_server.trend_store.query("p1", "glucose")["count"] == 1
+    print("✅ Invalid timestamp test passed!")
+
+
+def test_batch_duplicates_record_trends_once():
+    print("\n🧪 Testing duplicate batch records add one trend point...")
+    os.environ.setdefault("LITE_MODE", "1")
+    import api_server
+    api_server.trend_store = TrendStore(tempfile.mkdtemp())
+    client = api_server.app.test_client()
+    content = "Fasting glucose: 131 mg/dL. BP 142/90 mmHg"
+
+    response = client.post("/api/batch-analyze", json={"records": [
+        {"id": "a", "content": content, "patient_id": "p1", "timestamp": "2024-03-01"},
+        {"id": "a-copy", "content": content, "patient_id": "p1", "timestamp": "2024-03-01T00:00:00Z"},
+        {"id": "b", "content": content, "patient_id": "p1"},
+        {"id": "b-copy", "content": content, "patient_id": "p1"},
+        {"id": "c", "content": content, "patient_id": "p2", "timestamp": "2024-03-01"}
+    ]})
+    body = response.get_json()
+    assert response.status_code == 200 and body["deduplication"]["analyses_saved"] == 4
+    # One point for 2024-03-01 and one for the untimestamped copies
+    assert api_server.trend_store.query("p1", "glucose")["count"] == 2
+    assert api_server.trend_store.query("p2", "glucose")["count"] == 1
+    print("✅ Duplicate trend test passed!")
+
+
+if __name__ == "__main__":
+    test_record_and_query()
+    test_query_latency()
+    test_resubmitted_record_replaces_points()
+    test_torn_append_and_legacy_columns()
+    test_invalid_timestamp_rejected_before_analysis()
+    test_batch_duplicates_record_trends_once()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test the IVF vector index
+Covers the switch from exact to IVF search, replaced (tombstoned) rows,
+metadata filters and recall against exact search
+"""
+
+import os
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def clustered_vectors(count, dim=32, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    return (centers[rng.integers(clusters, size=count)] + 0.3 * rng.standard_normal((count, dim))).astype(np.float32)
+
+
+def test_exact_until_trained():
+    print("🧪 Testing exact search until the index trains...")
+    vectors = clustered_vectors(600)
+    index = VectorIndex(32, nlist=16, train_size=500)
+    index.add_many([f"r{i}" for i in range(400)], vectors[:400])
+    assert not index.stats()["trained"]
+    assert index.search(vectors[123], k=1)[0]["id"] == "r123"
+
+    index.add_many([f"r{i}" for i in range(400, 600)], vectors[400:])
+    index.wait()  # training runs on the maintenance thread
+    stats = index.stats()
+    print(f"📊 {stats}")
+    assert stats["trained"] and stats["lists"] == 16 and stats["vectors"] == 600
+    # Every row landed in exactly one inverted list
+    assert sum(inverted.size for inverted in index.lists) == 600
+
+    # Rows added after training go to lists too, and are found through them
+    index.add("late", vectors[5] * 2)
+    assert sum(inverted.size for inverted in index.lists) == 601
+    top = index.search(vectors[5], k=2, nprobe=16)
+    assert {result["id"] for result in top} == {"r5", "late"}
+    print("✅ Exact-to-IVF test passed!")
+
+
+def test_replaced_rows_are_tombstoned():
+    print("\n🧪 Testing that replacing a record tombstones its old row...")
+    vectors = clustered_vectors(50, seed=1)
+    index = VectorIndex(32, train_size=1000)
+    index.add_many([f"r{i}" for i in range(50)], vectors)
+
+    index.add("r7", vectors[30])  # r7 now points somewhere else
+    assert len(index) == 50 and index.count == 51
+    old = index.search(vectors[7], k=50)
+    assert [result["id"] for result in old].count("r7") == 1
+    assert np.allclose(index.get_vector("r7"), vectors[30] / np.linalg.norm(vectors[30]))
+    assert index.search(vectors[30], k=2)[1]["id"] in {"r7", "r30"}
+    assert index.search(vectors[0], k=0) == []
+    print("✅ Tombstone test passed!")
+
+
+def test_replaced_rows_compacted():
+    print("\n🧪 Testing that replaced rows are reclaimed...")
+    vectors = clustered_vectors(1200, seed=5)
+    index = VectorIndex(32, nlist=16, train_size=500, background=False)
+    index.add_many([f"r{i}" for i in range(800)], vectors[:800])
+    assert index.stats()["trained"]
+    for start in range(0, 400, 100):  # re-embed half the records
+        index.add_many([f"r{i}" for i in range(start, start + 100)], vectors[800 + start:900 + start])
+
+    stats = index.stats()
+    print(f"📊 {stats}, {index.count} rows")
+    assert index.compactions >= 1 and stats["tombstones"] <= 0.25 * index.count
+    assert stats["vectors"] == 800 and sum(inverted.size for inverted in index.lists) == index.count
+    assert index.search(vectors[850], k=1, nprobe=16)[0]["id"] == "r50"
+    assert np.allclose(index.get_vector("r50"), vectors[850] / np.linalg.norm(vectors[850]))
+    print("✅ Compaction test passed!")
+
+
+def test_training_off_the_insert_path():
+    print("\n🧪 Testing training runs beside inserts and searches...")
+    vectors = clustered_vectors(6000, seed=6)
+    index = VectorIndex(32, train_size=5000)
+    index.add_many([f"r{i}" for i in range(5000)], vectors[:5000])
+    # Training has started in the background; these don't wait for it
+    index.add_many([f"r{i}" for i in range(5000, 6000)], vectors[5000:])
+    assert index.search(vectors[5500], k=1)[0]["id"] == "r5500"
+    index.wait()
+    assert index.stats()["trained"] and sum(inverted.size for inverted in index.lists) == 6000
+    assert index.search(vectors[5500], k=1, nprobe=16)[0]["id"] == "r5500"
+    print("✅ Background training test passed!")
+
+
+def test_metadata_filters():
+    print("\n🧪 Testing metadata filters...")
+    vectors = clustered_vectors(2000, seed=2)
+    index = VectorIndex(32, nlist=16, train_size=1000)
+    index.add_many([f"r{i}" for i in range(2000)], vectors,
+                   [{"patient_id": f"p{i % 50}", "clinic_id": "c1" if i % 2 else "c2"} for i in range(2000)])
+    index.wait()
+
+    results = index.search(vectors[10], k=5, filters={"patient_id": "p10"}, exact=True)
+    assert len(results) == 5 and all(result["metadata"]["patient_id"] == "p10" for result in results)
+    assert results[0]["id"] == "r10"
+    # A rare combination still fills k by widening the over-fetch
+    both = index.search(vectors[11], k=10, filters={"patient_id": "p11", "clinic_id": "c1"}, nprobe=16)
+    assert len(both) == 10 and all(result["metadata"]["clinic_id"] == "c1" for result in both)
+    assert index.search(vectors[0], k=5, filters={"patient_id": "nobody"}) == []
+    print("✅ Metadata filter test passed!")
+
+
+def test_recall_against_exact():
+    print("\n🧪 Testing IVF recall@10 against exact search...")
+    vectors = clustered_vectors(20000, seed=3)
+    index = VectorIndex(32, train_size=5000)
+    index.add_many([f"r{i}" for i in range(20000)], vectors)
+    index.wait()
+    queries = clustered_vectors(100, seed=4)
+
+    exact = [{result["id"] for result in index.search(query, k=10, exact=True)} for query in queries]
+    recall = {}
+    for nprobe in (1, 8, 16):
+        found = [{result["id"] for result in index.search(query, k=10, nprobe=nprobe)} for query in queries]
+        recall[nprobe] = float(np.mean([len(e & f) / 10 for e, f in zip(exact, found)]))
+        print(f"🎯 Recall@10 with nprobe={nprobe} over {len(index.lists)} lists: {recall[nprobe]:.3f}")
+    assert recall[1] <= recall[8] <= recall[16]
+    assert recall[8] >= 0.85 and recall[16] >= 0.9
+    print("✅ Recall test passed!")
+
+
+def test_search_rejects_bad_k():
+    print("\n🧪 Testing /api/search validates k...")
+    os.environ.setdefault("LITE_MODE", "1")
+    import api_server
+    client = api_server.app.test_client()
+    for k in (0, -3, "ten", None):
+        response = client.post("/api/search", json={"query": "chest pain", "k": k})
+        assert response.status_code == 400, (k, response.status_code)
+    print("✅ Search k validation test passed!")
+
+
+if __name__ == "__main__":
+    print("🚀 Vector Index Tests")
+    print("=" * 50)
+    test_exact_until_trained()
+    test_replaced_rows_are_tombstoned()
+    test_replaced_rows_compacted()
+    test_training_off_the_insert_path()
+    test_metadata_filters()
+    test_recall_against_exact()
+    test_search_rejects_bad_k()
+    print("\n🎉 All vector index tests passed!")
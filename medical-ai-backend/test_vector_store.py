@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test the memory-mapped vector store
+Covers reopening, crash recovery, compaction, constant open time,
+incremental log reads and sharing one store between a writer and
+read-only workers
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from record_search import RecordSearch
+from vector_index import VectorIndex
+from vector_store import VectorStore
+
+
+def test_append_reopen_and_recover():
+    print("🧪 Testing append, reopen and crash recovery...")
+    path = tempfile.mkdtemp()
+    store = VectorStore(path, dim=8, writable=True)
+    vectors = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+    store.append(["a", "b", "c"], vectors, [{"patient_id": "p1"}, {}, {}])
+
+    # Simulate a writer that died after writing vector bytes and a torn log line
+    generation_dir = store.generation_dir
+    store.close()
+    with open(os.path.join(generation_dir, "vectors.f32"), "ab") as f:
+        f.write(b"\x00" * 32)
+    with open(os.path.join(generation_dir, "records.log"), "a") as f:
+        f.write('deadbeef {"row":3,"id":"d"')
+
+    reader = VectorStore(path)
+    assert len(reader) == 3
+    assert np.allclose(reader.vectors[1], vectors[1])
+
+    writer = VectorStore(path, writable=True)
+    writer.append(["b"], vectors[2:])
+    writer.delete("c")
+    ids, metadata, _ = writer.records()
+    assert ids == ["a", "b", "c", "b"] and metadata[0] == {"patient_id": "p1"}
+    assert writer.live_rows() == [0, 3]
+
+    stats = writer.compact()
+    print(f"🗜️ Compaction: {stats}")
+    assert len(writer) == 2 and writer.records()[0] == ["a", "b"]
+
+    reader.refresh()
+    assert reader.generation == writer.generation and len(reader) == 2
+    index = VectorIndex.from_store(reader)
+    assert index.search(vectors[2], k=1)[0]["id"] == "b"
+    print("✅ Append, reopen and recovery test passed!")
+
+
+def test_constant_open_time():
+    print("\n🧪 Testing open time at 10 vs 1,000,000 vectors...")
+    timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in (10, 1_000_000):
+            path = os.path.join(directory, str(rows))
+            store = VectorStore(path, dim=384, writable=True, durable=False)
+            store.append([f"r{i}" for i in range(10)], np.zeros((10, 384), dtype=np.float32))
+            generation_dir = store.generation_dir
+            store.close()
+            # Grow the segment sparsely to the full size: opening maps the
+            # committed rows and must not depend on how many there are
+            with open(os.path.join(generation_dir, "vectors.f32"), "r+b") as f:
+                f.truncate(rows * 384 * 4)
+            with open(os.path.join(generation_dir, "count"), "w") as f:
+                f.write(str(rows))
+
+            opens = []
+            for _ in range(5):
+                start = time.perf_counter()
+                opened = VectorStore(path)
+                opens.append((time.perf_counter() - start) * 1000)
+                assert len(opened) == rows and opened.vectors.shape == (rows, 384)
+                opened.close()
+            timings[rows] = min(opens)
+            print(f"⏱️ {rows:>9} vectors: opened in {timings[rows]:.2f}ms")
+
+    # Loading the vectors would be ~1.5 GB of reads; mapping them is not
+    assert timings[1_000_000] < max(5 * timings[10], 2.0), timings
+    print("✅ Open time test passed!")
+
+
+def test_single_writer_across_processes():
+    print("\n🧪 Testing one writer and read-only workers...")
+    with tempfile.TemporaryDirectory() as path:
+        vectors = np.random.default_rng(1).standard_normal((3, 8)).astype(np.float32)
+        writer = RecordSearch(path, sync_interval=0)
+        assert writer.add("a", vectors[0], {"patient_id": "p1"}) and writer.writer
+
+        # A second worker process gets a reader instead of a lock error, and
+        # its add goes to the writer through the inbox
+        worker = subprocess.run([sys.executable, "-c", (
+            "import sys, numpy as np\n"
+            "from record_search import RecordSearch\n"
+            f"search = RecordSearch({path!r}, sync_interval=0)\n"
+            f"added = search.add('b', np.array({vectors[1].tolist()!r}, dtype=np.float32), {{'patient_id': 'p2'}})\n"
+            "print(search.writer, added, len(search))\n"
+        )], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        assert worker.returncode == 0, worker.stderr
+        assert worker.stdout.split() == ["False", "False", "1"], worker.stdout
+
+        reader = RecordSearch(path, sync_interval=0)  # same process, separate lock: also a reader
+        assert not reader.writer and len(reader) == 1
+        writer.sync()
+        assert len(writer) == 2 and writer.stats()["inbox_pending"] == 0
+        reader.sync()
+        assert len(reader) == 2
+        assert reader.search(vectors[1], k=1, filters={"patient_id": "p2"})[0]["id"] == "b"
+
+        # When the writer goes away, a reader takes over on its next sync
+        writer.stop()
+        reader.sync()
+        assert reader.writer
+        assert reader.add("c", vectors[2]) and len(reader) == 3
+        reader.stop()
+    print("✅ Single writer test passed!")
+
+
+def test_reader_reads_only_the_log_tail():
+    print("\n🧪 Testing readers parse only new log lines and search the map in place...")
+    path = tempfile.mkdtemp()
+    vectors = np.random.default_rng(2).standard_normal((4, 8)).astype(np.float32)
+    writer = VectorStore(path, dim=8, writable=True)
+    writer.append(["a", "b"], vectors[:2])
+    reader = VectorStore(path)
+    ids, _, deleted_ids = reader.records()
+    parsed = reader._log_offset
+
+    writer.append(["c", "a"], vectors[2:])
+    writer.delete("b")
+    reader.refresh()
+    assert reader.records()[0] is ids  # extended in place, not re-parsed
+    assert ids == ["a", "b", "c", "a"] and deleted_ids == {"b"} and reader.deletes == ["b"]
+    assert reader._log_offset > parsed and reader.live_rows() == [2, 3]
+
+    index = VectorIndex.from_store(reader)
+    assert index._storage.size == 0 and isinstance(reader.vectors, np.memmap)
+    assert len(index) == 2 and index.search(vectors[3], k=1)[0]["id"] == "a"
+    assert np.allclose(index.get_vector("c"), vectors[2] / np.linalg.norm(vectors[2]))
+    print("✅ Log tail test passed!")
+
+
+def test_deletes_and_compaction_reach_readers():
+    print("\n🧪 Testing deletes and compaction through the writer...")
+    with tempfile.TemporaryDirectory() as path:
+        vectors = np.random.default_rng(3).standard_normal((6, 8)).astype(np.float32)
+        writer = RecordSearch(path, sync_interval=0)
+        for i, record_id in enumerate("abcd"):
+            writer.add(record_id, vectors[i])
+        reader = RecordSearch(path, sync_interval=0)
+        assert len(reader) == 4
+
+        # A reader's delete goes through the inbox
+        assert not reader.delete("a") and len(writer) == 4
+        writer.sync()
+        reader.sync()
+        assert len(writer) == 3 and len(reader) == 3
+        assert reader.get_vector("a") is None
+        assert "a" not in {result["id"] for result in reader.search(vectors[0], k=4)}
+
+        # A quarter of the rows dead (here one of four) and the writer compacts on sync
+        generation = writer.store.generation
+        writer.add("b", vectors[4])  # replaces b's row
+        writer.sync()
+        print(f"🗜️ {writer.stats()}")
+        assert writer.store.generation != generation and len(writer.store) == 3
+        reader.sync()
+        assert reader.generation == writer.store.generation and len(reader) == 3
+        assert reader.search(vectors[4], k=1)[0]["id"] == "b"
+        writer.stop()
+        reader.stop()
+    print("✅ Delete and compaction test passed!")
+
+
+if __name__ == "__main__":
+    test_append_reopen_and_recover()
+    test_constant_open_time()
+    test_single_writer_across_processes()
+    test_reader_reads_only_the_log_tail()
+    test_deletes_and_compaction_reach_readers()
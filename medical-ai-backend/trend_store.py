@@ -0,0 +1,339 @@
+"""
+Longitudinal Trend Store
+Persists extracted lab values and vitals per patient as columnar NumPy
+time series, so trends can be queried without re-parsing source records
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "TREND_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "trends")
+)
+
+# One fixed-size row per observation in a single points.bin per series,
+# so a row is either wholly written or cut off as a torn tail
+ROW_DTYPE = np.dtype([
+    ("t", np.int64),       # observation time, epoch seconds
+    ("value", np.float32),
+    ("low", np.float32),   # reference range in effect for this observation
+    ("high", np.float32),
+    ("status", np.int8),   # -1 low, 0 normal, 1 high, 2 unknown, 3 removed
+    ("record", np.uint64)  # record_key() of the source record, 0 if it had no ID
+])
+COLUMNS = ("t", "value", "low", "high", "status")
+# Series written before points.bin: one file per column
+LEGACY_COLUMNS = {"t": np.int64, "value": np.float32, "low": np.float32, "high": np.float32, "status": np.int8}
+
+STATUS_CODES = {"low": -1, "normal": 0, "high": 1}
+STATUS_NAMES = {-1: "low", 0: "normal", 1: "high", 2: "unknown"}
+REMOVED = 3  # a re-submitted record no longer reports this series
+
+# Adult resting vital sign ranges
+VITAL_RANGES = {
+    "bp_systolic": (90, 120),
+    "bp_diastolic": (60, 80),
+    "heart_rate": (60, 100),
+    "temperature": (97.0, 99.5)
+}
+
+BP_PATTERN = re.compile(r'\b(\d{2,3})\s*/\s*(\d{2,3})\s*(?:mm\s*hg)?', re.IGNORECASE)
+HEART_RATE_PATTERN = re.compile(r'\b(?:heart rate|hr|pulse)[:\s]*(\d{2,3})', re.IGNORECASE)
+TEMPERATURE_PATTERN = re.compile(r'(\d{2,3}\.?\d?)\s*°?\s*F\b')
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+MAX_EPOCH_SECONDS = 253402300799  # 9999-12-31T23:59:59Z
+
+
+def record_key(record_id):
+    """Non-zero 64-bit key for a record ID; 0 (no identity) when there is none"""
+    if record_id is None or record_id == "" or record_id == "unknown":
+        return 0
+    digest = hashlib.sha256(str(record_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") or 1
+
+
+def series_name(name):
+    """Storage-safe series name, e.g. 'White Blood Cells' -> 'white_blood_cells'"""
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def parse_timestamp(value, now=None):
+    """Epoch seconds from an ISO date/datetime string or a number; now (default the current time) if missing"""
+    if value is None or value == "" or value == "unknown":
+        return int(time.time()) if now is None else now
+    if isinstance(value, (int, float)):
+        # Accept epoch milliseconds from the app as well as seconds
+        seconds = value / 1000 if value > 1e11 else value
+        if not -MAX_EPOCH_SECONDS <= seconds <= MAX_EPOCH_SECONDS:  # also rejects NaN
+            raise ValueError(f"Timestamp out of range: {value}")
+        return int(seconds)
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def extract_vitals(medical_text):
+    """Vitals as (series, value) pairs, found with the same patterns as the extractors"""
+    vitals = []
+
+    bp_match = BP_PATTERN.search(medical_text)
+    if bp_match:
+        systolic, diastolic = int(bp_match.group(1)), int(bp_match.group(2))
+        if 60 <= systolic <= 260 and 30 <= diastolic <= 160 and systolic > diastolic:
+            vitals.append(("bp_systolic", systolic))
+            vitals.append(("bp_diastolic", diastolic))
+
+    hr_match = HEART_RATE_PATTERN.search(medical_text)
+    if hr_match:
+        vitals.append(("heart_rate", int(hr_match.group(1))))
+
+    temp_match = TEMPERATURE_PATTERN.search(medical_text)
+    if temp_match:
+        vitals.append(("temperature", float(temp_match.group(1))))
+
+    return vitals
+
+
+def _runs(mask):
+    """Start and end (exclusive) indices of each run of True values"""
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return edges[0::2], edges[1::2]
+
+
+def _iso(epoch_seconds):
+    return str(np.datetime64(int(epoch_seconds), "s")) + "Z"
+
+
+class TrendStore:
+    def __init__(self, root=DEFAULT_STORE_PATH):
+        """Open (or create) a trend store rooted at a local directory"""
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _patient_dir(self, patient_id):
+        # Hash the ID so arbitrary patient identifiers are safe path names
+        digest = hashlib.sha256(str(patient_id).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.root, digest)
+
+    def _series_dir(self, patient_id, name):
+        return os.path.join(self._patient_dir(patient_id), series_name(name))
+
+    def append(self, patient_id, name, timestamps, values, lows, highs, statuses, records=None):
+        """
+        Append observations to one series
+
+        records are record_key()s; a later row with the same non-zero key
+        and timestamp replaces an earlier one when the series is read.
+        """
+        series_dir = self._series_dir(patient_id, name)
+        rows = np.zeros(len(timestamps), dtype=ROW_DTYPE)
+        rows["t"], rows["value"], rows["low"], rows["high"], rows["status"] = (
+            timestamps, values, lows, highs, statuses)
+        if records is not None:
+            rows["record"] = records
+        with self._lock:
+            os.makedirs(series_dir, exist_ok=True)
+            self._convert_legacy(series_dir)
+            with open(os.path.join(series_dir, "points.bin"), "ab") as f:
+                # Cut a row torn by an interrupted write, so this one starts
+                # on a row boundary
+                size = f.seek(0, os.SEEK_END)
+                if size % ROW_DTYPE.itemsize:
+                    f.truncate(size - size % ROW_DTYPE.itemsize)
+                f.write(rows.tobytes())
+
+    @staticmethod
+    def _legacy_rows(series_dir):
+        """Rows of a series still in column files, or None; only rows present
+        in every column count"""
+        paths = {column: os.path.join(series_dir, f"{column}.bin") for column in LEGACY_COLUMNS}
+        if not any(os.path.exists(path) for path in paths.values()):
+            return None
+        columns = {column: np.fromfile(path, dtype=LEGACY_COLUMNS[column]) if os.path.exists(path)
+                   else np.empty(0, dtype=LEGACY_COLUMNS[column]) for column, path in paths.items()}
+        rows = np.zeros(min(len(data) for data in columns.values()), dtype=ROW_DTYPE)
+        for column, data in columns.items():
+            rows[column] = data[:len(rows)]
+        return rows
+
+    def _convert_legacy(self, series_dir):
+        """Move a column-file series into points.bin; caller holds _lock"""
+        rows = self._legacy_rows(series_dir)
+        if rows is None:
+            return
+        points_path = os.path.join(series_dir, "points.bin")
+        tmp_path = points_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(rows.tobytes())
+            if os.path.exists(points_path):
+                with open(points_path, "rb") as existing:
+                    f.write(existing.read())
+        os.replace(tmp_path, points_path)
+        for column in LEGACY_COLUMNS:
+            path = os.path.join(series_dir, f"{column}.bin")
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _read_rows(self, series_dir):
+        path = os.path.join(series_dir, "points.bin")
+        rows = np.empty(0, dtype=ROW_DTYPE)
+        if os.path.exists(path):
+            count = os.path.getsize(path) // ROW_DTYPE.itemsize  # a torn tail row is ignored
+            rows = np.fromfile(path, dtype=ROW_DTYPE, count=count)
+        legacy = self._legacy_rows(series_dir)  # not converted yet: the earlier rows
+        return rows if legacy is None else np.concatenate([legacy, rows])
+
+    def record(self, patient_id, timestamp, lab_results, vitals, record_id=None):
+        """
+        Save one record's extracted values
+
+        lab_results are LabReferenceTable.classify() results, stored in the
+        analyte's canonical unit; vitals are extract_vitals() pairs. With a
+        record_id, saving the same record and timestamp again (a re-submit
+        or an edit) replaces its earlier points instead of adding more, and
+        series it no longer reports lose their point.
+        """
+        t = parse_timestamp(timestamp)
+        key = record_key(record_id)
+        records = [key]
+        written = set()
+        stored = 0
+
+        for result in lab_results:
+            value = result["canonical_value"]
+            if value is None:
+                continue
+            low, high = result["reference_range"] or (np.nan, np.nan)
+            if result["range_source"] == "inline" and result["value"]:
+                # Inline ranges are in the report's units; store them canonically
+                scale = value / result["value"]
+                low, high = low * scale, high * scale
+            self.append(patient_id, result["analyte"], [t], [value], [low], [high],
+                        [STATUS_CODES[result["status"]]], records)
+            written.add(series_name(result["analyte"]))
+            stored += 1
+
+        for name, value in vitals:
+            low, high = VITAL_RANGES[name]
+            status = -1 if value < low else (1 if value > high else 0)
+            self.append(patient_id, name, [t], [value], [low], [high], [status], records)
+            written.add(series_name(name))
+            stored += 1
+
+        if key:
+            for name in set(self.list_series(patient_id)) - written:
+                rows = self._read_rows(self._series_dir(patient_id, name))
+                if np.any((rows["record"] == key) & (rows["t"] == t)):
+                    self.append(patient_id, name, [t], [np.nan], [np.nan], [np.nan], [REMOVED], records)
+        return stored
+
+    def load(self, patient_id, name):
+        """Read a series' columns, sorted by time"""
+        series_dir = self._series_dir(patient_id, name)
+        if not os.path.isdir(series_dir):
+            return None
+
+        rows = self._read_rows(series_dir)
+        # The last row for each (record, timestamp) wins; rows without a
+        # record ID are all kept
+        keyed = np.flatnonzero(rows["record"] != 0)
+        if len(keyed):
+            pairs = np.stack([rows["record"][keyed], rows["t"][keyed].view(np.uint64)], axis=1)
+            _, last = np.unique(pairs[::-1], axis=0, return_index=True)
+            keep = np.ones(len(rows), dtype=bool)
+            keep[keyed] = False
+            keep[keyed[len(keyed) - 1 - last]] = True
+            rows = rows[keep]
+        rows = rows[rows["status"] != REMOVED]
+        order = np.argsort(rows["t"], kind="stable")
+        return {column: rows[column][order] for column in COLUMNS}
+
+    def list_series(self, patient_id):
+        patient_dir = self._patient_dir(patient_id)
+        if not os.path.isdir(patient_dir):
+            return []
+        return sorted(os.listdir(patient_dir))
+
+    def query(self, patient_id, name, since=None, until=None):
+        """Trend, deltas and out-of-range streaks for one analyte"""
+        series = self.load(patient_id, name)
+        if series is None:
+            return None
+
+        t = series["t"]
+        keep = np.ones(len(t), dtype=bool)
+        if since is not None:
+            keep &= t >= parse_timestamp(since)
+        if until is not None:
+            keep &= t <= parse_timestamp(until)
+        series = {column: data[keep] for column, data in series.items()}
+
+        # Values are stored as float32; round away the representation noise
+        t, values, status = series["t"], np.round(series["value"].astype(np.float64), 4), series["status"]
+        count = len(t)
+        stamps = t.astype("datetime64[s]").astype(str)
+        result = {
+            "series": series_name(name),
+            "count": count,
+            "points": [
+                {"timestamp": stamp + "Z", "value": value, "status": STATUS_NAMES[code]}
+                for stamp, value, code in zip(stamps, values.tolist(), status.tolist())
+            ]
+        }
+        if count == 0:
+            return result
+
+        result["latest"] = {
+            "timestamp": _iso(t[-1]),
+            "value": float(values[-1]),
+            "reference_range": [float(series["low"][-1]), float(series["high"][-1])]
+        }
+        result["stats"] = {
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean())
+        }
+        result["deltas"] = {
+            "since_previous": float(values[-1] - values[-2]) if count > 1 else None,
+            "since_first": float(values[-1] - values[0])
+        }
+
+        # Least-squares slope, in units per year
+        span = t[-1] - t[0]
+        if count > 1 and span > 0:
+            years = (t - t[0]) / SECONDS_PER_YEAR
+            result["trend_per_year"] = float(np.polyfit(years, values, 1)[0])
+        else:
+            result["trend_per_year"] = None
+
+        out_of_range = (status == -1) | (status == 1)
+        starts, ends = _runs(out_of_range)
+        longest = current = None
+        if len(starts):
+            lengths = ends - starts
+            i = int(np.argmax(lengths))
+            longest = {
+                "length": int(lengths[i]),
+                "from": _iso(t[starts[i]]),
+                "to": _iso(t[ends[i] - 1])
+            }
+            if ends[-1] == count:
+                current = {"length": int(lengths[-1]), "since": _iso(t[starts[-1]])}
+        result["out_of_range_streaks"] = {
+            "total_out_of_range": int(out_of_range.sum()),
+            "longest": longest,
+            "current": current
+        }
+        return result
@@ -0,0 +1,364 @@
+"""
+Vector Index for Record Embeddings
+In-process IVF (inverted file) approximate nearest-neighbor index built on
+NumPy, with incremental inserts and cosine-similarity search
+"""
+
+import os
+import threading
+
+import numpy as np
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def train_centroids(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means: centroids for cosine similarity on normalized vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Re-seed empty clusters from random points so every list gets used
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalize(sums)
+
+    return centroids
+
+
+class _InvertedList:
+    """Growable array of the rows assigned to one centroid; the vectors
+    themselves stay in the index's row storage"""
+
+    def __init__(self):
+        self.rows = np.empty(0, dtype=np.int64)
+        self.size = 0
+
+    def extend(self, rows):
+        needed = self.size + len(rows)
+        if needed > len(self.rows):
+            grown = np.empty(max(16, 2 * len(self.rows), needed), dtype=np.int64)
+            grown[:self.size] = self.rows[:self.size]
+            self.rows = grown
+        self.rows[self.size:needed] = rows
+        self.size = needed
+
+
+def _assign(lists, centroids, vectors, first_row):
+    """Append rows first_row onwards (holding vectors) to their nearest lists"""
+    if not len(vectors):
+        return
+    # Score in chunks to bound the temporary matrix, then move each list's
+    # members over in one slice
+    assignments = np.concatenate([
+        np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), 65536)
+    ])
+    order = np.argsort(assignments, kind="stable")
+    bounds = np.searchsorted(assignments[order], np.arange(len(lists) + 1))
+    for list_index in range(len(lists)):
+        members = order[bounds[list_index]:bounds[list_index + 1]]
+        if len(members):
+            lists[list_index].extend(first_row + members)
+
+
+class VectorIndex:
+    def __init__(self, dim, nlist=None, nprobe=8, train_size=None, compact_ratio=None, background=True,
+                 store=None):
+        """
+        Initialize an empty index
+
+        Until train_size vectors have been inserted the index searches
+        exhaustively; it then trains nlist centroids and switches to IVF.
+        nlist defaults to roughly 4*sqrt(train_size) and the index retrains
+        whenever it has grown 8x since the last training. Rows tombstoned
+        by replacements are dropped once they exceed compact_ratio of the
+        rows. With background, training and compaction run on a
+        maintenance thread instead of inside add_many().
+
+        With store (a VectorStore, see from_store) the index's rows are the
+        store's rows: vectors are searched in place through its memory map
+        instead of being copied, and compaction is left to the store.
+        """
+        self.dim = dim
+        self.nprobe = nprobe
+        self.train_size = train_size or int(os.environ.get("VECTOR_INDEX_TRAIN_SIZE", 10000))
+        self.nlist = nlist or max(16, int(4 * np.sqrt(self.train_size)))
+        self.compact_ratio = compact_ratio or float(os.environ.get("VECTOR_INDEX_COMPACT_RATIO", 0.25))
+        self.background = background
+        self.store = store
+
+        # Row-aligned storage for every inserted vector, normalized; a
+        # store's rows are read in place and scaled by their inverse norms
+        self._storage = np.empty((0, dim), dtype=np.float32)
+        self._inverse_norms = np.empty(0, dtype=np.float32)
+        self.count = 0
+        self.ids = []
+        self.metadata = []
+        self.id_to_row = {}
+        self.deleted = set()
+
+        self.centroids = None
+        self.lists = []
+        self.trained_count = 0
+        self.compactions = 0  # bumped whenever rows are renumbered
+        self._lock = threading.RLock()
+        self._maintenance = None
+
+    def __len__(self):
+        return self.count - len(self.deleted)
+
+    @property
+    def _vectors(self):
+        return self._storage if self.store is None else self.store.vectors
+
+    def _reserve(self, extra):
+        needed = self.count + extra
+        if self.store is None and needed > len(self._storage):
+            vectors = np.empty((max(1024, 2 * len(self._storage), needed), self.dim), dtype=np.float32)
+            vectors[:self.count] = self._storage[:self.count]
+            self._storage = vectors
+        if self.store is not None and needed > len(self._inverse_norms):
+            inverse_norms = np.empty(max(1024, 2 * len(self._inverse_norms), needed), dtype=np.float32)
+            inverse_norms[:self.count] = self._inverse_norms[:self.count]
+            self._inverse_norms = inverse_norms
+
+    def _should_train(self):
+        # Train once train_size is reached, then again each time the index
+        # has grown 8x, so the lists stay balanced as data accumulates
+        threshold = self.train_size if self.centroids is None else 8 * self.trained_count
+        return self.count >= threshold
+
+    def _should_compact(self):
+        return self.store is None and len(self.deleted) > self.compact_ratio * self.count
+
+    def add(self, record_id, vector, metadata=None):
+        """Insert or replace one vector; replacing tombstones the old row"""
+        self.add_many([record_id], np.asarray(vector, dtype=np.float32).reshape(1, self.dim), [metadata])
+
+    def add_many(self, record_ids, vectors, metadata=None):
+        """
+        Insert a block of vectors, assigning them to lists in one pass
+
+        With a store, these must be the store's next rows; a None ID marks
+        a row with no log record, which is never returned.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if self.store is None:
+            vectors = _normalize(vectors)
+        metadata = metadata or [None] * len(record_ids)
+        with self._lock:
+            self._reserve(len(record_ids))
+            start = self.count
+            if self.store is None:
+                self._storage[start:start + len(record_ids)] = vectors
+            else:
+                norms = np.linalg.norm(vectors, axis=1)
+                self._inverse_norms[start:start + len(record_ids)] = 1 / np.where(norms == 0, 1, norms)
+
+            for offset, (record_id, meta) in enumerate(zip(record_ids, metadata)):
+                if record_id is None:
+                    self.deleted.add(start + offset)
+                    self.ids.append(None)
+                    self.metadata.append({})
+                    continue
+                previous = self.id_to_row.get(record_id)
+                if previous is not None:
+                    self.deleted.add(previous)
+                self.id_to_row[record_id] = start + offset
+                self.ids.append(record_id)
+                self.metadata.append(meta or {})
+            self.count += len(record_ids)
+
+            if self.centroids is not None:
+                _assign(self.lists, self.centroids, vectors, start)
+            needs_maintenance = self._should_train() or self._should_compact()
+        if needs_maintenance:
+            self._schedule_maintenance()
+
+    def remove(self, record_id):
+        """Tombstone a record's row; False if it isn't indexed"""
+        with self._lock:
+            row = self.id_to_row.pop(record_id, None)
+            if row is None:
+                return False
+            self.deleted.add(row)
+            needs_maintenance = self._should_compact()
+        if needs_maintenance:
+            self._schedule_maintenance()
+        return True
+
+    def _schedule_maintenance(self):
+        if not self.background:
+            self.maintain()
+            return
+        with self._lock:
+            if self._maintenance is None or not self._maintenance.is_alive():
+                self._maintenance = threading.Thread(target=self.maintain, name="vector-index-maintenance",
+                                                     daemon=True)
+                self._maintenance.start()
+
+    def maintain(self):
+        """Compact and (re)train if due; runs on the maintenance thread with background"""
+        if self._should_compact():
+            self.compact()
+        if self._should_train():
+            self.train()
+
+    def wait(self):
+        """Block until background maintenance started so far has finished"""
+        maintenance = self._maintenance
+        if maintenance is not None:
+            maintenance.join()
+
+    def train(self):
+        """
+        (Re)train centroids on a sample and rebuild the inverted lists
+
+        The k-means and the assignment of existing rows run without the
+        lock, so searches and inserts carry on against the old lists; rows
+        inserted meanwhile are assigned before the new lists are swapped in.
+        """
+        with self._lock:
+            vectors, count, compactions = self._vectors, self.count, self.compactions
+        sample_size = min(count, max(self.nlist * 64, self.train_size))
+        sample = _normalize(vectors[np.sort(np.random.default_rng(0).choice(count, sample_size, replace=False))])
+        nlist = min(self.nlist, sample_size)
+        centroids = train_centroids(sample, nlist)
+        lists = [_InvertedList() for _ in range(nlist)]
+        _assign(lists, centroids, vectors[:count], 0)
+
+        with self._lock:
+            if self.compactions != compactions:
+                return  # rows were renumbered meanwhile; the next maintenance retrains
+            _assign(lists, centroids, self._vectors[count:self.count], count)
+            self.centroids, self.lists = centroids, lists
+            self.trained_count = self.count
+        print(f"🧭 Vector index trained: {nlist} lists over {count} vectors")
+
+    def compact(self):
+        """Drop tombstoned rows, renumbering the rest and their list entries
+        (without a store; a store's rows are compacted by VectorStore)"""
+        with self._lock:
+            live = np.fromiter(sorted(self.id_to_row.values()), dtype=np.int64, count=len(self.id_to_row))
+            new_rows = np.full(self.count, -1, dtype=np.int64)
+            new_rows[live] = np.arange(len(live))
+
+            vectors = np.empty((max(1024, len(live)), self.dim), dtype=np.float32)
+            vectors[:len(live)] = self._storage[live]
+            self._storage = vectors
+            self.ids = [self.ids[row] for row in live]
+            self.metadata = [self.metadata[row] for row in live]
+            self.id_to_row = {record_id: row for row, record_id in enumerate(self.ids)}
+            for inverted in self.lists:
+                rows = new_rows[inverted.rows[:inverted.size]]
+                inverted.rows = rows[rows >= 0]
+                inverted.size = len(inverted.rows)
+            dropped = self.count - len(live)
+            self.count = len(live)
+            self.deleted = set()
+            self.compactions += 1
+        print(f"🗜️ Vector index compacted: dropped {dropped} replaced rows")
+
+    def get_vector(self, record_id):
+        """The record's normalized vector (a copy), or None"""
+        with self._lock:
+            row = self.id_to_row.get(record_id)
+            if row is None:
+                return None
+            vector = np.array(self._vectors[row], dtype=np.float32)
+            return vector if self.store is None else vector * self._inverse_norms[row]
+
+    def _scores(self, rows, query):
+        """Cosine similarity of rows (an index array or slice) to a normalized query"""
+        scores = np.asarray(self._vectors[rows] @ query)
+        return scores if self.store is None else scores * self._inverse_norms[rows]
+
+    def _matches(self, row, filters):
+        if row in self.deleted:
+            return False
+        metadata = self.metadata[row]
+        return all(metadata.get(key) == value for key, value in filters.items())
+
+    def search(self, query, k=10, filters=None, nprobe=None, exact=False):
+        """
+        Top-k records by cosine similarity
+
+        filters is a dict of metadata equality constraints, e.g.
+        {"patient_id": "patient_123"}; results are over-fetched and then
+        filtered.
+        """
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(self.dim))
+        filters = filters or {}
+        with self._lock:
+            if self.count == 0 or k < 1:
+                return []
+            if self.centroids is None or exact:
+                scores = self._scores(slice(0, self.count), query)
+                rows = np.arange(self.count)
+            else:
+                probe = nprobe or self.nprobe
+                nearest = np.argpartition(-(self.centroids @ query), min(probe, len(self.lists)) - 1)[:probe]
+                score_parts, row_parts = [], []
+                for list_index in nearest:
+                    inverted = self.lists[list_index]
+                    if inverted.size:
+                        rows = inverted.rows[:inverted.size]
+                        score_parts.append(self._scores(rows, query))
+                        row_parts.append(rows)
+                if not score_parts:
+                    return []
+                scores = np.concatenate(score_parts)
+                rows = np.concatenate(row_parts)
+
+            # Over-fetch to leave room for tombstoned and filtered-out rows,
+            # widening until k survive or the candidates run out
+            fetch = k * 10 if filters else k * 2
+            while True:
+                fetch = min(fetch, len(scores))
+                top = np.argpartition(-scores, fetch - 1)[:fetch] if fetch < len(scores) else np.arange(len(scores))
+                top = top[np.argsort(-scores[top])]
+                results = [
+                    {"id": self.ids[rows[i]], "score": float(scores[i]), "metadata": self.metadata[rows[i]]}
+                    for i in top if self._matches(int(rows[i]), filters)
+                ][:k]
+                if len(results) >= k or fetch == len(scores):
+                    return results
+                fetch *= 4
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """
+        Build an index over a VectorStore that searches its memory map in
+        place
+
+        Every committed row is indexed so index rows stay store rows;
+        replaced, deleted and unlogged rows are tombstoned. Later rows are
+        added with add_many() once the store has committed them.
+        """
+        ids, metadata, deleted_ids = store.records()
+        index = cls(store.dim, store=store, **kwargs)
+        for start in range(0, store.count, 65536):
+            stop = min(start + 65536, store.count)
+            index.add_many(ids[start:stop], store.vectors[start:stop], metadata[start:stop])
+        for record_id in deleted_ids:
+            index.remove(record_id)
+        return index
+
+    def stats(self):
+        return {
+            "vectors": len(self),
+            "dim": self.dim,
+            "trained": self.centroids is not None,
+            "lists": len(self.lists),
+            "nprobe": self.nprobe,
+            "tombstones": len(self.deleted)
+        }
@@ -0,0 +1,398 @@
+"""
+Memory-Mapped Vector Store
+Append-only on-disk store for record embeddings: a fixed-width float32
+segment file read through np.memmap, plus an append-only ID/metadata log
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer is assumed, not enforced
+    fcntl = None
+
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "VECTOR_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vector_store")
+)
+
+# Layout of a store directory:
+#   CURRENT             name of the live generation, replaced atomically
+#   gen-000001/
+#     header.json       dimension and dtype, written once
+#     vectors.f32       row i is the embedding for log row i
+#     records.log       one "<crc32> <json>" line per appended row or delete
+#     count             number of committed rows, replaced atomically
+
+
+class WriterLocked(RuntimeError):
+    """Another process holds the store's single writer lock"""
+
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _log_line(record):
+    payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def _parse_log_line(line):
+    """Decoded record, or None for a torn or corrupted line"""
+    checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+    if not line.endswith(b"\n") or f"{zlib.crc32(payload):08x}".encode() != checksum:
+        return None
+    return json.loads(payload)
+
+
+class VectorStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, dim=None, writable=False, durable=True):
+        """
+        Open a store, creating it when writable and dim is given
+
+        Opening only reads CURRENT, the header and the committed row count,
+        so it takes the same time for ten vectors or ten million. IDs and
+        metadata are read from the log on first use, and after that only
+        the lines added since. Readers in other processes share the page
+        cache through the memory map.
+        """
+        self.path = path
+        self.writable = writable
+        self.durable = durable
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._records = None
+        self._log_offset = 0
+        self.deletes = []
+
+        current_path = os.path.join(path, "CURRENT")
+        if writable:
+            # Lock before creating, so two processes can't both initialize
+            # the store; raises WriterLocked when another process writes
+            os.makedirs(path, exist_ok=True)
+            if not self._lock_writer():
+                raise WriterLocked(f"Vector store {path} already has a writer")
+        if not os.path.exists(current_path):
+            if not (writable and dim):
+                self.close()
+                raise FileNotFoundError(f"No vector store at {path}")
+            self._create_generation("gen-000001", dim)
+            _write_atomic(current_path, "gen-000001")
+        self._open_generation()
+
+    def _create_generation(self, name, dim):
+        generation_dir = os.path.join(self.path, name)
+        os.makedirs(generation_dir, exist_ok=True)
+        _write_atomic(os.path.join(generation_dir, "header.json"), json.dumps({"dim": dim, "dtype": "float32"}))
+        _write_atomic(os.path.join(generation_dir, "count"), "0")
+        open(os.path.join(generation_dir, "vectors.f32"), "ab").close()
+        open(os.path.join(generation_dir, "records.log"), "ab").close()
+        return generation_dir
+
+    def _lock_writer(self):
+        """Take the exclusive writer lock without blocking; False if it's held"""
+        if fcntl is None:
+            return True
+        lock_file = open(os.path.join(self.path, "LOCK"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def try_become_writer(self):
+        """
+        Upgrade a read-only store to the writer if no other process holds
+        the lock (e.g. the previous writer exited); returns self.writable
+        """
+        with self._lock:
+            if not self.writable and self._lock_writer():
+                self.writable = True
+                self._open_generation()  # latest generation, with crash recovery
+            return self.writable
+
+    def _open_generation(self):
+        with open(os.path.join(self.path, "CURRENT")) as f:
+            self.generation = f.read().strip()
+        self.generation_dir = os.path.join(self.path, self.generation)
+        with open(os.path.join(self.generation_dir, "header.json")) as f:
+            self.dim = json.load(f)["dim"]
+        self.row_bytes = self.dim * 4
+        self._records = None
+        self._log_offset = 0
+        self.deletes = []  # IDs in the order their deletes were logged
+        self._map_committed()
+
+        if self.writable:
+            self._recover_tail()
+
+    def _recover_tail(self):
+        """
+        Drop vector bytes written after the last commit by a crashed
+        writer, and terminate a torn log line so it can't swallow the next
+        record
+        """
+        vectors_path = os.path.join(self.generation_dir, "vectors.f32")
+        if os.path.getsize(vectors_path) > self.count * self.row_bytes:
+            with open(vectors_path, "r+b") as f:
+                f.truncate(self.count * self.row_bytes)
+        with open(os.path.join(self.generation_dir, "records.log"), "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+    def _map_committed(self):
+        with open(os.path.join(self.generation_dir, "count")) as f:
+            self.count = int(f.read().strip() or 0)
+        if self.count:
+            self.vectors = np.memmap(os.path.join(self.generation_dir, "vectors.f32"),
+                                     dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        else:
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+
+    def refresh(self):
+        """Pick up rows committed (or a compaction finished) by the writer"""
+        with self._lock:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                generation = f.read().strip()
+            if generation != self.generation:
+                self._open_generation()
+            else:
+                self._map_committed()
+                if self._records is not None:
+                    self._read_log()
+
+    def __len__(self):
+        return self.count
+
+    def _read_log(self):
+        """
+        Apply the log lines written since the last read to the row-aligned
+        IDs and metadata
+
+        Reading stops before a line still being written, or one for a row
+        that isn't committed yet, and resumes there next time.
+        """
+        ids, metadata, deleted_ids = self._records
+        with open(os.path.join(self.generation_dir, "records.log"), "rb") as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                record = _parse_log_line(line)
+                if record is not None and "delete" in record:
+                    deleted_ids.add(record["delete"])
+                    self.deletes.append(record["delete"])
+                elif record is not None:
+                    row = record["row"]
+                    if row >= self.count:
+                        break
+                    if row >= len(ids):
+                        ids.extend([None] * (row + 1 - len(ids)))
+                        metadata.extend([{}] * (row + 1 - len(metadata)))
+                    ids[row] = record["id"]
+                    metadata[row] = record.get("metadata") or {}
+                    deleted_ids.discard(record["id"])
+                # else: torn line from a crashed writer
+                self._log_offset += len(line)
+        # Rows whose log line was lost stay None
+        ids.extend([None] * (self.count - len(ids)))
+        metadata.extend([{}] * (self.count - len(metadata)))
+
+    def records(self):
+        """(ids, metadata, deleted_ids), row-aligned with self.vectors"""
+        with self._lock:
+            if self._records is None:
+                self._records = ([], [], set())
+                self._read_log()
+            return self._records
+
+    def live_rows(self):
+        """Latest row for each ID that hasn't been deleted"""
+        ids, _, deleted_ids = self.records()
+        latest = {}
+        for row, record_id in enumerate(ids):
+            if record_id is not None:
+                latest[record_id] = row
+        return sorted(row for record_id, row in latest.items() if record_id not in deleted_ids)
+
+    def append(self, record_ids, vectors, metadata=None):
+        """
+        Append rows crash-safely: vectors, then log lines, then the count
+
+        A crash before the count is replaced leaves the previous count in
+        place, and the extra bytes are ignored by readers and truncated by
+        the next writer.
+        """
+        if not self.writable:
+            raise RuntimeError("Vector store opened read-only")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        metadata = metadata or [None] * len(record_ids)
+
+        with self._lock:
+            first_row = self.count
+            with open(os.path.join(self.generation_dir, "vectors.f32"), "r+b") as f:
+                f.seek(first_row * self.row_bytes)
+                f.write(vectors.tobytes())
+                f.flush()
+                if self.durable:
+                    os.fsync(f.fileno())
+
+            with open(os.path.join(self.generation_dir, "records.log"), "ab") as f:
+                for offset, (record_id, meta) in enumerate(zip(record_ids, metadata)):
+                    f.write(_log_line({"row": first_row + offset, "id": record_id, "metadata": meta or {}}))
+                f.flush()
+                if self.durable:
+                    os.fsync(f.fileno())
+                log_end = f.tell()
+
+            _write_atomic(os.path.join(self.generation_dir, "count"), str(first_row + len(record_ids)))
+            records = self._records
+            self._map_committed()
+
+            if records is not None:
+                ids, stored_metadata, deleted_ids = records
+                for record_id, meta in zip(record_ids, metadata):
+                    ids.append(record_id)
+                    stored_metadata.append(meta or {})
+                    deleted_ids.discard(record_id)
+                self._records = records
+                self._log_offset = log_end  # the single writer has applied its own lines
+            return first_row
+
+    def delete(self, record_id):
+        """Tombstone an ID; its rows are dropped at the next compaction"""
+        if not self.writable:
+            raise RuntimeError("Vector store opened read-only")
+        with self._lock:
+            with open(os.path.join(self.generation_dir, "records.log"), "ab") as f:
+                f.write(_log_line({"delete": record_id}))
+                f.flush()
+                if self.durable:
+                    os.fsync(f.fileno())
+                log_end = f.tell()
+            if self._records is not None:
+                self._records[2].add(record_id)
+                self.deletes.append(record_id)
+                self._log_offset = log_end
+
+    def compact(self):
+        """
+        Rewrite the live rows into a new generation and switch CURRENT to it
+
+        Readers keep using their mapped generation until they refresh();
+        the old generation directory is removed afterwards.
+        """
+        if not self.writable:
+            raise RuntimeError("Vector store opened read-only")
+        with self._lock:
+            ids, metadata, _ = self.records()
+            rows = self.live_rows()
+            previous_dir = self.generation_dir
+            name = f"gen-{int(self.generation.split('-')[1]) + 1:06d}"
+            generation_dir = self._create_generation(name, self.dim)
+
+            with open(os.path.join(generation_dir, "vectors.f32"), "wb") as f:
+                for start in range(0, len(rows), 65536):
+                    f.write(np.ascontiguousarray(self.vectors[rows[start:start + 65536]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(os.path.join(generation_dir, "records.log"), "wb") as f:
+                for new_row, row in enumerate(rows):
+                    f.write(_log_line({"row": new_row, "id": ids[row], "metadata": metadata[row]}))
+                f.flush()
+                os.fsync(f.fileno())
+            _write_atomic(os.path.join(generation_dir, "count"), str(len(rows)))
+            _write_atomic(os.path.join(self.path, "CURRENT"), name)
+
+            self._open_generation()
+            shutil.rmtree(previous_dir, ignore_errors=True)
+            return {"rows_before": len(ids), "rows_after": len(rows)}
+
+    def close(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stats(self):
+        return {
+            "rows": self.count,
+            "dim": self.dim,
+            "generation": self.generation,
+            "segment_mb": round(self.count * self.row_bytes / (1024 * 1024), 2)
+        }
+
+
+class AppendInbox:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        """
+        Spool directory where read-only processes leave appends for the
+        writer
+
+        Each put() or put_delete() is one file, written to a temporary
+        name and renamed in, so the writer never sees half an entry.
+        drain() applies them in arrival order and removes them once
+        committed.
+        """
+        self.directory = os.path.join(path, "inbox")
+        os.makedirs(self.directory, exist_ok=True)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def put(self, record_ids, vectors, metadata=None):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(record_ids), -1)
+        self._put({"ids": list(record_ids), "vectors": vectors.tolist(),
+                   "metadata": [meta or {} for meta in (metadata or [None] * len(record_ids))]})
+
+    def put_delete(self, record_ids):
+        self._put({"delete": list(record_ids)})
+
+    def _put(self, entry):
+        with self._lock:
+            self._sequence += 1
+            name = f"{time.time_ns():020d}-{os.getpid()}-{self._sequence}.json"
+        tmp_path = os.path.join(self.directory, name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+    def pending(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def drain(self, store):
+        """Apply every pending entry to a writable store; returns how many were applied"""
+        applied = 0
+        for name in self.pending():
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue  # removed by another drain, or unreadable; retried next time
+            if "delete" in entry:
+                for record_id in entry["delete"]:
+                    store.delete(record_id)
+            else:
+                store.append(entry["ids"], np.asarray(entry["vectors"], dtype=np.float32).reshape(-1, store.dim),
+                             entry["metadata"])
+            os.remove(path)  # only after the change is committed
+            applied += 1
+        return applied